@@ -0,0 +1,95 @@
+"""revoked token partitions
+
+Revision ID: 3f9c2a7d1e54
+Revises: b6fd7f849c42
+Create Date: 2026-10-18 10:12:31.402118
+
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from src.config import setting
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c2a7d1e54'
+down_revision: Union[str, Sequence[str], None] = 'b6fd7f849c42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _create_partitions(table: str) -> None:
+    """ weekly partitions from the oldest unexpired token to a few weeks ahead. """
+    lifetime = max(setting.ACCESS_EXPIRE, setting.REFRESH_EXPIRE)
+    today = datetime.now(timezone.utc).date()
+    start = today - timedelta(days=today.weekday())
+    first = start - timedelta(weeks=-(-lifetime // 7))
+    last = start + timedelta(weeks=-(-lifetime // 7) + 1)
+
+    week = first
+    while week <= last:
+        op.execute(
+            f"CREATE TABLE revoked_token_p{week:%Y%m%d} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{week} 00:00:00+00') TO ('{week + timedelta(weeks=1)} 00:00:00+00')"
+        )
+        week += timedelta(weeks=1)
+
+    op.execute(f"CREATE TABLE revoked_token_default PARTITION OF {table} DEFAULT")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('revoked_token_partitioned',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('jti', sa.String(length=128), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id', 'expires_at', name='pk_revoked_token'),
+    sa.UniqueConstraint('jti', 'expires_at', name='uq_revoked_token_jti_expires_at'),
+    postgresql_partition_by='RANGE (expires_at)',
+    )
+    _create_partitions('revoked_token_partitioned')
+
+    # tokens before this revision have no `exp` stored, they live at most REFRESH_EXPIRE days.
+    # The estimate differs from the `exp` a later revoke computes, so `RevokedTokenRepository`
+    # inserts check the jti under any expires_at.
+    op.execute(
+        "INSERT INTO revoked_token_partitioned (id, user_id, jti, created_at, expires_at) "
+        f"SELECT id, user_id, jti, created_at, created_at + interval '{setting.REFRESH_EXPIRE} days' "
+        "FROM revoked_token "
+        f"WHERE created_at + interval '{setting.REFRESH_EXPIRE} days' > now()"
+    )
+
+    op.drop_index(op.f('ix_revoked_token_jti'), table_name='revoked_token')
+    op.drop_table('revoked_token')
+    op.rename_table('revoked_token_partitioned', 'revoked_token')
+    op.execute("ALTER SEQUENCE revoked_token_partitioned_id_seq RENAME TO revoked_token_id_seq")
+    op.execute("SELECT setval('revoked_token_id_seq', COALESCE((SELECT max(id) FROM revoked_token), 0) + 1, false)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_table('revoked_token_plain',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('jti', sa.String(length=128), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id', name='revoked_token_pkey')
+    )
+    op.execute(
+        "INSERT INTO revoked_token_plain (id, user_id, jti, created_at) "
+        "SELECT id, user_id, jti, created_at FROM revoked_token"
+    )
+
+    # partitions are dropped with their parent
+    op.drop_table('revoked_token')
+    op.rename_table('revoked_token_plain', 'revoked_token')
+    op.execute("ALTER SEQUENCE revoked_token_plain_id_seq RENAME TO revoked_token_id_seq")
+    op.execute("SELECT setval('revoked_token_id_seq', COALESCE((SELECT max(id) FROM revoked_token), 0) + 1, false)")
+    op.create_index(op.f('ix_revoked_token_jti'), 'revoked_token', ['jti'], unique=True)
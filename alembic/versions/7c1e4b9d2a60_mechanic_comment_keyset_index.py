@@ -0,0 +1,28 @@
+"""mechanic comment keyset index
+
+Revision ID: 7c1e4b9d2a60
+Revises: 3f9c2a7d1e54
+Create Date: 2026-10-18 19:20:04.118530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1e4b9d2a60'
+down_revision: Union[str, Sequence[str], None] = '3f9c2a7d1e54'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_mechanic_comment_created_at_id', 'mechanic_comment', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_mechanic_comment_created_at_id', table_name='mechanic_comment')
@@ -0,0 +1,29 @@
+"""user session epoch
+
+Revision ID: a4d81c93f2b6
+Revises: 7c1e4b9d2a60
+Create Date: 2026-10-18 21:42:17.530914
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4d81c93f2b6'
+down_revision: Union[str, Sequence[str], None] = '7c1e4b9d2a60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # epochs only lived in redis before, stateless tokens issued with them stop matching
+    op.add_column('user', sa.Column('session_epoch', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('user', 'session_epoch')
@@ -0,0 +1,38 @@
+"""
+Micro-benchmarks, run them from the repository root, e.g.
+
+    python -m benchmarks.bench_jwt_verify
+
+Settings fall back to dummy values so benchmarks run without a `.env`.
+"""
+import os
+
+_env = {
+    "APP_HOST": "127.0.0.1",
+    "APP_PORT": "8000",
+    "DEBUG": "false",
+    "SSL": "0",
+    "SSL_CERT": "",
+    "SSL_KEY": "",
+    "SECRET_KEY": "benchmark-secret-key",
+    "JWT_ALGORITHM": "HS256",
+    "ACCESS_EXPIRE": "1",
+    "REFRESH_EXPIRE": "7",
+    "OTP_EXPIRE": "300",
+    "SMS_PANEL": "hi_sms",
+    "SMS_ENDPOINT": "http://localhost",
+    "SMS_USER": "benchmark",
+    "SMS_PASSWORD": "benchmark",
+    "SMS_ORIGINATOR": "benchmark",
+    "POSTGRE_HOST": "localhost",
+    "POSTGRE_PORT": "5432",
+    "POSTGRE_USER": "mechanic",
+    "POSTGRE_PASS": "mechanic",
+    "POSTGRE_DB": "mechanic",
+    "REDIS_HOST": "localhost",
+    "REDIS_PORT": "6379",
+    "REDIS_BROKER_DB": "0",
+    "REDIS_CACHE_DB": "1",
+}
+for k, v in _env.items():
+    os.environ.setdefault(k, v)
@@ -0,0 +1,74 @@
+"""
+Cold start of the api (`src.app`) and of celery workers (`src.core.celery` and
+its tasks), from `python -X importtime` in a fresh interpreter per run.
+
+    python -m benchmarks.bench_importtime [runs] [--top 10]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+import benchmarks  # noqa: F401
+
+TARGETS = {
+    "api": "import src.app",
+    "celery": "import src.core.celery, src.tasks.send_sms, src.tasks.revoked_token",
+}
+
+# import time: self [us] | cumulative | imported package
+LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$")
+
+
+def importtime(code: str) -> Tuple[int, Dict[str, int]]:
+    """ total microseconds and cumulative microseconds of every root package, at any depth. """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, env=os.environ, check=True,
+    )
+
+    total, modules = 0, {}
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match is None:
+            continue
+
+        cumulative, indent, module = int(match[2]), len(match[3]), match[4]
+        # one space of indent is a module imported by the `-c` code itself
+        if indent == 1:
+            total += cumulative
+        if "." not in module:
+            modules[module] = cumulative
+
+    return total, modules
+
+
+def heaviest(runs: List[Dict[str, int]], top: int) -> List[Tuple[str, int]]:
+    names = set().union(*runs)
+    medians = {name: statistics.median(run.get(name, 0) for run in runs) for name in names}
+    return sorted(medians.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("runs", type=int, nargs="?", default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    for name, code in TARGETS.items():
+        totals, runs = [], []
+        for _ in range(args.runs):
+            total, modules = importtime(code)
+            totals.append(total)
+            runs.append(modules)
+
+        print(f"{name}: median {statistics.median(totals) / 1000:.1f} ms  min {min(totals) / 1000:.1f} ms")
+        for module, cumulative in heaviest(runs, args.top):
+            print(f"  {cumulative / 1000:8.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""
+Per request cost of `Jwt.verify_token`, with and without the verified payload cache.
+
+    python -m benchmarks.bench_jwt_verify [iterations]
+"""
+import sys
+import timeit
+
+import benchmarks  # noqa: F401
+from src.schemas.auth import TokenType
+from src.utils.auth import jwt
+
+
+def main(iterations: int = 100000):
+    token = "Bearer " + jwt.create_token({"sub": "09123456789", "role": 0}, TokenType.access_token)
+
+    def uncached():
+        jwt.cache.clear()
+        jwt.verify_token(token, TokenType.access_token)
+
+    def cached():
+        jwt.verify_token(token, TokenType.access_token)
+
+    jwt.verify_token(token, TokenType.access_token)
+
+    for name, func in (("uncached", uncached), ("cached", cached)):
+        seconds = min(timeit.repeat(func, number=iterations, repeat=3))
+        print(f"{name:>9}: {seconds / iterations * 1e6:8.2f} us/request")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
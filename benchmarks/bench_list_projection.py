@@ -0,0 +1,91 @@
+"""
+`GET /car` style list response at 1k and 10k rows per page: ORM instances through
+FastAPI's `response_model` serialization (before) and `project` rows through
+the prebuilt `CarOutList` adapter (after). Times cover query, validation and json.
+
+Needs a migrated, disposable postgres from the `.env` settings, it inserts a
+benchmark user and its cars and deletes the cars afterwards.
+
+    python -m benchmarks.bench_list_projection --repeat 20
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import date
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from sqlalchemy import delete
+
+import benchmarks  # noqa: F401
+from benchmarks.bench_write_refresh import benchmark_user
+from src.core.postgres import get_postdb
+from src.models.car import Car
+from src.repositories.car import CarRepository
+from src.schemas.car import CarOut, CarOutList, CreateCar
+from src.utils.pagination import json_list
+
+RESPONSE_FIELD = create_model_field("Response_list_user_cars", List[CarOut], mode="serialization")
+
+
+async def orm_path(repository: CarRepository, user_id: int) -> bytes:
+    cars = await repository.list_user_cars(user_id)
+    content = await serialize_response(field=RESPONSE_FIELD, response_content=cars)
+    return JSONResponse(content).body
+
+
+async def projected_path(repository: CarRepository, user_id: int) -> bytes:
+    return json_list(CarOutList, await repository.list_user_cars(user_id, CarOut)).body
+
+
+async def measure(name: str, path, user_id: int, repeat: int) -> None:
+    samples = []
+    async for db in get_postdb():
+        repository = CarRepository(db)
+        for _ in range(repeat):
+            # a fresh identity map per request, like the app
+            db.expunge_all()
+            start = time.perf_counter()
+            await path(repository, user_id)
+            samples.append((time.perf_counter() - start) * 1000)
+
+    print(f"  {name:<9} p50: {statistics.median(samples):8.2f} ms  min: {min(samples):8.2f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    async for db in get_postdb():
+        user_id = await benchmark_user(db)
+
+    inserted = 0
+    try:
+        for rows in (1000, 10000):
+            async for db in get_postdb():
+                repository = CarRepository(db)
+                await repository.bulk_create([
+                    CreateCar(
+                        title=f"bench {i}", car_type="sedan", tip="bench", model=date(2020, 1, 1),
+                        license_plate="12ب34567", user_id=user_id,
+                    )
+                    for i in range(inserted, rows)
+                ])
+                await repository.uow.commit()
+            inserted = rows
+
+            print(f"{rows} rows")
+            await measure("orm", orm_path, user_id, args.repeat)
+            await measure("projected", projected_path, user_id, args.repeat)
+    finally:
+        async for db in get_postdb():
+            await db.execute(delete(Car).where(Car.user_id == user_id))
+            await db.commit()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,48 @@
+"""
+Encode + decode cost and size of a cached page of 50 rows per `REDIS_CODEC`,
+codecs whose package isn't installed are skipped.
+
+    python -m benchmarks.bench_redis_codec [iterations]
+"""
+import sys
+import timeit
+
+import benchmarks  # noqa: F401
+from src.utils.codec import CODECS, get_codec
+
+
+def page() -> dict:
+    return {
+        "items": [
+            {
+                "id": i,
+                "title": f"car {i}",
+                "car_type": "sedan",
+                "license_plate": "12ب34567",
+                "user_id": 1,
+                "created_at": "2024-01-01T10:00:00+00:00",
+                "updated_at": "2024-01-01T10:00:00+00:00",
+            }
+            for i in range(50)
+        ],
+        "next_cursor": "WzUwXQ==",
+    }
+
+
+def main(iterations: int = 10000):
+    data = page()
+
+    for name in CODECS:
+        try:
+            codec = get_codec(name)
+        except RuntimeError:
+            print(f"{name:>8}: not installed")
+            continue
+
+        encoded = codec.encode(data)
+        seconds = min(timeit.repeat(lambda: codec.decode(codec.encode(data)), number=iterations, repeat=3))
+        print(f"{name:>8}: {seconds / iterations * 1e6:8.2f} us/round trip  {len(encoded):6} bytes")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
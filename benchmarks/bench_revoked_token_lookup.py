@@ -0,0 +1,115 @@
+"""
+Revocation lookup latency on the partitioned `revoked_token` table, before and
+after seeding historical (already expired) revocations.
+
+Needs a migrated, disposable postgres from the `.env` settings, it inserts a
+benchmark user and a lot of rows.
+
+    python -m benchmarks.bench_revoked_token_lookup --historical 100000000
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from sqlalchemy import text
+
+import benchmarks  # noqa: F401
+from src.core.sync import get_postdb_cm
+from src.tasks.revoked_token import partition_name, week_start
+
+LOOKUP = text(
+    "SELECT 1 FROM revoked_token WHERE jti = :jti AND expires_at > now()"
+)
+
+
+def benchmark_user(db) -> int:
+    return db.execute(text(
+        "INSERT INTO \"user\" (phone_number, password, first_name, last_name, role, is_active, is_delete) "
+        "VALUES ('00000000000', '-', 'bench', 'bench', 'user', false, true) "
+        "ON CONFLICT (phone_number) DO UPDATE SET first_name = 'bench' RETURNING id"
+    )).scalar_one()
+
+
+def seed_live(db, user_id: int, count: int) -> list[str]:
+    jtis = [str(uuid4()) for _ in range(count)]
+    expires_at = datetime.now(timezone.utc) + timedelta(days=3)
+    db.execute(
+        text("INSERT INTO revoked_token (user_id, jti, expires_at) VALUES (:user_id, :jti, :expires_at)"),
+        [{"user_id": user_id, "jti": jti, "expires_at": expires_at} for jti in jtis],
+    )
+    db.commit()
+    return jtis
+
+
+def seed_historical(db, user_id: int, count: int, weeks: int, chunk: int = 1000000) -> None:
+    """ `count` expired revocations spread over the `weeks` before the current one. """
+    current = week_start(datetime.now(timezone.utc).date())
+    per_week = max(1, count // weeks)
+
+    for week in range(1, weeks + 1):
+        start = current - timedelta(weeks=week)
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(start)} PARTITION OF revoked_token "
+            f"FOR VALUES FROM ('{start} 00:00:00+00') TO ('{start + timedelta(weeks=1)} 00:00:00+00')"
+        ))
+
+        for offset in range(0, per_week, chunk):
+            size = min(chunk, per_week - offset)
+            db.execute(text(
+                "INSERT INTO revoked_token (user_id, jti, expires_at) "
+                "SELECT :user_id, md5(random()::text || i), "
+                f"'{start} 00:00:00+00'::timestamptz + (i % 604800) * interval '1 second' "
+                "FROM generate_series(1, :size) i"
+            ), {"user_id": user_id, "size": size})
+            db.commit()
+
+        print(f"seeded week {start}: {per_week} rows")
+
+    db.execute(text("ANALYZE revoked_token"))
+    db.commit()
+
+
+def measure(db, jtis: list[str], lookups: int) -> None:
+    samples = []
+    for _ in range(lookups):
+        jti = random.choice(jtis) if random.random() < 0.5 else str(uuid4())
+        start = time.perf_counter()
+        db.execute(LOOKUP, {"jti": jti}).first()
+        samples.append((time.perf_counter() - start) * 1000)
+
+    samples.sort()
+    print(
+        f"  lookups: {lookups}  p50: {statistics.median(samples):.3f} ms  "
+        f"p99: {samples[int(len(samples) * 0.99) - 1]:.3f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--historical", type=int, default=10000000)
+    parser.add_argument("--weeks", type=int, default=52)
+    parser.add_argument("--live", type=int, default=10000)
+    parser.add_argument("--lookups", type=int, default=10000)
+    args = parser.parse_args()
+
+    with get_postdb_cm() as db:
+        user_id = benchmark_user(db)
+        jtis = seed_live(db, user_id, args.live)
+
+        print("before historical revocations")
+        measure(db, jtis, args.lookups)
+
+        seed_historical(db, user_id, args.historical, args.weeks)
+
+        print(f"after {args.historical} historical revocations")
+        measure(db, jtis, args.lookups)
+
+        plan = db.execute(text("EXPLAIN " + LOOKUP.text), {"jti": jtis[0]}).scalars().all()
+        print("\n".join(plan))
+
+
+if __name__ == "__main__":
+    main()
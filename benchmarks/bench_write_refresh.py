@@ -0,0 +1,117 @@
+"""
+Write latency of `SqlRepository.create` / `update` with the old post write
+`refresh` SELECT (before) and with eager server defaults only (after).
+
+Needs a migrated, disposable postgres from the `.env` settings, it inserts a
+benchmark user and its cars and deletes the cars afterwards.
+
+    python -m benchmarks.bench_write_refresh --writes 2000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import date
+
+from sqlalchemy import delete, event, text
+
+import benchmarks  # noqa: F401
+from src.core.postgres import get_postdb
+from src.models.car import Car
+from src.repositories.car import CarRepository
+from src.schemas.car import CreateCar, UpdateCar
+
+
+class RefreshingCarRepository(CarRepository):
+    """ the repository as it was, one extra SELECT after every write. """
+
+    async def create(self, schema):
+        db_obj = await super().create(schema)
+        await self.db.refresh(db_obj)
+        return db_obj
+
+    async def update(self, db_obj, schema, partial):
+        db_obj = await super().update(db_obj, schema, partial)
+        await self.db.refresh(db_obj)
+        return db_obj
+
+
+async def benchmark_user(db) -> int:
+    result = await db.execute(text(
+        "INSERT INTO \"user\" (phone_number, password, first_name, last_name, role, is_active, is_delete) "
+        "VALUES ('00000000000', '-', 'bench', 'bench', 'user', false, true) "
+        "ON CONFLICT (phone_number) DO UPDATE SET first_name = 'bench' RETURNING id"
+    ))
+    await db.commit()
+    return result.scalar_one()
+
+
+def report(name: str, samples: list[float], statements: int, writes: int) -> None:
+    samples.sort()
+    print(
+        f"  {name:<7} p50: {statistics.median(samples):.3f} ms  "
+        f"p99: {samples[int(len(samples) * 0.99) - 1]:.3f} ms  "
+        f"statements/write: {statements / writes:.1f}"
+    )
+
+
+async def measure(repository_class, user_id: int, writes: int) -> None:
+    async for db in get_postdb():
+        statements = 0
+
+        def count(*args):
+            nonlocal statements
+            statements += 1
+
+        engine = db.bind.sync_engine
+        event.listen(engine, "before_cursor_execute", count)
+        try:
+            repository = repository_class(db)
+            cars, creates, updates = [], [], []
+
+            for i in range(writes):
+                start = time.perf_counter()
+                car = await repository.create(CreateCar(
+                    title=f"bench {i}", car_type="sedan", tip="bench", model=date(2020, 1, 1),
+                    license_plate="12ب34567", user_id=user_id,
+                ))
+                await repository.uow.commit()
+                # server generated columns, read like the response serialization does
+                car.created_at, car.updated_at
+                creates.append((time.perf_counter() - start) * 1000)
+                cars.append(car)
+
+            report("create", creates, statements, writes)
+            statements = 0
+
+            for car in cars:
+                start = time.perf_counter()
+                car = await repository.update(car, UpdateCar(title=f"{car.title} updated"), True)
+                await repository.uow.commit()
+                car.updated_at
+                updates.append((time.perf_counter() - start) * 1000)
+
+            report("update", updates, statements, writes)
+        finally:
+            event.remove(engine, "before_cursor_execute", count)
+            await db.execute(delete(Car).where(Car.user_id == user_id))
+            await db.commit()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writes", type=int, default=1000)
+    args = parser.parse_args()
+
+    async for db in get_postdb():
+        user_id = await benchmark_user(db)
+
+    print("before (refresh after write)")
+    await measure(RefreshingCarRepository, user_id, args.writes)
+
+    print("after (eager server defaults)")
+    await measure(CarRepository, user_id, args.writes)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -4,6 +4,8 @@ from src.api.v1.routes.mechanic import router as mechanic_router
 from src.api.v1.routes.car import router as car_router
 from src.api.v1.routes.mechanic_car_request import rotuer as mechanic_car_request_router
 from src.api.v1.routes.mechanic_comment import router as mechanic_comment_router
+from src.api.v1.routes.metrics import router as metrics_router
+from src.api.v1.routes.export import router as export_router
 
 v1_routers = (
     auth_router,
@@ -12,4 +14,6 @@ v1_routers = (
     car_router,
     mechanic_car_request_router,
     mechanic_comment_router,
+    metrics_router,
+    export_router,
 )
\ No newline at end of file
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Body, Depends, Header, status, Request
+from typing import Any, Dict
+from fastapi import APIRouter, Body, Depends, Header, Response, status, Request
 
 from src.models.user import User as UserModel
 from src.schemas.auth import Login, ResetPaasword, SignupSendOTP, SignupVerifyOTP, TokenOut, TokenVerifyOut, VerifyResetPassword
 from src.services.auth import AuthService
 from src.app import limiter
-from src.utils.auth import get_current_user
+from src.utils.auth import get_current_user, jwt
 
 router = APIRouter(
     prefix="/auth",
@@ -54,6 +55,12 @@ async def is_access_token_valid(
     return await service.verify_token(access_token)
 
 
+@router.get("/.well-known/jwks.json", status_code=status.HTTP_200_OK)
+async def jwks(response: Response) -> Dict[str, Any]:
+    response.headers["Cache-Control"] = "public, max-age=300"
+    return jwt.jwks()
+
+
 @router.post("/token/revoke", status_code=status.HTTP_204_NO_CONTENT)
 async def logout(
     refresh_token: str = Body(..., embed=True),
@@ -4,8 +4,9 @@ from fastapi import APIRouter, Depends, status
 from src.models.user import User as UserModel
 from src.models.user import UserRole
 from src.services.car import CarService
-from src.schemas.car import CreateCar, UpdateCar, CarOut, GetCarOut
+from src.schemas.car import CreateCar, UpdateCar, CarOut, CarOutList, GetCarOut
 from src.utils.auth import get_current_user_with_permission
+from src.utils.pagination import json_list
 
 
 router = APIRouter(
@@ -38,7 +39,7 @@ async def list_user_cars(
     service: CarService = Depends(),
     user: UserModel = Depends(get_current_user_with_permission([UserRole.user]))
 ) -> List[CarOut]:
-    return await service.list_user_cars(user)
+    return json_list(CarOutList, await service.list_user_cars(user))
 
 @router.get("/{car_id}", response_model=GetCarOut, status_code=status.HTTP_200_OK)
 async def retrieve_car(
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends, Query, status
+from fastapi.responses import StreamingResponse
+
+from src.models.user import User as UserModel, UserRole
+from src.schemas.export import ExportFormat, ExportTable
+from src.services.export import ExportService
+from src.utils.auth import get_current_user_with_permission
+from src.utils.deadline import budget
+from src.utils.export import MEDIA_TYPES
+
+
+router = APIRouter(
+    prefix="/export",
+    tags=["v1 - export"]
+)
+
+
+# a full table stream runs as long as the client reads it
+@router.get(
+    "/{table}", response_class=StreamingResponse, status_code=status.HTTP_200_OK,
+    dependencies=[Depends(budget(None))],
+)
+async def export_table(
+    table: ExportTable,
+    export_format: ExportFormat = Query(ExportFormat.ndjson, alias="format"),
+    service: ExportService = Depends(),
+    user: UserModel = Depends(get_current_user_with_permission([UserRole.admin])),
+) -> StreamingResponse:
+    return StreamingResponse(
+        service.export(table, export_format),
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{table.value}.{export_format.value}"'},
+    )
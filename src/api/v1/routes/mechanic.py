@@ -3,7 +3,8 @@ from fastapi import APIRouter, Depends, Query, status
 
 from src.models.user import User as UserModel, UserRole
 from src.services.mechanic import MechanicService
-from src.schemas.mechanic import CreateMechanic, UpdateMechanic, MechanicOut
+from src.schemas.mechanic import CreateMechanic, UpdateMechanic, MechanicOut, MechanicOutList
+from src.utils.pagination import paginated_json
 from src.utils.auth import get_current_user, get_current_user_with_permission
 
 router = APIRouter(
@@ -33,10 +34,11 @@ async def partial_update_mechanic(
 async def list_all_mechanic(
     limit: int = Query(100, ge=1),
     offset: int = Query(0, ge=0),
+    cursor: str | None = Query(None),
     service: MechanicService = Depends(),
     user: UserModel = Depends(get_current_user)
 ) -> List[MechanicOut]:
-    return await service.list_all(limit, offset)
+    return paginated_json(MechanicOutList, await service.list_all(limit, offset, cursor))
 
 @router.delete("", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_mechanic(
@@ -3,7 +3,8 @@ from fastapi import APIRouter, status, Depends, Query
 
 from src.models.user import User as UserModel, UserRole
 from src.services.mechanic_car_reqquest import MechanicCarRequstService
-from src.schemas.mechanic_car_request import CreateMechanicCarRequest, UpdateMechanicCarRequestByMechanic, UpdateMechanicCarRequestByUser, MechanicCarRequestOut
+from src.schemas.mechanic_car_request import CreateMechanicCarRequest, UpdateMechanicCarRequestByMechanic, UpdateMechanicCarRequestByUser, MechanicCarRequestOut, MechanicCarRequestOutList
+from src.utils.pagination import paginated_json
 from src.utils.auth import get_current_user, get_current_user_with_permission
 
 
@@ -45,9 +46,10 @@ async def update_mechanic_car_request_by_mechanic_user(
 async def list_mechanic_car_request(
     limit: int = Query(100, ge=1),
     offset: int = Query(0, ge=0),
+    cursor: str | None = Query(None),
     service: MechanicCarRequstService = Depends(),
     user: UserModel = Depends(get_current_user)
 ) -> List[MechanicCarRequestOut]:
-    return await service.list_mechanic_reqeusts(user, limit, offset)
+    return paginated_json(MechanicCarRequestOutList, await service.list_mechanic_reqeusts(user, limit, offset, cursor))
 
 
@@ -1,7 +1,8 @@
 from typing import List
-from fastapi import APIRouter, status, Depends, Query
+from fastapi import APIRouter, status, Depends, Query, Response
 
 from src.models.user import User as UserModel, UserRole
+from src.utils.pagination import paginated
 from src.utils.auth import get_current_user
 from src.services.mechanic_comment import MechanicCommnetService
 from src.schemas.mechanic_comment import CreateMechanicComment, MechanicCommentOut, GetMechanicCommentOut
@@ -24,12 +25,14 @@ async def create_mechanic_comment(
 @router.get("/{mechanic_id}", response_model=List[GetMechanicCommentOut], status_code=status.HTTP_200_OK)
 async def list_by_mechanic_id(
     mechanic_id: int,
+    response: Response,
     limit: int = Query(20, ge=1),
     offset: int = Query(0, ge=0),
+    cursor: str | None = Query(None),
     service: MechanicCommnetService = Depends(),
     user: UserModel = Depends(get_current_user)
 ) -> List[GetMechanicCommentOut]:
-    return await service.list_mechanic_comments(mechanic_id, limit, offset)
+    return paginated(response, await service.list_mechanic_comments(mechanic_id, limit, offset, cursor))
 
 
 @router.delete("/{comment_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,19 @@
+from typing import Dict
+from fastapi import APIRouter, Depends, status
+
+from src.models.user import User as UserModel, UserRole
+from src.utils.auth import get_current_user_with_permission
+from src.utils.metrics import metrics
+
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["v1 - metrics"]
+)
+
+
+@router.get("", response_model=Dict[str, float], status_code=status.HTTP_200_OK)
+async def get_metrics(
+    user: UserModel = Depends(get_current_user_with_permission([UserRole.admin])),
+) -> Dict[str, float]:
+    return metrics.snapshot()
@@ -1,9 +1,10 @@
 from typing import List
-from fastapi import APIRouter, Depends, Query, status
+from fastapi import APIRouter, Depends, Query, Response, status
 
 from src.models.user import User as UserModel, UserRole
 from src.schemas.permission import CreateMechanicPermission, MechanicPermissionOut
 from src.services.permission import MechanicPermissionService
+from src.utils.pagination import paginated
 from src.utils.auth import get_current_user_with_permission
 
 
@@ -23,12 +24,14 @@ async def create_mechenic_permission(
 
 @router.get("/mechanic", response_model=List[MechanicPermissionOut], status_code=status.HTTP_200_OK)
 async def list_all_mechanic_permission(
+    response: Response,
     limit: int = Query(100, ge=0),
     offset: int = Query(0, ge=0),
+    cursor: str | None = Query(None),
     service: MechanicPermissionService = Depends(),
     user: UserModel = Depends(get_current_user_with_permission([UserRole.admin])),
 ) -> List[MechanicPermissionOut]:
-    return await service.list_all(limit, offset)
+    return paginated(response, await service.list_all(limit, offset, cursor))
 
 
 @router.get("/mechanic/{key}", response_model=MechanicPermissionOut, status_code=status.HTTP_200_OK)
@@ -1,3 +1,5 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request, status
 from fastapi.responses import JSONResponse
 from slowapi.errors import RateLimitExceeded
@@ -5,13 +7,29 @@ from slowapi.middleware import SlowAPIMiddleware
 from slowapi import _rate_limit_exceeded_handler
 
 from src.config import setting
+from src.core.postgres import close_postdb, init_postdb
+from src.core.redis import close_redis, init_redis
+from src.utils.auth import UserPassword
+from src.utils.deadline import DeadlineMiddleware
+from src.utils.sql_stats import SqlStatsMiddleware
 from src.utils.throttle import limiter
 from src.api.v1.router import v1_routers
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_postdb()
+    init_redis(client_cache=setting.REDIS_CLIENT_CACHE)
+    yield
+    await close_redis()
+    await close_postdb()
+    UserPassword.shutdown()
+
+
 app = FastAPI(
     root_path=setting.ROUTES_PREFIX, 
     swagger_ui_parameters={"filter": True},
+    lifespan=lifespan,
 )
 
 # throttle middleware
@@ -26,6 +44,12 @@ async def rate_limit_handler(request: Request, exc: RateLimitExceeded):
         content={"detail": "Too many requests"}
     )
 
+# query count, db time and N+1 warnings per request
+app.add_middleware(SqlStatsMiddleware)
+
+# per request time budget, outermost so every layer runs within it
+app.add_middleware(DeadlineMiddleware)
+
 # v1 APIs
 v1_prefix = "/v1"
 for router in v1_routers:
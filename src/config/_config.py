@@ -1,4 +1,5 @@
 import os
+from typing import List
 from pydantic import computed_field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
@@ -24,10 +25,24 @@ class Setting(BaseSettings):
 
     SECRET_KEY: str
     JWT_ALGORITHM: str
+    JWT_KEYS_DIR: str | None = None
+    JWT_ACTIVE_KID: str | None = None
+    STATELESS_AUTH: bool = False
+    # redis copy of `user.session_epoch`, a miss reads postgres
+    SESSION_EPOCH_REDIS_TTL: int = 86400
+    JWT_CACHE_SIZE: int = 10000
+
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_CONCURRENCY: int = 8
 
     ACCESS_EXPIRE: int
     REFRESH_EXPIRE: int
     OTP_EXPIRE: int
+    OTP_MAX_ATTEMPTS: int = 5
+    OTP_WINDOW: int = 3600
+    OTP_IP_LIMIT: int = 20
+    OTP_PHONE_LIMIT: int = 5
+    OTP_REJECT_EXPIRE: int = 300
 
     SMS_PANEL:str
     SMS_ENDPOINT:str
@@ -40,17 +55,68 @@ class Setting(BaseSettings):
     POSTGRE_USER: str
     POSTGRE_PASS: str
     POSTGRE_DB: str
+    # comma separated `host:port` of read replicas, same user and database as the primary
+    POSTGRE_REPLICA_HOSTS: str = ""
+    POSTGRE_REPLICA_MAX_LAG: float = 5
+    POSTGRE_REPLICA_LAG_CHECK: int = 5
+    # per engine and worker, the primary and every replica have their own pool
+    POSTGRE_POOL_SIZE: int = 10
+    POSTGRE_MAX_OVERFLOW: int = 10
+    POSTGRE_POOL_TIMEOUT: float = 30
+    POSTGRE_POOL_RECYCLE: int = 1800
+    POSTGRE_POOL_PRE_PING: bool = True
+    POSTGRE_STATEMENT_CACHE_SIZE: int = 100
+    # pgbouncer in transaction pooling mode, disables prepared statement caching
+    POSTGRE_PGBOUNCER: bool = False
+
+    SQL_N_PLUS_ONE_THRESHOLD: int = 5
+    # seconds per request, routes override it with `budget`, 0 disables
+    REQUEST_BUDGET: float = 10
+    EXPORT_BATCH_SIZE: int = 1000
 
     REDIS_HOST: str
     REDIS_PORT: str
     REDIS_BROKER_DB: str
     REDIS_CACHE_DB: str
+    REDIS_CODEC: str = "json"
+    # per worker, commands wait up to REDIS_POOL_TIMEOUT for a free connection
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_POOL_TIMEOUT: float = 5
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30
+    # upper bounds, commands of a request also stop at its deadline
+    REDIS_SOCKET_TIMEOUT: float = 5
+    REDIS_CONNECT_TIMEOUT: float = 2
+    # server assisted client side caching of hot keys, see `ClientCache`
+    REDIS_CLIENT_CACHE: bool = False
+    REDIS_CLIENT_CACHE_PREFIXES: str = "user_,session_epoch_,otp_rejected_"
+    REDIS_CLIENT_CACHE_SIZE: int = 10000
+    REDIS_CLIENT_CACHE_TTL: float = 300
+
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL: int = 5
+    USER_CACHE_REDIS_TTL: int = 300
+
+    QUERY_CACHE_TTL: int = 60
+    QUERY_CACHE_L1_SIZE: int = 1000
+    QUERY_CACHE_L1_TTL: float = 2
+    QUERY_CACHE_LOCK_TIMEOUT: float = 2
+    QUERY_CACHE_TAG_EXPIRE: int = 86400
 
     @computed_field
     @property
     def POSTGRES_URL(self) -> str:
         return f"postgresql+asyncpg://{self.POSTGRE_USER}:{self.POSTGRE_PASS}@{self.POSTGRE_HOST}:{self.POSTGRE_PORT}/{self.POSTGRE_DB}"
     
+    @computed_field
+    @property
+    def POSTGRES_REPLICA_URLS(self) -> List[str]:
+        urls = []
+        for host in filter(None, map(str.strip, self.POSTGRE_REPLICA_HOSTS.split(","))):
+            if ":" not in host:
+                host = f"{host}:{self.POSTGRE_PORT}"
+            urls.append(f"postgresql+asyncpg://{self.POSTGRE_USER}:{self.POSTGRE_PASS}@{host}/{self.POSTGRE_DB}")
+        return urls
+
     @computed_field
     @property
     def REDIS_BROKER_URL(self) -> str:
@@ -60,6 +126,11 @@ class Setting(BaseSettings):
     @property
     def REDIS_CACHE_URL(self) -> str:
         return f"redis://{self.REDIS_HOST}:{self.REDIS_PORT}/{self.REDIS_CACHE_DB}"
+
+    @computed_field
+    @property
+    def REDIS_CLIENT_CACHE_PREFIX_LIST(self) -> List[str]:
+        return list(filter(None, map(str.strip, self.REDIS_CLIENT_CACHE_PREFIXES.split(","))))
     
 
 @lru_cache
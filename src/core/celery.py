@@ -1,4 +1,5 @@
 from celery import Celery
+from celery.schedules import crontab
 
 from src.config import setting
 
@@ -11,5 +12,14 @@ app = Celery(
 
 app.autodiscover_tasks([
     "src.tasks",
-    "src.tasks.send_sms.send_sms"
-])
\ No newline at end of file
+    "src.tasks.send_sms.send_sms",
+    "src.tasks.revoked_token",
+])
+
+app.conf.beat_schedule = {
+    "revoked-token-partitions": {
+        "task": "src.tasks.revoked_token.maintain_revoked_token_partitions",
+        "schedule": crontab(hour=3, minute=0),
+        "options": {"queue": "auth"},
+    },
+}
@@ -1,35 +1,291 @@
-from typing import Any, AsyncGenerator, Generator
+import asyncio
+import logging
+import math
+import random
+import time
+from typing import AsyncGenerator, Generator, List
 from contextlib import contextmanager
+from uuid import uuid4
 
-from sqlalchemy import create_engine
+from sqlalchemy import Select, event, exc, text
 from sqlalchemy.ext.asyncio.session import AsyncSession
-from sqlalchemy.ext.asyncio import create_async_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.sql import visitors
+from sqlalchemy.sql.selectable import CTE
 
 from src.config import setting
+from src.utils.deadline import statement_timeout_ms
+from src.utils.metrics import metrics
+from src.utils.sql_stats import instrument
 
-_async_engine = create_async_engine(setting.POSTGRES_URL, echo=setting.DEBUG, future=True)
-_AsyncSessionLocal = sessionmaker(bind=_async_engine, class_=AsyncSession, expire_on_commit=False)
 
+logger = logging.getLogger("mechanic")
 
-async def get_postdb() -> AsyncGenerator[AsyncSession, None]:
+class MeteredPool(AsyncAdaptedQueuePool):
     """
-    Async session dependency for FastAPI.
-    Use with Depends(get_postdb)
+    Queue pool exporting `postgres.pool.<name>.*` metrics, name is the engine
+    `pool_logging_name`:
+    - `checkouts`, `checkout_us` (total time waiting for a connection, pre ping
+      included) and `timeouts` when `POSTGRE_POOL_TIMEOUT` runs out.
+    - `in_use` and `overflow` gauges, updated by the pool `checkout` and
+      `checkin` events.
     """
-    async with _AsyncSessionLocal() as session:
-        yield session
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        event.listen(self, "checkout", self._on_checkout)
+        event.listen(self, "checkin", self._on_checkin)
+
+    def recreate(self) -> "MeteredPool":
+        # the new pool copies the listeners of this one and adds its own
+        event.remove(self, "checkout", self._on_checkout)
+        event.remove(self, "checkin", self._on_checkin)
+        return super().recreate()
+
+    def connect(self):
+        name = f"postgres.pool.{self._orig_logging_name}"
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            metrics.incr(f"{name}.timeouts")
+            raise
+        finally:
+            metrics.incr(f"{name}.checkout_us", int((time.perf_counter() - start) * 1_000_000))
+
+        metrics.incr(f"{name}.checkouts")
+        return connection
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy) -> None:
+        self.report()
+
+    def _on_checkin(self, dbapi_connection, connection_record) -> None:
+        self.report(returning=True)
+
+    def report(self, returning: bool = False) -> None:
+        """ `returning`: called on checkin, the connection isn't back in the pool yet. """
+        in_use, overflow = self.checkedout(), self.overflow()
+        if returning:
+            in_use -= 1
+            # no room left in the pool, the connection is closed instead
+            if self.checkedin() >= self.size():
+                overflow -= 1
+
+        name = f"postgres.pool.{self._orig_logging_name}"
+        metrics.gauge(f"{name}.in_use", in_use)
+        metrics.gauge(f"{name}.overflow", max(overflow, 0))
+
+
+def create_pooled_engine(url: str, name: str) -> AsyncEngine:
+    """
+    - Pool size, overflow, timeout, recycle and pre ping from `POSTGRE_POOL_*`.
+    - `POSTGRE_PGBOUNCER` is for pgbouncer transaction pooling: a transaction may
+      run on any server connection, so prepared statements are neither cached
+      nor reused by name.
+    """
+    if setting.POSTGRE_PGBOUNCER:
+        connect_args = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+    else:
+        connect_args = {
+            "statement_cache_size": setting.POSTGRE_STATEMENT_CACHE_SIZE,
+            "prepared_statement_cache_size": setting.POSTGRE_STATEMENT_CACHE_SIZE,
+        }
+
+    return create_async_engine(
+        url,
+        echo=setting.DEBUG,
+        future=True,
+        poolclass=MeteredPool,
+        pool_logging_name=name,
+        pool_size=setting.POSTGRE_POOL_SIZE,
+        max_overflow=setting.POSTGRE_MAX_OVERFLOW,
+        pool_timeout=setting.POSTGRE_POOL_TIMEOUT,
+        pool_recycle=setting.POSTGRE_POOL_RECYCLE,
+        pool_pre_ping=setting.POSTGRE_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
+
+
+# built on first use, see `init_postdb`
+_async_engine: AsyncEngine | None = None
+_replica_engines: List[AsyncEngine] = []
+_AsyncSessionLocal: sessionmaker | None = None
+
+
+class ReplicaLag:
+    """
+    - Replication lag of every replica in seconds, checked at most every
+      `POSTGRE_REPLICA_LAG_CHECK` seconds per worker.
+    - Replicas behind more than `POSTGRE_REPLICA_MAX_LAG`, or that can't be
+      reached, get no reads until the next check.
+    """
+
+    # an idle replica that replayed everything isn't behind, whatever the last commit time is
+    QUERY = text(
+        "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+        "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+    )
+
+    def __init__(self, engines: List[AsyncEngine] = ()):
+        self._lock = asyncio.Lock()
+        self.reset(engines)
+
+    def reset(self, engines: List[AsyncEngine]) -> None:
+        self.engines = list(engines)
+        self.lags = [math.inf] * len(self.engines)
+        self.checked_at = -math.inf
+
+    def is_stale(self) -> bool:
+        return time.monotonic() - self.checked_at >= setting.POSTGRE_REPLICA_LAG_CHECK
+
+    async def refresh(self) -> None:
+        if not self.engines or not self.is_stale():
+            return
+
+        async with self._lock:
+            if not self.is_stale():
+                return
+            self.checked_at = time.monotonic()
+
+            for index, engine in enumerate(self.engines):
+                try:
+                    self.lags[index] = await asyncio.wait_for(self._check(engine), timeout=1)
+                except Exception:
+                    self.lags[index] = math.inf
+
+                lag_ms = -1 if math.isinf(self.lags[index]) else int(self.lags[index] * 1000)
+                metrics.gauge(f"postgres.replica.{index}.lag_ms", lag_ms)
+
+    async def _check(self, engine: AsyncEngine) -> float:
+        async with engine.connect() as conn:
+            return float((await conn.execute(self.QUERY)).scalar() or 0)
+
+    def available(self) -> List[AsyncEngine]:
+        return [
+            engine for engine, lag in zip(self.engines, self.lags)
+            if lag <= setting.POSTGRE_REPLICA_MAX_LAG
+        ]
+
+
+replica_lag = ReplicaLag()
 
 
-_engine = create_engine(setting.POSTGRES_URL.replace("asyncpg","psycopg2"))
-_SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=_engine)
+def has_dml_cte(clause: Select) -> bool:
+    """ a select wrapping `WITH ... INSERT / UPDATE / DELETE ... RETURNING` writes too. """
+    return any(isinstance(element, CTE) and element.element.is_dml for element in visitors.iterate(clause))
+
+
+class RoutingSession(Session):
+    """
+    - Plain selects go to a replica within the lag budget, everything else to
+      the primary, selects with a data modifying CTE included.
+    - After the first write the session sticks to the primary, a request reads its own writes.
+    - Reads inside `primary_reads` go to the primary without sticking.
+    """
+
+    PRIMARY = "primary"
+    PRIMARY_READS = "primary_reads"
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self.info.get(self.PRIMARY):
+            return _async_engine.sync_engine
+
+        if (
+            self._flushing
+            or not isinstance(clause, Select)
+            or clause._for_update_arg is not None
+            or has_dml_cte(clause)
+        ):
+            self.info[self.PRIMARY] = True
+            return _async_engine.sync_engine
+
+        replicas = None if self.info.get(self.PRIMARY_READS) else replica_lag.available()
+        if not replicas:
+            metrics.incr("postgres.reads.primary")
+            return _async_engine.sync_engine
+
+        metrics.incr("postgres.reads.replica")
+        return random.choice(replicas).sync_engine
+
 
 @contextmanager
-def get_postdb_cm() -> Generator[Any, Any, None]:
-    """ sync context manager for scripts or backgroung tasks. """
-    
-    db = _SessionLocal()
+def primary_reads(db: AsyncSession | Session) -> Generator[None, None, None]:
+    """
+    Reads of `db` inside go to the primary. For reads filling a cache: a
+    replica behind would put back a row older than the last invalidation,
+    served until the entry expires.
+    """
+    depth = db.info.get(RoutingSession.PRIMARY_READS, 0)
+    db.info[RoutingSession.PRIMARY_READS] = depth + 1
     try:
-        yield db
+        yield
     finally:
-        db.close()
+        db.info[RoutingSession.PRIMARY_READS] = depth
+
+
+def init_postdb() -> sessionmaker:
+    """
+    Builds the primary and replica engines and the session factory, once.
+    Called by the app lifespan, or by the first session outside of it.
+    """
+    global _async_engine, _replica_engines, _AsyncSessionLocal
+    if _AsyncSessionLocal is not None:
+        return _AsyncSessionLocal
+
+    _async_engine = create_pooled_engine(setting.POSTGRES_URL, "primary")
+    _replica_engines = [
+        create_pooled_engine(url, f"replica.{i}") for i, url in enumerate(setting.POSTGRES_REPLICA_URLS)
+    ]
+
+    # per request query count and db time, see `SqlStatsMiddleware`
+    for engine in (_async_engine, *_replica_engines):
+        instrument(engine)
+    replica_lag.reset(_replica_engines)
+
+    if _replica_engines:
+        _AsyncSessionLocal = sessionmaker(
+            class_=AsyncSession, sync_session_class=RoutingSession, expire_on_commit=False
+        )
+    else:
+        _AsyncSessionLocal = sessionmaker(bind=_async_engine, class_=AsyncSession, expire_on_commit=False)
+
+    return _AsyncSessionLocal
+
+
+async def close_postdb() -> None:
+    global _async_engine, _replica_engines, _AsyncSessionLocal
+    for engine in (_async_engine, *_replica_engines):
+        if engine is not None:
+            await engine.dispose()
+
+    _async_engine, _replica_engines, _AsyncSessionLocal = None, [], None
+    replica_lag.reset([])
+
+
+def _apply_deadline(session, transaction, connection) -> None:
+    """ bounds every statement of the transaction by the remaining request budget, see `DeadlineMiddleware`. """
+    timeout_ms = statement_timeout_ms()
+    if timeout_ms is not None and connection.dialect.name == "postgresql":
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {timeout_ms}")
+
+
+async def get_postdb() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Async session dependency for FastAPI.
+    Use with Depends(get_postdb)
+    """
+    session_factory = init_postdb()
+    await replica_lag.refresh()
+
+    async with session_factory() as session:
+        event.listen(session.sync_session, "after_begin", _apply_deadline)
+        yield session
+
+        if setting.DEBUG and session.info.get("avoided_queries"):
+            logger.debug(f"{session.info['avoided_queries']} queries avoided by the request identity map.")
@@ -1,19 +1,240 @@
-from redis.asyncio import Redis
+import asyncio
+import logging
+from typing import Dict, List, Sequence, Set, Tuple
+
+from redis.asyncio import BlockingConnectionPool, Redis
+from redis.asyncio.client import Pipeline
 from src.config import setting
+from src.utils.cache import LRUCache
+from src.utils.deadline import within_budget
+from src.utils.metrics import metrics
 
-redis_client: Redis | None = None
 
-async def get_redis() -> Redis:
+logger = logging.getLogger("mechanic")
+
+INVALIDATE_CHANNEL = b"__redis__:invalidate"
+
+# commands that never change their keys, anything else sent by this process
+# drops the tracked keys it names, see `ClientCache.written`
+READ_COMMANDS = frozenset(("GET", "MGET", "EXISTS", "TTL", "PTTL", "STRLEN", "TYPE"))
+
+
+class ClientCache:
+    """
+    Client side cache of hot keys kept coherent by redis, `REDIS_CLIENT_CACHE`:
+    - A dedicated connection runs `CLIENT TRACKING ON REDIRECT <its own id> BCAST`
+      for `REDIS_CLIENT_CACHE_PREFIXES` and subscribes to `__redis__:invalidate`,
+      redis then publishes every change to those keys, from any client,
+      expiry and eviction included.
+    - `GET` replies of tracked keys, missing keys too, are kept per worker and
+      dropped on invalidation. `REDIS_CLIENT_CACHE_TTL` bounds entries anyway.
+    - A read racing an invalidation of its key isn't stored.
+    - Writes of this process drop their keys before they are sent, the cache
+      doesn't serve the old value until redis publishes the change.
+    - While the listener is disconnected the cache is empty and bypassed.
+    """
+
+    def __init__(self, redis: Redis, prefixes: List[str]):
+        self.redis = redis
+        self.prefixes = tuple(prefixes)
+        self.cache = LRUCache(
+            "redis_client", maxsize=setting.REDIS_CLIENT_CACHE_SIZE, ttl=setting.REDIS_CLIENT_CACHE_TTL
+        )
+        self.connected = False
+        # key -> token of the latest read in flight, popped by invalidations
+        self._pending: Dict[str, object] = {}
+        # sha of the scripts that change no tracked key
+        self.read_only_scripts: Set[str] = set()
+        self._task: asyncio.Task | None = None
+
+    def tracks(self, key: str) -> bool:
+        return self.connected and isinstance(key, str) and key.startswith(self.prefixes)
+
+    def lookup(self, key: str) -> Tuple[bytes | None] | None:
+        """ `(value,)` if cached, value is None for a missing key. """
+        return self.cache.get(key) if self.tracks(key) else None
+
+    def begin(self, key: str) -> object | None:
+        """ call before reading `key` from redis, pass the token to `store`. """
+        if not self.tracks(key):
+            return None
+        token = self._pending[key] = object()
+        return token
+
+    def store(self, key: str, token: object | None, value: bytes | None) -> None:
+        if token is not None and self._pending.get(key) is token:
+            del self._pending[key]
+            self.cache.set(key, (value,))
+
+    def invalidate(self, keys: List[bytes] | None) -> None:
+        """ None is a flush of everything. """
+        if keys is None:
+            self.cache.clear()
+            self._pending.clear()
+            return
+
+        metrics.incr("redis.client_cache.invalidations", len(keys))
+        for key in keys:
+            self._drop(key.decode())
+
+    def written(self, args: Sequence) -> None:
+        """ call before sending a command, drops the tracked keys it may change. """
+        if not self.connected:
+            return
+
+        command = str(args[0]).upper()
+        if command in READ_COMMANDS:
+            return
+        if command in ("EVALSHA", "EVAL"):
+            if args[1] in self.read_only_scripts:
+                return
+            keys = args[3:3 + int(args[2])]
+        elif command in ("DEL", "UNLINK"):
+            keys = args[1:]
+        elif command in ("MSET", "MSETNX"):
+            keys = args[1::2]
+        else:
+            keys = args[1:2]
+
+        for key in keys:
+            if self.tracks(key):
+                self._drop(key)
+
+    def _drop(self, key: str) -> None:
+        self.cache.delete(key)
+        self._pending.pop(key, None)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _listen(self) -> None:
+        prefixes = [arg for prefix in self.prefixes for arg in ("PREFIX", prefix)]
+        retry_delay = 1
+        while True:
+            connection = self.redis.connection_pool.make_connection()
+            # a subscribed connection answers ping with no `PONG`, it is pinged by hand below
+            connection.health_check_interval = 0
+            try:
+                await connection.connect()
+                await connection.send_command("CLIENT", "ID")
+                client_id = await connection.read_response()
+                await connection.send_command("CLIENT", "TRACKING", "ON", "REDIRECT", client_id, "BCAST", *prefixes)
+                await connection.read_response()
+                await connection.send_command("SUBSCRIBE", INVALIDATE_CHANNEL)
+                await connection.read_response()
+
+                self.connected = True
+                retry_delay = 1
+                while True:
+                    message = await connection.read_response(timeout=setting.REDIS_HEALTH_CHECK_INTERVAL)
+                    if message is None:
+                        await connection.send_command("PING")
+                    elif message[0] == b"message" and message[1] == INVALIDATE_CHANNEL:
+                        self.invalidate(message[2])
+            except Exception as e:
+                metrics.incr("redis.client_cache.disconnects")
+                logger.warning(f"redis client cache listener disconnected: {e!r}")
+            finally:
+                # changes while disconnected were missed
+                self.connected = False
+                self.invalidate(None)
+                await connection.disconnect()
+
+            await asyncio.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, 30)
+
+
+class DeadlinePipeline(Pipeline):
+    client_cache: ClientCache | None = None
+
+    async def execute(self, raise_on_error: bool = True):
+        if self.client_cache is not None:
+            for args, _ in self.command_stack:
+                self.client_cache.written(args)
+        async with within_budget():
+            return await super().execute(raise_on_error)
+
+
+class AppRedis(Redis):
+    """
+    - Commands and pipelines issued within a request stop at its deadline, see
+      `DeadlineMiddleware`. `REDIS_SOCKET_TIMEOUT` still bounds everything else.
+    - `GET` of keys tracked by `client_cache` is served from process memory,
+      commands and pipelines writing them drop them first.
+    """
+
+    client_cache: ClientCache | None = None
+
+    async def execute_command(self, *args, **options):
+        if self.client_cache is not None:
+            self.client_cache.written(args)
+        async with within_budget():
+            return await super().execute_command(*args, **options)
+
+    def pipeline(self, transaction: bool = True, shard_hint: str | None = None) -> DeadlinePipeline:
+        pipe = DeadlinePipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+        pipe.client_cache = self.client_cache
+        return pipe
+
+    async def get(self, name: str) -> bytes | None:
+        if self.client_cache is None:
+            return await super().get(name)
+
+        cached = self.client_cache.lookup(name)
+        if cached is not None:
+            return cached[0]
+
+        token = self.client_cache.begin(name)
+        value = await super().get(name)
+        self.client_cache.store(name, token, value)
+        return value
+
+
+redis_client: AppRedis | None = None
+
+def init_redis(client_cache: bool = False) -> AppRedis:
+    """
+    Builds the shared client once, the app lifespan also starts the client
+    cache listener. Commands wait up to `REDIS_POOL_TIMEOUT` for one of
+    `REDIS_MAX_CONNECTIONS` connections.
+    """
     global redis_client
-    if not redis_client:
-        redis_client = Redis.from_url(setting.REDIS_CACHE_URL, decode_responses=True)
+    if redis_client is None:
+        pool = BlockingConnectionPool.from_url(
+            setting.REDIS_CACHE_URL,
+            max_connections=setting.REDIS_MAX_CONNECTIONS,
+            timeout=setting.REDIS_POOL_TIMEOUT,
+            socket_timeout=setting.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=setting.REDIS_CONNECT_TIMEOUT,
+            health_check_interval=setting.REDIS_HEALTH_CHECK_INTERVAL,
+        )
+        redis_client = AppRedis(connection_pool=pool)
+
+    if client_cache and redis_client.client_cache is None:
+        redis_client.client_cache = ClientCache(redis_client, setting.REDIS_CLIENT_CACHE_PREFIX_LIST)
+        redis_client.client_cache.start()
+
     return redis_client
 
+async def get_redis() -> Redis:
+    """ replies are bytes, `RedisRepository` decodes values with its codec. """
+    return init_redis()
+
 async def close_redis():
     global redis_client
     if redis_client:
-        await redis_client.close()
+        if redis_client.client_cache is not None:
+            await redis_client.client_cache.stop()
+        await redis_client.aclose()
         await redis_client.connection_pool.disconnect()
         redis_client = None
-
-
@@ -0,0 +1,35 @@
+"""
+Sync clients for scripts and background tasks. Imports neither the asyncio
+stacks of sqlalchemy and redis nor fastapi, celery workers load only this.
+"""
+from contextlib import contextmanager
+from typing import Any, Generator
+
+from redis import Redis
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.config import setting
+
+
+# psycopg2 is only imported by processes that use it, see `get_postdb_cm`
+_SessionLocal: sessionmaker | None = None
+
+@contextmanager
+def get_postdb_cm() -> Generator[Any, Any, None]:
+    """ sync context manager for scripts or backgroung tasks. """
+    global _SessionLocal
+    if _SessionLocal is None:
+        _engine = create_engine(setting.POSTGRES_URL.replace("asyncpg","psycopg2"))
+        _SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=_engine)
+
+    db = _SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_redis_sync() -> Redis:
+    """ sync client for scripts or background tasks. """
+    return Redis.from_url(setting.REDIS_CACHE_URL, decode_responses=True)
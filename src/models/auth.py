@@ -1,12 +1,18 @@
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, func
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, UniqueConstraint, func
 
 from src.models.base import Base
 
 class RevokedToken(Base):
+    """ range partitioned by week of `expires_at`, expired partitions get dropped. """
     __tablename__ = "revoked_token"
+    __table_args__ = (
+        UniqueConstraint("jti", "expires_at", name="uq_revoked_token_jti_expires_at"),
+        {"postgresql_partition_by": "RANGE (expires_at)"},
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     
     user_id = Column(Integer, ForeignKey("user.id", ondelete="CASCADE"), nullable=False)
-    jti = Column(String(128), nullable=False, unique=True, index=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
\ No newline at end of file
+    jti = Column(String(128), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    expires_at = Column(DateTime(timezone=True), primary_key=True, nullable=False)
@@ -2,4 +2,6 @@ from sqlalchemy.orm import DeclarativeBase
 
 
 class Base(DeclarativeBase):
-    pass
\ No newline at end of file
+    # server generated columns (`id`, `created_at`, `updated_at`) come back with
+    # the INSERT / UPDATE `RETURNING` instead of a SELECT on next access
+    __mapper_args__ = {"eager_defaults": True}
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, DateTime, Integer, Text, ForeignKey, func
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer, Text, ForeignKey, func
 from sqlalchemy.orm import relationship
 
 from src.models.base import Base
@@ -7,6 +7,10 @@ from src.models.base import Base
 
 class MechanicComment(Base):
     __tablename__ = "mechanic_comment"
+    __table_args__ = (
+        # keyset pagination order
+        Index("ix_mechanic_comment_created_at_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True, nullable=False)
 
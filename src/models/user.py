@@ -26,6 +26,8 @@ class User(Base):
     role = Column(AlchemyEnum(UserRole, name="user_role", native_enum=True), nullable=False, default=UserRole.user)
     is_active = Column(Boolean, default=False)
     is_delete = Column(Boolean, default=False)
+    # bumped to invalidate every token issued before, see `UserRepository.bump_session_epochs`
+    session_epoch = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
@@ -1,17 +1,137 @@
-from sqlalchemy import select
+import time
+from datetime import datetime, timezone
+
+from fastapi import Depends
+from sqlalchemy import Row, Select, exists, literal, select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.models.auth import RevokedToken as RevokedTokenModel
-from src.repositories.base import SqlRepository
-
+from src.models.user import User as UserModel
+from src.repositories.base import RedisRepository, SqlRepository, unit_of_work
+from src.repositories.keys import REVOKED_TOKEN_KEY, REVOKED_TOKEN_READY_KEY
+from src.utils.metrics import metrics
 
 
 class RevokedTokenRepository(SqlRepository):
+    """
+    - Revoked `jti`s live in redis until their token expires, postgres keeps the
+      durable copy and is only read while redis is cold (no `revoked_ready` key).
+    - A cold redis schedules `rebuild_revoked_tokens` to repopulate it.
+    - Rows copied by the partitioning migration have an estimated `expires_at`,
+      so inserts also check that `jti` isn't revoked under any `expires_at`.
+    """
     
     model = RevokedTokenModel
 
+    _rebuild_scheduled_at: float = 0
+
+    def __init__(
+        self,
+        db: AsyncSession = Depends(unit_of_work, scope="function"),
+        redis_repository: RedisRepository = Depends(RedisRepository),
+    ):
+        super().__init__(db)
+        self._redis_repository = redis_repository
+
     async def is_revoked_token(self,jti: str) -> bool:
+        # plain markers, also written by `rebuild_revoked_tokens`
+        revoked, ready = await self._redis_repository.redis.mget(
+            [REVOKED_TOKEN_KEY.format(jti=jti), REVOKED_TOKEN_READY_KEY]
+        )
+        if ready is not None:
+            metrics.incr("revoked_token.redis")
+            return revoked is not None
+
+        metrics.incr("revoked_token.postgres")
+        self.schedule_rebuild()
+
+        result = await self.db.execute(
+            select(self.model.id).where(
+                self.model.jti == jti, self.model.expires_at > datetime.now(timezone.utc)
+            )
+        )
+        return bool(result.first())
+
+    async def revoke(self, jti: str, user_id: int, expires_at: int) -> bool:
+        """ 
+        Store the revocation until `expires_at` (token `exp`, unix time).
+        Returns False if `jti` was already revoked.
+        """
         result = await self.db.execute(
-            select(self.model).where(self.model.jti == jti)
+            self.insert_revocation(
+                jti, select(literal(user_id), literal(self.expires_at(expires_at), self.model.expires_at.type))
+            ).returning(self.model.id)
+        )
+        if result.first() is None:
+            return False
+
+        await self.uow.after_commit(lambda: self.cache_revocation(jti, expires_at))
+        return True
+
+    def rotation(self, jti: str, phone_number: str, expires_at: int) -> Select:
+        """ statement of `rotate`. """
+        user = (
+            select(UserModel.id, UserModel.phone_number, UserModel.role, UserModel.is_active)
+            .where(UserModel.phone_number == phone_number)
+            .cte("refresh_user")
+        )
+        revoked = (
+            self.insert_revocation(
+                jti, select(user.c.id, literal(self.expires_at(expires_at), self.model.expires_at.type))
+            )
+            .returning(self.model.user_id)
+            .cte("revoked")
+        )
+        return select(user).join(revoked, revoked.c.user_id == user.c.id)
+
+    async def rotate(self, jti: str, phone_number: str, expires_at: int) -> Row | None:
+        """
+        Revoke a refresh token and load its user in one statement:
+        `WITH user ... INSERT ... WHERE NOT EXISTS ... ON CONFLICT DO NOTHING RETURNING`.
+        A row back proves the token was unused, so two concurrent refreshes
+        with the same token can't both succeed. Returns `id, phone_number,
+        role, is_active` of the user, None if the token was used or the user is gone.
+        """
+        result = await self.db.execute(self.rotation(jti, phone_number, expires_at))
+        row = result.one_or_none()
+
+        if row is not None:
+            await self.uow.after_commit(lambda: self.cache_revocation(jti, expires_at))
+
+        return row
+
+    def insert_revocation(self, jti: str, values: Select):
+        """
+        `INSERT` of `jti` with the `user_id, expires_at` of `values`, nothing is
+        inserted if `jti` is already revoked: same `(jti, expires_at)` for
+        concurrent inserts, any `expires_at` for migrated rows.
+        """
+        return (
+            insert(self.model)
+            .from_select(
+                ["user_id", "expires_at", "jti"],
+                values.add_columns(literal(jti)).where(~exists().where(self.model.jti == jti)),
+            )
+            .on_conflict_do_nothing(index_elements=[self.model.jti, self.model.expires_at])
         )
-        return bool(result.one_or_none())
+
+    def expires_at(self, timestamp: int) -> datetime:
+        """ partition key of a revocation, the token `exp`. Same token, same key. """
+        return datetime.fromtimestamp(timestamp, timezone.utc)
+
+    async def cache_revocation(self, jti: str, expires_at: int) -> None:
+        ttl = int(expires_at - datetime.now(timezone.utc).timestamp())
+        if ttl > 0:
+            await self._redis_repository.redis.set(REVOKED_TOKEN_KEY.format(jti=jti), 1, ex=ttl)
+
+    def schedule_rebuild(self) -> None:
+        """ at most once a minute per worker, the task itself holds a lock too. """
+        from src.tasks.revoked_token import rebuild_revoked_tokens
+
+        now = time.monotonic()
+        if now - RevokedTokenRepository._rebuild_scheduled_at < 60:
+            return
+
+        RevokedTokenRepository._rebuild_scheduled_at = now
+        rebuild_revoked_tokens.delay()
@@ -1,26 +1,121 @@
+import asyncio
+import hashlib
 import json
-from typing import Any, Type, List
+import logging
+from datetime import date, datetime
+from enum import Enum
+from contextlib import asynccontextmanager
+from functools import wraps
+from inspect import signature
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, Iterable, Sequence, Set, Tuple, Type, List
 from abc import ABC, abstractmethod
 
 from fastapi import Depends
+from geoalchemy2 import Geometry, WKBElement
 from redis import Redis
-from sqlalchemy import select
+from sqlalchemy import Column, Row, Select, delete, insert, inspect, select, tuple_, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.util import identity_key
+from sqlalchemy.orm.attributes import set_committed_value
 from pydantic import BaseModel
 
+from src.config import setting
 from src.core.redis import get_redis
-from src.core.postgres import get_postdb
+from src.core.postgres import get_postdb, primary_reads
 from src.models.base import Base
+from src.utils.cache import LRUCache
+from src.utils.codec import Codec, get_codec
+from src.utils.metrics import metrics
+from src.utils.pagination import Page, decode_cursor, encode_cursor
+
+
+logger = logging.getLogger("mechanic")
+
+class UnitOfWork:
+    """
+    - One transaction per request: repositories only `save` (flush) and
+      `unit_of_work` commits once the endpoint returned, or rolls back if it raised.
+    - Work that must only see committed data, like cache invalidation, goes
+      through `after_commit`. The write is committed by then: a failing
+      callback is logged and counted, it doesn't fail the request or skip
+      the others.
+    - The `autocommit` route dependency opts out, every `save` commits right away.
+    - State lives in `session.info`, every repository of a request shares it.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    @property
+    def autocommit(self) -> bool:
+        return self.db.info.get("autocommit", False)
+
+    @autocommit.setter
+    def autocommit(self, value: bool) -> None:
+        self.db.info["autocommit"] = value
+
+    async def save(self) -> None:
+        if self.autocommit:
+            await self.commit()
+        else:
+            await self.db.flush()
+
+    async def after_commit(self, callback: Callable[[], Awaitable[Any]]) -> None:
+        if self.autocommit:
+            await self._run_callback(callback)
+        else:
+            self.db.info.setdefault("after_commit", []).append(callback)
+
+    async def commit(self) -> None:
+        await self.db.commit()
+
+        for callback in self.db.info.pop("after_commit", []):
+            await self._run_callback(callback)
+
+    @staticmethod
+    async def _run_callback(callback: Callable[[], Awaitable[Any]]) -> None:
+        try:
+            await callback()
+        except Exception:
+            metrics.incr("unit_of_work.after_commit_errors")
+            logger.exception("after commit callback failed")
+
+    async def rollback(self) -> None:
+        self.db.info.pop("after_commit", None)
+        await self.db.rollback()
+
+
+async def unit_of_work(db: AsyncSession = Depends(get_postdb)) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Request transaction, use with `Depends(unit_of_work, scope="function")` so it
+    commits before the response is sent, the same scope everywhere shares one session.
+    """
+    uow = UnitOfWork(db)
+    try:
+        yield db
+    except Exception:
+        await uow.rollback()
+        raise
+
+    await uow.commit()
+
+
+async def autocommit(db: AsyncSession = Depends(unit_of_work, scope="function")) -> None:
+    """ route dependency opting out of the request transaction. """
+    UnitOfWork(db).autocommit = True
+
 
 class ISqlRepository(ABC):
 
     model: Type[Base] | None = None
 
-    def __init__(self, db: AsyncSession = Depends(get_postdb)):
+    def __init__(self, db: AsyncSession = Depends(unit_of_work, scope="function")):
         if self.model is None:
             raise NotImplementedError(f"model attribute need to be specified in `{self.__class__.__name__}`")
         
         self.db = db
+        self.uow = UnitOfWork(db)
 
     @abstractmethod
     async def create(self, schema: Type[BaseModel]) -> Type[Base]:
@@ -34,6 +129,18 @@ class ISqlRepository(ABC):
     async def delete(self, db_obj: Type[Base]) -> None:
         pass
 
+    @abstractmethod
+    async def bulk_create(self, schemas: List[Type[BaseModel]]) -> List[Type[Base]]:
+        pass
+
+    @abstractmethod
+    async def bulk_update(self, schemas: Dict[int | str, Type[BaseModel]], partial: bool) -> None:
+        pass
+
+    @abstractmethod
+    async def bulk_delete(self, pks: List[int | str]) -> None:
+        pass
+
     @abstractmethod
     async def get_by_id(self, pk: int | str) -> Type[Base] | None:
         pass
@@ -42,6 +149,12 @@ class ISqlRepository(ABC):
     async def list_all(self, limit=100, offset=0) -> List[Type[Base]]:
         pass
 
+    @abstractmethod
+    async def list_page(
+        self, limit=100, cursor: str | None = None, offset=0, schema: Type[BaseModel] | None = None
+    ) -> Page:
+        pass
+
 
 class SqlRepository(ISqlRepository):
 
@@ -50,6 +163,8 @@ class SqlRepository(ISqlRepository):
     - Don't forget rewrite model
     - Needs to use fastAPI Depends in services to can intract with.
     - If need sync method, add `sync` at last of method name.
+    - Writes only flush, the request `unit_of_work` commits them all at once.
+    - `keyset` are the columns pages are ordered by, `("created_at", "id")` or `("id",)`.
 
     Exmaple::
 
@@ -65,12 +180,16 @@ class SqlRepository(ISqlRepository):
     
     """
 
+    keyset: Tuple[str, ...] = ("id",)
+    # unique columns whose lookups are remembered for the request, besides `id`
+    identity_columns: Tuple[str, ...] = ()
+
     async def create(self, schema):
         db_obj = self.model(**schema.model_dump())
         
         self.db.add(db_obj)
-        await self.db.commit()
-        await self.db.refresh(db_obj)
+        await self.uow.save()
+        self.remember(db_obj)
         
         return db_obj
 
@@ -82,40 +201,666 @@ class SqlRepository(ISqlRepository):
                 setattr(db_obj, field, value)
 
         self.db.add(db_obj)
-        await self.db.commit()
-        await self.db.refresh(db_obj)
+        await self.uow.save()
         
         return db_obj
 
     async def delete(self, db_obj):
         await self.db.delete(db_obj)
-        await self.db.commit()
+        await self.uow.save()
+
+    async def bulk_create(self, schemas):
+        """ multi row `INSERT ... RETURNING`, batched by the driver, rows come back in `schemas` order. """
+        if not schemas:
+            return []
+
+        result = await self.db.scalars(
+            insert(self.model).returning(self.model, sort_by_parameter_order=True),
+            [schema.model_dump() for schema in schemas],
+        )
+        db_objs = result.all()
+        await self.uow.save()
+
+        return db_objs
+
+    async def bulk_update(self, schemas, partial):
+        """ `{pk: schema}`, executemany `UPDATE ... WHERE id = ?`. """
+        columns = inspect(self.model).columns.keys()
+        rows = [
+            {
+                **{
+                    field: value
+                    for field, value in schema.model_dump(exclude_unset=partial).items()
+                    if field in columns
+                },
+                "id": pk,
+            }
+            for pk, schema in schemas.items()
+        ]
+        if not rows:
+            return
+
+        await self.db.execute(update(self.model), rows)
+        await self.uow.save()
+
+    async def bulk_delete(self, pks):
+        if not pks:
+            return
+
+        await self.db.execute(delete(self.model).where(self.model.id.in_(pks)))
+        await self.uow.save()
 
     async def get_by_id(self, pk):
+        db_obj = self.recall("id", pk)
+        if db_obj is not None:
+            return db_obj
+
         result = await self.db.execute(select(self.model).where(self.model.id == pk))
-        return result.scalar_one_or_none()
+        db_obj = result.scalar_one_or_none()
+        if db_obj is not None:
+            self.remember(db_obj)
+
+        return db_obj
+
+    def remember(self, db_obj) -> None:
+        """ keep `db_obj` for the rest of the request, every repository of the request shares the session. """
+        identity = self.db.info.setdefault("identity", {})
+        for column in ("id", *self.identity_columns):
+            identity[(self.model, column, getattr(db_obj, column))] = db_obj
+
+    def recall(self, column: str, value: Any, partial: bool = False):
+        """
+        - Instance already loaded in this request by `column`, `None` if there is
+          none or it was deleted or expired since.
+        - `partial` accepts instances rebuilt from caches with columns left out.
+        """
+        db_obj = self.db.info.get("identity", {}).get((self.model, column, value))
+        if db_obj is None and column == "id":
+            db_obj = self.db.identity_map.get(identity_key(self.model, value))
+        if db_obj is None:
+            return None
+
+        state = inspect(db_obj)
+        if state.was_deleted or state.expired or (state.expired_attributes and not partial):
+            return None
+
+        self.db.info["avoided_queries"] = self.db.info.get("avoided_queries", 0) + 1
+        metrics.incr("identity_map.avoided_queries")
+
+        return db_obj
     
     async def list_all(self, limit, offset):
         result = await self.db.execute(select(self.model).limit(limit).offset(offset))
         return result.scalars().all()
 
+    async def list_page(self, limit, cursor=None, offset=0, schema=None):
+        stmt = select(self.model) if schema is None else self.project(schema)
+        return await self.paginate(stmt, limit, cursor, offset)
+
+    def project(self, schema: Type[BaseModel], stmt: Select | None = None) -> Select:
+        """
+        - `stmt` (default every row of `model`) selecting only the columns of the
+          `schema` fields and `keyset`, it returns rows instead of instances: no
+          identity map, no attribute instrumentation.
+        - Fields that aren't columns of `model` are left to their default, a
+          required one (e.g. a relationship) is a `ValueError`: load instances.
+        - Build the response with `json_list` / `paginated_json`.
+        """
+        columns = inspect(self.model).columns
+        missing = [
+            name for name, field in schema.model_fields.items() if name not in columns and field.is_required()
+        ]
+        if missing:
+            raise ValueError(f"{schema.__name__} fields {missing} aren't columns of {self.model.__name__}.")
+
+        stmt = select(self.model) if stmt is None else stmt
+        names = [name for name in schema.model_fields if name in columns]
+        names += [name for name in self.keyset if name not in names]
+        return stmt.with_only_columns(*(getattr(self.model, name) for name in names))
+
+    async def stream(
+        self, schema: Type[BaseModel], stmt: Select | None = None, batch_size: int | None = None
+    ) -> AsyncGenerator[Sequence[Row], None]:
+        """
+        `project` rows of `stmt` ordered by `keyset`, in batches of `batch_size`
+        (`EXPORT_BATCH_SIZE`) from a server side cursor. Only one batch is in
+        memory whatever the table size.
+        """
+        stmt = self.project(schema, stmt).order_by(*(getattr(self.model, name) for name in self.keyset))
+        result = await self.db.stream(
+            stmt.execution_options(yield_per=batch_size or setting.EXPORT_BATCH_SIZE)
+        )
+        async for rows in result.partitions():
+            yield rows
+
+    async def paginate(self, stmt: Select, limit: int, cursor: str | None = None, offset: int = 0) -> Page:
+        """
+        - Keyset pagination of `stmt` ordered by `keyset` columns, the cost of a page
+          doesn't depend on how deep it is.
+        - `cursor` is the `next_cursor` of the previous page, `offset` is only
+          used without a cursor for old clients.
+        """
+        columns = [getattr(self.model, name) for name in self.keyset]
+
+        if cursor is not None:
+            stmt = stmt.where(tuple_(*columns) > tuple_(*decode_cursor(cursor, columns)))
+        elif offset:
+            stmt = stmt.offset(offset)
+
+        if limit <= 0:
+            return Page([])
+
+        result = await self.db.execute(stmt.order_by(*columns).limit(limit + 1))
+        items = result.all() if is_projection(stmt) else result.scalars().all()
+
+        if len(items) <= limit:
+            return Page(items)
+
+        items = items[:limit]
+        return Page(items, encode_cursor([getattr(items[-1], name) for name in self.keyset]))
+
+    def dump_instance(
+        self, db_obj, exclude: Iterable[str] = (), relationships: Iterable[str] = ()
+    ) -> Dict[str, Any]:
+        """
+        column values of `db_obj` as a json friendly dict, for caches.
+        `relationships` are dumped nested, `exclude` applies to them too.
+        """
+        data = {}
+        for column in inspect(type(db_obj)).columns:
+            if column.key in exclude:
+                continue
+
+            data[column.key] = dump_value(getattr(db_obj, column.key))
+
+        for key in relationships:
+            related = getattr(db_obj, key)
+            if isinstance(related, list):
+                data[key] = [self.dump_instance(item, exclude) for item in related]
+            else:
+                data[key] = None if related is None else self.dump_instance(related, exclude)
+
+        return data
+
+    async def load_instance(self, data: Dict[str, Any]):
+        """
+        Rebuild an instance from `dump_instance` output without a query.
+        Columns missing from `data` are expired, the instance is merged into
+        the current session so it can be updated like a loaded one.
+        """
+        # never overwrite an instance the request already has, it may have pending changes,
+        # unless a commit or rollback expired it
+        db_obj = self.db.identity_map.get(identity_key(self.model, data["id"]))
+        if db_obj is None or inspect(db_obj).expired:
+            db_obj = await self.db.merge(self._build_instance(self.model, data), load=False)
+
+        self.remember(db_obj)
+        return db_obj
+
+    def _build_instance(self, model: Type[Base], data: Dict[str, Any]):
+        mapper = inspect(model)
+
+        values = {}
+        for column in mapper.columns:
+            if column.key in data:
+                values[column.key] = load_value(column, data[column.key])
+
+        db_obj = model(**values)
+        make_transient_to_detached(db_obj)
+
+        # set as loaded, assigning would fire backrefs and make both sides dirty
+        for key, relationship in mapper.relationships.items():
+            if key not in data:
+                continue
+
+            related = relationship.mapper.class_
+            if isinstance(data[key], list):
+                value = [self._build_instance(related, item) for item in data[key]]
+            else:
+                value = None if data[key] is None else self._build_instance(related, data[key])
+            set_committed_value(db_obj, key, value)
+
+        return db_obj
+
+    def dump_row(self, row: Row) -> Dict[str, Any]:
+        """ `project` row as a json friendly dict, for caches. """
+        return {key: dump_value(value) for key, value in row._mapping.items()}
+
+    def load_row(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """ `dump_row` output with column types restored, validates like the row. """
+        columns = inspect(self.model).columns
+        return {key: load_value(columns[key], value) for key, value in data.items()}
+
+
+def is_projection(stmt: Select) -> bool:
+    """ False when `stmt` selects a single entity (instances), True for columns (rows). """
+    descriptions = stmt.column_descriptions
+    return len(descriptions) != 1 or descriptions[0]["expr"] is not descriptions[0]["entity"]
+
+
+def dump_value(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, WKBElement):
+        return value.desc
+    return value
+
+
+def load_value(column: Column, value: Any) -> Any:
+    if value is None:
+        return None
+    if isinstance(column.type, Geometry):
+        return WKBElement(value, srid=column.type.srid, extended=True)
+
+    python_type = column.type.python_type
+    if python_type in (datetime, date):
+        return python_type.fromisoformat(value)
+    if issubclass(python_type, Enum):
+        return python_type(value)
+    return value
+
+
+class RedisPipeline:
+    """ commands of `RedisRepository.pipeline`, values go through the codec. """
+
+    def __init__(self, repository: "RedisRepository", pipe):
+        self._repository = repository
+        self._pipe = pipe
+        # namespaced key of each queued `get`, None for commands whose reply is kept as is
+        self._decoded: List[str | None] = []
+        self.results: List[Any] = []
+
+    def get(self, key: str) -> None:
+        key = self._repository.namespaced(key)
+        self._pipe.get(key)
+        self._decoded.append(key)
+
+    def set(self, key: str, value: Any, expire: int | None = None) -> None:
+        self._pipe.set(self._repository.namespaced(key), self._repository.codec.encode(value), ex=expire)
+        self._decoded.append(None)
+
+    def delete(self, key: str) -> None:
+        self._pipe.delete(self._repository.namespaced(key))
+        self._decoded.append(None)
+
+    def incr(self, key: str) -> None:
+        self._pipe.incr(self._repository.namespaced(key))
+        self._decoded.append(None)
+
+    def expire(self, key: str, seconds: int) -> None:
+        self._pipe.expire(self._repository.namespaced(key), seconds)
+        self._decoded.append(None)
+
+    def __len__(self) -> int:
+        return len(self._decoded)
+
+    async def execute(self) -> List[Any]:
+        results = await self._pipe.execute() if self._decoded else []
+        gets = [(i, key) for i, key in enumerate(self._decoded) if key is not None]
+        values = await self._repository.decode_many([key for _, key in gets], [results[i] for i, _ in gets])
+        for (i, _), value in zip(gets, values):
+            results[i] = value
+
+        self._decoded = []
+        self.results = list(results)
+        return self.results
 
 
 class RedisRepository:
+    """
+    - Values are encoded with `REDIS_CODEC` (`json`, `orjson` or `msgpack`),
+      counters, locks and keys read by lua scripts are plain redis values, use
+      `incr` / `get_counter` or `self.redis` for those. A value written with
+      another codec reads as a miss and is deleted.
+    - `get_many`, `set_many` and `pipeline` cost one round trip whatever the
+      number of keys.
+    - `namespace` returns a repository on the same client whose keys are prefixed.
+
+    Exmaple::
+
+        async with repository.pipeline() as pipe:
+            for key in keys:
+                pipe.get(key)
+        values = pipe.results
+    """
+
+    codec: Codec = get_codec(setting.REDIS_CODEC)
+    prefix: str = ""
+
     def __init__(self, redis: Redis = Depends(get_redis)):
         self.redis = redis
 
+    def namespace(self, prefix: str) -> "RedisRepository":
+        repository = RedisRepository(self.redis)
+        repository.prefix = f"{self.prefix}{prefix}"
+        return repository
+
+    def namespaced(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def decode(self, value: bytes | None) -> Any | None:
+        if value is None:
+            return None
+        return self.codec.decode(value)
+
+    async def decode_many(self, keys: List[str], values: List[bytes | None]) -> List[Any | None]:
+        """
+        Values of namespaced `keys`. One that doesn't decode was written with
+        another codec, by a `REDIS_CODEC` change or a rolling deploy mixing
+        codecs: it's a miss and is deleted.
+        """
+        decoded, stale = [], []
+        for key, value in zip(keys, values):
+            try:
+                decoded.append(self.decode(value))
+            except ValueError:
+                decoded.append(None)
+                stale.append(key)
+
+        if stale:
+            metrics.incr("redis.decode_errors", len(stale))
+            await self.redis.delete(*stale)
+        return decoded
+
     async def get(self, key: str) -> Any | None:
-        value = await self.redis.get(key)
-        if value is not None:
-            return json.loads(value)
-        return None
+        key = self.namespaced(key)
+        return (await self.decode_many([key], [await self.redis.get(key)]))[0]
+
+    async def get_many(self, keys: List[str]) -> List[Any | None]:
+        if not keys:
+            return []
+        keys = [self.namespaced(key) for key in keys]
+        return await self.decode_many(keys, await self.redis.mget(keys))
 
     async def set(self, key: str, value: Any, expire: int | None = None) -> None:
-        await self.redis.set(key, json.dumps(value), ex=expire)
+        await self.redis.set(self.namespaced(key), self.codec.encode(value), ex=expire)
 
-    async def delete(self, key: str) -> None:
-        await self.redis.delete(key)
+    async def set_many(self, values: Dict[str, Any], expire: int | None = None) -> None:
+        if not values:
+            return
+        if expire is None:
+            await self.redis.mset({self.namespaced(key): self.codec.encode(value) for key, value in values.items()})
+            return
+
+        async with self.pipeline() as pipe:
+            for key, value in values.items():
+                pipe.set(key, value, expire)
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self.redis.delete(*map(self.namespaced, keys))
 
     async def incr(self, key: str) -> int:
-        return await self.redis.incr(key)
\ No newline at end of file
+        return await self.redis.incr(self.namespaced(key))
+
+    async def get_counter(self, key: str) -> int:
+        """ value of an `incr` counter, 0 if missing. """
+        return int(await self.redis.get(self.namespaced(key)) or 0)
+
+    @asynccontextmanager
+    async def pipeline(self) -> AsyncGenerator[RedisPipeline, None]:
+        """ queued commands are sent on exit, unless `execute` was awaited inside. """
+        async with self.redis.pipeline(transaction=False) as pipe:
+            queued = RedisPipeline(self, pipe)
+            yield queued
+            if len(queued):
+                await queued.execute()
+
+
+def model_tag(model: Type[Base]) -> str:
+    return f"cache_tag_{model.__tablename__}"
+
+
+async def bump_tags(redis_repository: RedisRepository, model: Type[Base], pks: Iterable[int | str] = ()) -> None:
+    """
+    Invalidates `cached_query` results of `model`, and of rows `pks` of it.
+    Writes of models without a `CachedSqlRepository` that other queries
+    `depends` on call it after commit.
+    """
+    tag = model_tag(model)
+
+    async with redis_repository.pipeline() as pipe:
+        for key in [tag, *(f"{tag}_{pk}" for pk in pks)]:
+            pipe.incr(key)
+            pipe.expire(key, setting.QUERY_CACHE_TAG_EXPIRE)
+
+    for cache in CachedSqlRepository._local_caches.get(tag, ()):
+        cache.clear()
+
+
+class CachedSqlRepository(SqlRepository):
+    """
+    - `SqlRepository` whose `cached_query` methods are served from redis.
+    - Every model has a version tag and every row a primary key tag, crud
+      writes bump both after commit. Custom write methods need to call `bump_tags`
+      through `uow.after_commit`.
+    """
+
+    # tag -> L1 caches of the methods depending on it, cleared on local writes
+    _local_caches: Dict[str, Set[LRUCache]] = {}
+    # redis key -> result of the query running in this worker
+    _inflight: Dict[str, asyncio.Future] = {}
+
+    def __init__(
+        self,
+        db: AsyncSession = Depends(unit_of_work, scope="function"),
+        redis_repository: RedisRepository = Depends(RedisRepository),
+    ):
+        super().__init__(db)
+        self._redis_repository = redis_repository
+        self._query_cache = redis_repository.namespace("query_")
+
+    def model_tag(self, model: Type[Base] | None = None) -> str:
+        return model_tag(model or self.model)
+
+    def pk_tag(self, pk: int | str) -> str:
+        return f"{self.model_tag()}_{pk}"
+
+    async def bump_tags(self, pks: Iterable[int | str] = ()) -> None:
+        await bump_tags(self._redis_repository, self.model, pks)
+
+    async def create(self, schema):
+        db_obj = await super().create(schema)
+        await self.uow.after_commit(lambda: self.bump_tags([db_obj.id]))
+
+        return db_obj
+
+    async def update(self, db_obj, schema, partial):
+        db_obj = await super().update(db_obj, schema, partial)
+        await self.uow.after_commit(lambda: self.bump_tags([db_obj.id]))
+
+        return db_obj
+
+    async def delete(self, db_obj):
+        await super().delete(db_obj)
+        await self.uow.after_commit(lambda: self.bump_tags([db_obj.id]))
+
+    async def bulk_create(self, schemas):
+        db_objs = await super().bulk_create(schemas)
+        if db_objs:
+            pks = [db_obj.id for db_obj in db_objs]
+            await self.uow.after_commit(lambda: self.bump_tags(pks))
+
+        return db_objs
+
+    async def bulk_update(self, schemas, partial):
+        await super().bulk_update(schemas, partial)
+        if schemas:
+            pks = list(schemas.keys())
+            await self.uow.after_commit(lambda: self.bump_tags(pks))
+
+    async def bulk_delete(self, pks):
+        await super().bulk_delete(pks)
+        if pks:
+            await self.uow.after_commit(lambda: self.bump_tags(pks))
+
+    def dump_result(self, result: Any, exclude: Iterable[str], relationships: Iterable[str]) -> Dict[str, Any]:
+        if isinstance(result, Page):
+            return {**self.dump_items(result.items, exclude, relationships), "next_cursor": result.next_cursor}
+        if isinstance(result, (list, tuple)):
+            return self.dump_items(result, exclude, relationships)
+
+        return {"item": None if result is None else self.dump_instance(result, exclude, relationships)}
+
+    def dump_items(self, items: List[Any], exclude: Iterable[str], relationships: Iterable[str]) -> Dict[str, Any]:
+        """ instances as `items`, `project` rows as `rows`. """
+        if items and isinstance(items[0], Row):
+            return {"rows": [self.dump_row(row) for row in items]}
+        return {"items": [self.dump_instance(item, exclude, relationships) for item in items]}
+
+    async def load_result(self, data: Dict[str, Any]) -> Any:
+        if "item" in data:
+            return None if data["item"] is None else await self.load_instance(data["item"])
+
+        if "rows" in data:
+            items = [self.load_row(row) for row in data["rows"]]
+        else:
+            items = [await self.load_instance(item) for item in data["items"]]
+        if "next_cursor" in data:
+            return Page(items, data["next_cursor"])
+
+        return items
+
+    async def fetch_cached(
+        self, name: str, key: str, ttl: int, query: Callable[[], Awaitable[Any]], dump: Callable[[Any], Dict]
+    ) -> Tuple[Dict[str, Any], Any]:
+        """
+        Returns the cached data and, when this call ran the query, its result.
+        Only one caller per key runs the query: in this worker through `_inflight`,
+        across workers through a redis lock, the others wait for its result.
+        The query reads from the primary, see `primary_reads`.
+        """
+        data = await self._query_cache.get(key)
+        if data is not None:
+            metrics.incr(f"cache.{name}.redis_hit")
+            return data, None
+
+        metrics.incr(f"cache.{name}.redis_miss")
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            metrics.incr(f"cache.{name}.wait")
+            return await asyncio.shield(inflight), None
+
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+
+        lock_key = f"{key}_lock"
+        locked = False
+        try:
+            locked = await self._query_cache.redis.set(
+                self._query_cache.namespaced(lock_key), 1, nx=True, px=int(setting.QUERY_CACHE_LOCK_TIMEOUT * 1000)
+            )
+            if not locked:
+                metrics.incr(f"cache.{name}.wait")
+                data = await self._wait_for(key)
+                if data is not None:
+                    future.set_result(data)
+                    return data, None
+
+            with primary_reads(self.db):
+                result = await query()
+            data = dump(result)
+            await self._query_cache.set(key, data, ttl)
+            future.set_result(data)
+
+            return data, result
+        except BaseException as e:
+            if not future.done():
+                future.set_exception(e)
+            raise
+        finally:
+            del self._inflight[key]
+            if locked:
+                await self._query_cache.delete(lock_key)
+
+    async def _wait_for(self, key: str) -> Dict[str, Any] | None:
+        for _ in range(int(setting.QUERY_CACHE_LOCK_TIMEOUT / 0.05)):
+            await asyncio.sleep(0.05)
+            data = await self._query_cache.get(key)
+            if data is not None:
+                return data
+        return None
+
+
+def cached_query(
+    ttl: int | None = None,
+    pk_arg: str | None = None,
+    depends: Iterable[Type[Base]] = (),
+    exclude: Iterable[str] = (),
+    relationships: Iterable[str] = (),
+):
+    """
+    Caches a read method of a `CachedSqlRepository` in redis, with a short lived
+    per worker L1 in front of it.
+
+    - The redis key holds the current versions of the method tags, so a write
+      makes older entries unreachable and they expire with `ttl`.
+    - With `pk_arg` only writes of that row invalidate, otherwise any write of
+      the model or of the `depends` models.
+    - Loaded instances have only their columns and `relationships`, `exclude`
+      columns are left out of redis (e.g. password hashes).
+    - Metrics are `cache.query.<Repository>.<method>.*`.
+
+    Exmaple::
+
+        class ExampleRepository(CachedSqlRepository):
+            model = ExampleModel
+
+            @cached_query(pk_arg="pk")
+            async def get_by_id(self, pk):
+                return await super().get_by_id(pk)
+    """
+    ttl = ttl or setting.QUERY_CACHE_TTL
+    exclude = tuple(exclude)
+    relationships = tuple(relationships)
+
+    def decorator(func):
+        name = f"query.{func.__qualname__}"
+        l1 = LRUCache(name, maxsize=setting.QUERY_CACHE_L1_SIZE, ttl=setting.QUERY_CACHE_L1_TTL)
+        func_signature = signature(func)
+
+        @wraps(func)
+        async def wrapper(self: CachedSqlRepository, *args, **kwargs):
+            bound = func_signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            arguments = json.dumps(list(bound.arguments.values())[1:], default=str)
+
+            if pk_arg is None:
+                tags = [self.model_tag(model) for model in (self.model, *depends)]
+            else:
+                tags = [self.pk_tag(bound.arguments[pk_arg])]
+            for tag in [self.model_tag(model) for model in (self.model, *depends)]:
+                self._local_caches.setdefault(tag, set()).add(l1)
+
+            if pk_arg is not None:
+                db_obj = self.recall("id", bound.arguments[pk_arg], partial=True)
+                if db_obj is not None:
+                    return db_obj
+
+            data = l1.get(arguments)
+            if data is None:
+                versions = await self._redis_repository.redis.mget(tags)
+                key = f"{func.__qualname__}_" + hashlib.sha256(
+                    json.dumps([arguments, [version and version.decode() for version in versions]]).encode()
+                ).hexdigest()
+
+                data, result = await self.fetch_cached(
+                    name,
+                    key,
+                    ttl,
+                    lambda: func(self, *args, **kwargs),
+                    lambda result: self.dump_result(result, exclude, relationships),
+                )
+                l1.set(arguments, data)
+                if result is not None:
+                    return result
+
+            return await self.load_result(data)
+
+        return wrapper
+
+    return decorator
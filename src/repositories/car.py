@@ -1,6 +1,7 @@
-from typing import List
+from typing import List, Type
 
-from sqlalchemy import select
+from pydantic import BaseModel
+from sqlalchemy import Row, select
 from sqlalchemy.orm import selectinload
 
 from src.models.car import Car as CarModel
@@ -23,8 +24,11 @@ class CarRepository(SqlRepository):
         )
         return result.scalar_one_or_none()
     
-    async def list_user_cars(self, user_id: int) -> List[CarModel]:
-        result = await self.db.execute(
-            select(self.model).where(self.model.user_id == user_id)
-        )
+    async def list_user_cars(self, user_id: int, schema: Type[BaseModel] | None = None) -> List[CarModel] | List[Row]:
+        stmt = select(self.model).where(self.model.user_id == user_id)
+        if schema is not None:
+            result = await self.db.execute(self.project(schema, stmt))
+            return result.all()
+
+        result = await self.db.execute(stmt)
         return result.scalars().all()
\ No newline at end of file
@@ -0,0 +1,8 @@
+"""
+Redis keys shared by the repositories and the celery tasks, kept free of
+imports so workers don't load the app stack to read them.
+"""
+
+REVOKED_TOKEN_KEY = "revoked_{jti}"
+REVOKED_TOKEN_READY_KEY = "revoked_ready"
+REVOKED_TOKEN_REBUILD_LOCK = "revoked_rebuild"
@@ -1,16 +1,33 @@
 from sqlalchemy import select
 
-from src.repositories.base import SqlRepository
+from src.repositories.base import CachedSqlRepository, cached_query
 from src.models.mechanic import Mechanic as MechanicModel
 
 
 
-class MechanicRepository(SqlRepository):
+class MechanicRepository(CachedSqlRepository):
     model  = MechanicModel
 
+    identity_columns = ("user_id",)
+
+    @cached_query(pk_arg="pk")
+    async def get_by_id(self, pk):
+        return await super().get_by_id(pk)
+
+    @cached_query()
+    async def list_page(self, limit, cursor=None, offset=0, schema=None):
+        return await super().list_page(limit, cursor, offset, schema)
     
     async def get_by_user_id(self, user_id: int) -> MechanicModel | None:
+        db_obj = self.recall("user_id", user_id)
+        if db_obj is not None:
+            return db_obj
+
         result = await self.db.execute(
             select(self.model).where(self.model.user_id == user_id)
         )
-        return result.scalar_one_or_none()
\ No newline at end of file
+        db_obj = result.scalar_one_or_none()
+        if db_obj is not None:
+            self.remember(db_obj)
+
+        return db_obj
@@ -1,31 +1,49 @@
-from typing import List
+from typing import List, Type
 
+from pydantic import BaseModel
 from sqlalchemy import select
 
 from src.models.car import Car as CarModel
 from src.models.mechanic import Mechanic as MechanicModel
 from src.models.mechanic_car_request import MechanicCarRequest as MechanicCarRequestModel
-from src.repositories.base import SqlRepository
+from src.repositories.base import CachedSqlRepository
+from src.utils.pagination import Page
 
 
-class MechanicCarRequestRepository(SqlRepository):
+class MechanicCarRequestRepository(CachedSqlRepository):
     model = MechanicCarRequestModel
 
-    async def list_all_by_user_id(self, user_id: int) -> List[MechanicCarRequestModel]:
-        result = await self.db.execute(
-            select(self.model)
-            .join(self.model.car)
-            .where(CarModel.user_id == user_id)
+    async def list_all_by_user_id(
+        self,
+        user_id: int,
+        limit: int,
+        offset: int,
+        cursor: str | None = None,
+        schema: Type[BaseModel] | None = None,
+    ) -> Page:
+        stmt = select(self.model).join(self.model.car).where(CarModel.user_id == user_id)
+        return await self.paginate(
+            stmt if schema is None else self.project(schema, stmt),
+            limit,
+            cursor,
+            offset,
         )
-        return result.scalars().all()
     
-    async def list_all_by_user_mechanic_id(self, mechaic_user_id: int) -> List[MechanicCarRequestModel]:
-        result = await self.db.execute(
-            select(self.model)
-            .join(self.model.mechanic)
-            .where(MechanicModel.user_id == mechaic_user_id)
+    async def list_all_by_user_mechanic_id(
+        self,
+        mechaic_user_id: int,
+        limit: int,
+        offset: int,
+        cursor: str | None = None,
+        schema: Type[BaseModel] | None = None,
+    ) -> Page:
+        stmt = select(self.model).join(self.model.mechanic).where(MechanicModel.user_id == mechaic_user_id)
+        return await self.paginate(
+            stmt if schema is None else self.project(schema, stmt),
+            limit,
+            cursor,
+            offset,
         )
-        return result.scalars().all()
 
     async def get_by_user_id_and_mechanic_request_id(self, mechanic_request_id: int, user_id: int) -> List[MechanicCarRequestModel]:
         result = await self.db.execute(
@@ -1,21 +1,28 @@
-from typing import List
-
 from sqlalchemy import select
 from sqlalchemy.orm import selectinload
 
 from src.models.user import User as UserModel
+from src.models.mechanic import Mechanic as MechanicModel
 from src.models.mechanic_comments import MechanicComment as MechanicCommentModel
 from src.models.mechanic_car_request import MechanicCarRequest as MechanicCarRequestModel
-from src.repositories.base import SqlRepository
+from src.repositories.base import CachedSqlRepository, cached_query
+from src.utils.pagination import Page
 
 
-class MechanicCommentRepository(SqlRepository):
+class MechanicCommentRepository(CachedSqlRepository):
     model = MechanicCommentModel
 
+    keyset = ("created_at", "id")
+
+    @cached_query(
+        depends=(MechanicCarRequestModel, MechanicModel, UserModel),
+        exclude=("password",),
+        relationships=("mechanic_request", "user"),
+    )
     async def get_mechanic_comments_by_mechanic_id(
-        self, mechanic_id: int, limit:int, offset:int
-    ) -> List[MechanicCommentModel]:
-        result = await self.db.execute(
+        self, mechanic_id: int, limit:int, offset:int, cursor: str | None = None
+    ) -> Page:
+        return await self.paginate(
             select(self.model)
             .join(
                 MechanicCarRequestModel,
@@ -25,9 +32,8 @@ class MechanicCommentRepository(SqlRepository):
             .options(
                 selectinload(self.model.mechanic_request),
                 selectinload(self.model.user)
-            )
-            .limit(limit)
-            .offset(offset)
+            ),
+            limit,
+            cursor,
+            offset,
         )
-
-        return result.scalars().all()
\ No newline at end of file
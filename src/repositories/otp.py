@@ -0,0 +1,143 @@
+import time
+from typing import Tuple
+from uuid import uuid4
+
+from fastapi import Depends
+from redis.asyncio import Redis
+
+from src.core.redis import get_redis
+from src.repositories.base import RedisRepository
+
+
+# KEYS[1] otp key | ARGV[1] code, ARGV[2] ttl
+# 1 issued, 0 an unexpired code already exists
+ISSUE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'code', ARGV[1], 'attempts', 0)
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+# KEYS[1] otp key | ARGV[1] code, ARGV[2] max attempts
+# 1 verified and consumed, 0 wrong code, -1 missing or expired
+VERIFY_SCRIPT = """
+local code = redis.call('HGET', KEYS[1], 'code')
+if not code then
+    return -1
+end
+if code == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    return 1
+end
+if redis.call('HINCRBY', KEYS[1], 'attempts', 1) >= tonumber(ARGV[2]) then
+    redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# KEYS[1] rejected key, KEYS[2] otp key, KEYS[3] ip window, KEYS[4] phone window
+# ARGV[1] now (ms), ARGV[2] window (ms), ARGV[3] ip limit, ARGV[4] phone limit, ARGV[5] member
+# {stage, cached status}, stage is `admitted` or the stage that shed the request
+ADMIT_SCRIPT = """
+local rejected = redis.call('GET', KEYS[1])
+if rejected then
+    return {'rejected', tonumber(rejected)}
+end
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    return {'otp_live', 0}
+end
+local since = tonumber(ARGV[1]) - tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[3], '-inf', since)
+redis.call('ZREMRANGEBYSCORE', KEYS[4], '-inf', since)
+if redis.call('ZCARD', KEYS[3]) >= tonumber(ARGV[3]) then
+    return {'ip', 0}
+end
+if redis.call('ZCARD', KEYS[4]) >= tonumber(ARGV[4]) then
+    return {'phone', 0}
+end
+for i = 3, 4 do
+    redis.call('ZADD', KEYS[i], ARGV[1], ARGV[5])
+    redis.call('PEXPIRE', KEYS[i], ARGV[2])
+end
+return {'admitted', 0}
+"""
+
+
+class OtpRepository(RedisRepository):
+    """
+    - One time passwords as a redis hash of code and failed attempts.
+    - `issue` and `verify` are server side scripts, one round trip each and
+      atomic under concurrency.
+    - A verified code is deleted in the same script, so it can't be replayed.
+      After `max_attempts` wrong codes the code is dropped as well.
+    - `admit` is the pre database gate of otp requests: recently rejected phone
+      numbers, a still valid code and per ip / per phone sliding windows.
+    """
+
+    def __init__(self, redis: Redis = Depends(get_redis)):
+        super().__init__(redis)
+        self._issue = self.redis.register_script(ISSUE_SCRIPT)
+        self._verify = self.redis.register_script(VERIFY_SCRIPT)
+        self._admit = self.redis.register_script(ADMIT_SCRIPT)
+        client_cache = getattr(self.redis, "client_cache", None)
+        if client_cache is not None:
+            # reads the rejected flag, writes only the windows
+            client_cache.read_only_scripts.add(self._admit.sha)
+
+    def key(self, purpose: str, phone_number: str) -> str:
+        return f"otp_{purpose}_{phone_number}"
+
+    async def issue(self, purpose: str, phone_number: str, code: int, expire: int) -> bool:
+        """ False if the previous code of this phone number is not expired yet. """
+        result = await self._issue(keys=[self.key(purpose, phone_number)], args=[code, expire])
+        return result == 1
+
+    async def verify(self, purpose: str, phone_number: str, code: int, max_attempts: int) -> bool:
+        result = await self._verify(keys=[self.key(purpose, phone_number)], args=[code, max_attempts])
+        return result == 1
+
+    async def admit(
+        self,
+        purpose: str,
+        phone_number: str,
+        ip: str,
+        window: int,
+        ip_limit: int,
+        phone_limit: int,
+    ) -> Tuple[str, int]:
+        """ returns `(stage, status_code)`, status_code is only set for rejected numbers. """
+        rejected_key = f"otp_rejected_{purpose}_{phone_number}"
+
+        # a number being shed is hammered, its flag is served from memory when tracked
+        client_cache = getattr(self.redis, "client_cache", None)
+        token = None
+        if client_cache is not None:
+            cached = client_cache.lookup(rejected_key)
+            if cached is not None and cached[0] is not None:
+                return "rejected", int(cached[0])
+            token = client_cache.begin(rejected_key)
+
+        stage, status_code = await self._admit(
+            keys=[
+                rejected_key,
+                self.key(purpose, phone_number),
+                f"otp_window_{purpose}_ip_{ip}",
+                f"otp_window_{purpose}_phone_{phone_number}",
+            ],
+            args=[int(time.time() * 1000), window * 1000, ip_limit, phone_limit, uuid4().hex],
+        )
+        stage = stage.decode()
+        if client_cache is not None:
+            # the script saw the flag, or its absence, like a `GET` would
+            client_cache.store(rejected_key, token, str(status_code).encode() if stage == "rejected" else None)
+        return stage, status_code
+
+    async def reject(self, purpose: str, phone_number: str, status_code: int, expire: int) -> None:
+        """ negative cache, `admit` sheds this phone number with `status_code` until expire. """
+        # read by the admit script, a plain number whatever the codec
+        await self.redis.set(f"otp_rejected_{purpose}_{phone_number}", status_code, ex=expire)
+
+    async def forget_rejection(self, purpose: str, phone_number: str) -> None:
+        await self.delete(f"otp_rejected_{purpose}_{phone_number}")
@@ -17,8 +17,7 @@ class MechanicPermissionRepository(SqlRepository):
         )
 
         self.db.add(db_obj)
-        await self.db.commit()
-        await self.db.refresh(db_obj)
+        await self.uow.save()
 
         return db_obj
 
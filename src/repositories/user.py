@@ -1,25 +1,240 @@
-from sqlalchemy import select
+from typing import Iterable, List, Sequence, Tuple
+from uuid import uuid4
+
+from fastapi import Depends
+from sqlalchemy import Row, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config import setting
+from src.core.postgres import primary_reads
 from src.models.user import User as UserModel, UserRole
-from src.repositories.base import SqlRepository
+from src.repositories.base import RedisRepository, SqlRepository, bump_tags, unit_of_work
+from src.utils.cache import LRUCache
+from src.utils.metrics import metrics
+
+
+# mirror of `user.session_epoch`, v2 keys don't collide with the redis only counters before it
+SESSION_EPOCH_KEY = "session_epoch_v2_{user_id}"
+
+# KEYS[1] epoch key | ARGV[1] epoch, ARGV[2] ttl
+# only ever raises the cached epoch, a slow reader can't put back an older one
+CACHE_SESSION_EPOCH_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]))
+if current == nil or tonumber(ARGV[1]) > current then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+end
+"""
+
+# random token replaced by every write of the user, guards cache fills against
+# a write committed while the fill was reading the row
+USER_VERSION_KEY = "user_version_{phone_number}"
+
+# KEYS[1] user cache key, KEYS[2] version key
+# ARGV[1] version read before the query ('' if none), ARGV[2] value, ARGV[3] ttl
+# 1 stored, 0 the user was written meanwhile
+STORE_USER_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
 
 
 class UserRepository(SqlRepository):
 
     model = UserModel
 
+    identity_columns = ("phone_number",)
+    # a change to any of them also invalidates tokens already issued, see `invalidate_sessions`
+    session_columns = ("phone_number", "password", "role", "is_active", "is_delete")
+
+    # short lived per worker tier in front of the shared redis tier
+    cache = LRUCache("user", maxsize=setting.USER_CACHE_SIZE, ttl=setting.USER_CACHE_TTL)
+
+    def __init__(
+        self,
+        db: AsyncSession = Depends(unit_of_work, scope="function"),
+        redis_repository: RedisRepository = Depends(RedisRepository),
+    ):
+        super().__init__(db)
+        self._redis_repository = redis_repository
+        self._user_cache = redis_repository.namespace("user_")
+        self._cache_session_epoch = redis_repository.redis.register_script(CACHE_SESSION_EPOCH_SCRIPT)
+        self._store_user = redis_repository.redis.register_script(STORE_USER_SCRIPT)
+
     async def get_by_phone_number(self, phone_number: str) -> UserModel | None:
+        db_obj = self.recall("phone_number", phone_number)
+        if db_obj is not None:
+            return db_obj
+
         result = await self.db.execute(
             select(self.model).where(
                 self.model.phone_number == phone_number,
             )
         )
-        return result.scalar_one_or_none()
+        db_obj = result.scalar_one_or_none()
+        if db_obj is not None:
+            self.remember(db_obj)
+
+        return db_obj
+
+    async def get_by_phone_number_cached(self, phone_number: str) -> UserModel | None:
+        """
+        Same as `get_by_phone_number` but served from the user cache when possible.
+        Password hash is never cached, don't use it for login. A fill racing a
+        write of the user isn't stored, see `STORE_USER_SCRIPT`, and it reads
+        from the primary.
+        """
+        db_obj = self.recall("phone_number", phone_number, partial=True)
+        if db_obj is not None:
+            return db_obj
+
+        data = self.cache.get(phone_number)
+
+        if data is None:
+            data = await self._user_cache.get(phone_number)
+            if data is None:
+                metrics.incr("cache.user.redis_miss")
+
+                version_key = USER_VERSION_KEY.format(phone_number=phone_number)
+                version = await self._redis_repository.redis.get(version_key)
+                with primary_reads(self.db):
+                    user = await self.get_by_phone_number(phone_number)
+                if user is None:
+                    return None
+
+                data = self.dump_instance(user, exclude=("password",))
+                stored = await self._store_user(
+                    keys=[self._user_cache.namespaced(phone_number), version_key],
+                    args=[version or b"", self._user_cache.codec.encode(data), setting.USER_CACHE_REDIS_TTL],
+                )
+                if stored:
+                    self.cache.set(phone_number, data)
+                else:
+                    metrics.incr("cache.user.stale_fill")
+                return user
+
+            metrics.incr("cache.user.redis_hit")
+            self.cache.set(phone_number, data)
+
+        return await self.load_instance(data)
+
+    async def get_session_epoch(self, user_id: int) -> int | None:
+        """ epoch of the user's tokens, None if the user is gone. """
+        cached = await self._redis_repository.redis.get(SESSION_EPOCH_KEY.format(user_id=user_id))
+        if cached is not None:
+            return int(cached)
+
+        with primary_reads(self.db):
+            result = await self.db.execute(select(self.model.session_epoch).where(self.model.id == user_id))
+        epoch = result.scalar_one_or_none()
+        if epoch is not None:
+            await self.cache_session_epochs([(user_id, epoch)])
+
+        return epoch
+
+    async def bump_session_epochs(self, user_ids: List[int]) -> None:
+        """ invalidates every token issued to the users before the commit. """
+        if not user_ids:
+            return
+
+        result = await self.db.execute(
+            update(self.model)
+            .where(self.model.id.in_(user_ids))
+            .values(session_epoch=self.model.session_epoch + 1)
+            .returning(self.model.id, self.model.session_epoch)
+        )
+        epochs = result.all()
+        await self.uow.save()
+        await self.uow.after_commit(lambda: self.cache_session_epochs(epochs))
+
+    async def cache_session_epochs(self, epochs: Iterable[Tuple[int, int]]) -> None:
+        for user_id, epoch in epochs:
+            await self._cache_session_epoch(
+                keys=[SESSION_EPOCH_KEY.format(user_id=user_id)], args=[epoch, setting.SESSION_EPOCH_REDIS_TTL]
+            )
+
+    async def forget_session_epochs(self, user_ids: Iterable[int]) -> None:
+        """ deleted users, the next lookup finds no user and rejects their tokens. """
+        keys = [SESSION_EPOCH_KEY.format(user_id=user_id) for user_id in user_ids]
+        if keys:
+            await self._redis_repository.redis.delete(*keys)
+
+    async def invalidate_cache(self, db_obj: UserModel) -> None:
+        await self.invalidate_many([db_obj])
+
+    async def update(self, db_obj, schema, partial):
+        db_obj = await super().update(db_obj, schema, partial)
+        await self.uow.after_commit(lambda: self.invalidate_cache(db_obj))
+
+        return db_obj
+
+    async def delete(self, db_obj):
+        await super().delete(db_obj)
+        await self.uow.after_commit(lambda: self.invalidate_deleted([db_obj]))
+
+    async def invalidate_sessions(self, db_obj: UserModel) -> None:
+        """ bumps the session epoch in the transaction, drops the cached user after commit. """
+        await self.bump_session_epochs([db_obj.id])
+        await self.uow.after_commit(lambda: self.invalidate_cache(db_obj))
+
+    async def invalidate_deleted(self, users: Sequence[Row]) -> None:
+        await self.invalidate_many(users)
+        await self.forget_session_epochs(user.id for user in users)
+
+    async def bulk_update(self, schemas, partial):
+        users = await self.cache_keys(list(schemas))
+        await super().bulk_update(schemas, partial)
+
+        fields = {field for schema in schemas.values() for field in schema.model_dump(exclude_unset=partial)}
+        if not fields.isdisjoint(self.session_columns):
+            await self.bump_session_epochs([user.id for user in users])
+        await self.uow.after_commit(lambda: self.invalidate_many(users))
+
+    async def bulk_delete(self, pks):
+        users = await self.cache_keys(pks)
+        await super().bulk_delete(pks)
+        await self.uow.after_commit(lambda: self.invalidate_deleted(users))
+
+    async def cache_keys(self, pks: List[int]) -> Sequence[Row]:
+        """ `id, phone_number` of users `pks`, what their caches and session epochs are keyed by. """
+        if not pks:
+            return []
+
+        result = await self.db.execute(
+            select(self.model.id, self.model.phone_number).where(self.model.id.in_(pks))
+        )
+        return result.all()
+
+    async def invalidate_many(self, users: Sequence[Row]) -> None:
+        """
+        Drops the cached users of `cache_keys` rows, and cached queries
+        embedding users, e.g. the authors of mechanic comments.
+        """
+        if not users:
+            return
+
+        async with self._redis_repository.redis.pipeline(transaction=False) as pipe:
+            for user in users:
+                self.cache.delete(user.phone_number)
+                # before the delete, a fill that read the old row can't store it anymore
+                pipe.set(
+                    USER_VERSION_KEY.format(phone_number=user.phone_number), uuid4().hex, ex=setting.USER_CACHE_REDIS_TTL
+                )
+                pipe.delete(self._user_cache.namespaced(user.phone_number))
+            await pipe.execute()
+        await bump_tags(self._redis_repository, self.model, [user.id for user in users])
 
     async def user_status(self, db_obj: UserModel, is_active: bool) -> UserModel:
         db_obj.is_active = is_active
 
         self.db.add(db_obj)
-        await self.db.commit()
+        await self.uow.save()
+        if is_active:
+            await self.uow.after_commit(lambda: self.invalidate_cache(db_obj))
+        else:
+            await self.invalidate_sessions(db_obj)
 
         return db_obj
 
@@ -27,8 +242,8 @@ class UserRepository(SqlRepository):
         db_obj.password = password
 
         self.db.add(db_obj)
-        await self.db.commit()
-        await self.db.refresh(db_obj)
+        await self.uow.save()
+        await self.invalidate_sessions(db_obj)
 
         return db_obj
 
@@ -37,19 +252,21 @@ class UserRepository(SqlRepository):
         db_obj.is_active = False
 
         self.db.add(db_obj)
-        await self.db.commit()
+        await self.uow.save()
+        await self.invalidate_sessions(db_obj)
 
     async def out_of_soft_delete(self, db_obj: UserModel) -> None:
         db_obj.is_delete = True
 
         self.db.add(db_obj)
-        await self.db.commit()
+        await self.uow.save()
+        await self.uow.after_commit(lambda: self.invalidate_cache(db_obj))
 
     async def change_user_role(self, db_obj: UserModel, role: UserRole) -> UserModel:
         db_obj.role = role
 
         self.db.add(db_obj)
-        await self.db.commit()
-        await self.db.refresh(db_obj)
+        await self.uow.save()
+        await self.invalidate_sessions(db_obj)
 
-        return db_obj
\ No newline at end of file
+        return db_obj
@@ -1,7 +1,7 @@
 from datetime import date, datetime
 from typing import List
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
 
 from src.schemas.mechanic_car_request import MechanicCarRequestOut
 
@@ -41,4 +41,7 @@ class CarOut(BaseModel):
 
 
 class GetCarOut(CarOut):
-    mechanic_requests: List[MechanicCarRequestOut]
\ No newline at end of file
+    mechanic_requests: List[MechanicCarRequestOut]
+
+
+CarOutList = TypeAdapter(List[CarOut])
@@ -0,0 +1,12 @@
+from enum import Enum
+
+
+class ExportTable(str, Enum):
+    car = "car"
+    mechanic_car_request = "mechanic_car_request"
+    mechanic_comment = "mechanic_comment"
+
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
@@ -1,6 +1,6 @@
 from typing import List
 
-from pydantic import BaseModel, ConfigDict, Field, field_validator
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter, field_validator
 from geoalchemy2.shape import from_shape, to_shape
 from shapely.geometry import Point
 
@@ -52,4 +52,7 @@ class MechanicOut(BaseModel):
             point = to_shape(geom)
             return [point.x, point.y]
         except Exception:
-            raise ValueError("Serializing geom went wrong.")
\ No newline at end of file
+            raise ValueError("Serializing geom went wrong.")
+
+
+MechanicOutList = TypeAdapter(List[MechanicOut])
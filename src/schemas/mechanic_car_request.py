@@ -1,6 +1,7 @@
 from datetime import datetime, date
+from typing import List
 
-from pydantic import BaseModel, ConfigDict, Field
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
 
 from src.models.mechanic_car_request import MechanicCarRequestStatus, MechanicCarRequestIssue
 
@@ -53,4 +54,7 @@ class GetMechanicCarRequestOut(BaseModel):
     mechanic_id: int
     car: CarOut
     created_at: datetime
-    updated_at: datetime | None
\ No newline at end of file
+    updated_at: datetime | None
+
+
+MechanicCarRequestOutList = TypeAdapter(List[MechanicCarRequestOut])
@@ -1,10 +1,9 @@
 from random import randint
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 
-from src.repositories.base import RedisRepository
+from src.repositories.otp import OtpRepository
 from src.schemas.auth import (
-    CreateRevokeToken,
     Login,
     SignupSendOTP,
     SignupVerifyOTP,
@@ -21,27 +20,84 @@ from src.utils.auth import UserPassword
 from src.utils.auth import jwt
 from src.config import setting
 from src.tasks.send_sms import send_sms
+from src.utils.metrics import metrics
 
 
 class AuthService:
+
+    OTP_REJECTIONS = {
+        status.HTTP_409_CONFLICT: "User with phone_number: {phone_number} exists.",
+        status.HTTP_404_NOT_FOUND: "User not found.",
+    }
+
     def __init__(
         self,
+        request: Request,
         repository: UserRepository = Depends(UserRepository),
         token_repository: RevokedTokenRepository = Depends(RevokedTokenRepository),
-        redis_repository: RedisRepository = Depends(RedisRepository),
+        otp_repository: OtpRepository = Depends(OtpRepository),
     ):
         self._repository = repository
         self._token_repository = token_repository
-        self._redis_repository = redis_repository
+        self._otp_repository = otp_repository
+        self._client_ip = request.client.host if request.client else "unknown"
 
     def OTP_token(slef) -> int:
         return randint(100000, 999999)
 
+    async def create_tokens(self, user: UserModel) -> TokenOut:
+        encode = {
+            "sub": user.phone_number,
+            "uid": user.id,
+            "role": user.role,
+            "is_active": user.is_active,
+            "epoch": await self._repository.get_session_epoch(user.id),
+        }
+
+        access_token = jwt.create_token(encode, TokenType.access_token)
+        refresh_token = jwt.create_token(encode, TokenType.refresh_token)
+
+        return TokenOut(
+            access_token=access_token, refresh_token=refresh_token, user_id=user.id
+        )
+
+    async def admit_otp_request(self, purpose: str, phone_number: str) -> None:
+        """ sheds abusive otp requests before any database query or password hash. """
+        stage, status_code = await self._otp_repository.admit(
+            purpose,
+            phone_number,
+            self._client_ip,
+            setting.OTP_WINDOW,
+            setting.OTP_IP_LIMIT,
+            setting.OTP_PHONE_LIMIT,
+        )
+        metrics.incr(f"otp_admission.{purpose}.{stage}")
+
+        if stage == "admitted":
+            return
+
+        if stage == "rejected":
+            raise HTTPException(
+                status_code=status_code,
+                detail=self.OTP_REJECTIONS[status_code].format(phone_number=phone_number),
+            )
+
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Too many Request.",
+        )
+
     async def signup_send_otp(self, signup: SignupSendOTP) -> None:
+        await self.admit_otp_request("signup", signup.phone_number)
+
         user = await self._repository.get_by_phone_number(signup.phone_number)
         if user is not None:
 
             if user.is_active == True:
+                metrics.incr("otp_admission.signup.database")
+                await self._otp_repository.reject(
+                    "signup", signup.phone_number, status.HTTP_409_CONFLICT, setting.OTP_REJECT_EXPIRE
+                )
                 raise HTTPException(
                     status_code=status.HTTP_409_CONFLICT,
                     detail=f"User with phone_number: {signup.phone_number} exists.",
@@ -51,26 +107,21 @@ class AuthService:
                 await self._repository.out_of_soft_delete(user)
 
         else:
-            signup.password = UserPassword.generate_password_hash(signup.password)
+            signup.password = await UserPassword.generate_password_hash_async(signup.password)
             user = await self._repository.create(signup)
+            await self._otp_repository.forget_rejection("reset", user.phone_number)
             
-        key = f"signup_{user.phone_number}"
+        # handling test user
+        test_user = setting.DEBUG and user.phone_number == "09445566778"
+        token = 555555 if test_user else self.OTP_token()
 
-        if await self._redis_repository.get(key):
+        if not await self._otp_repository.issue("signup", user.phone_number, token, setting.OTP_EXPIRE):
             raise HTTPException(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                 detail=f"Too mant request.",
             )
 
-        # handling test user
-        if setting.DEBUG and user.phone_number == "09445566778":
-            token = 555555
-            await self._redis_repository.set(key, token, setting.OTP_EXPIRE)
-
-        else:
-            token = self.OTP_token()
-            await self._redis_repository.set(key, token, setting.OTP_EXPIRE)
-            
+        if not test_user:
             if setting.DEBUG:
                 print(token)
             send_sms.delay(user.phone_number, f"`Mechanic` one time password: {token}")
@@ -85,24 +136,14 @@ class AuthService:
         if not user or user.is_active:
             raise invalid_token
 
-        key = f"signup_{user.phone_number}"
-        cache_token = await self._redis_repository.get(key)
-        if cache_token is None or int(cache_token) != signup.token:
+        if not await self._otp_repository.verify(
+            "signup", user.phone_number, signup.token, setting.OTP_MAX_ATTEMPTS
+        ):
             raise invalid_token
 
         user = await self._repository.user_status(user, True)
 
-        encode = {
-            "sub": user.phone_number,
-            "role": user.role,
-            "is_active": user.is_active,
-        }
-        access_token = jwt.create_token(encode, TokenType.access_token)
-        refresh_token = jwt.create_token(encode, TokenType.refresh_token)
-
-        return TokenOut(
-            access_token=access_token, refresh_token=refresh_token, user_id=user.id
-        )
+        return await self.create_tokens(user)
 
     async def login(self, login: Login) -> TokenOut:
         user = await self._repository.get_by_phone_number(login.phone_number)
@@ -117,54 +158,31 @@ class AuthService:
                 status_code=status.HTTP_406_NOT_ACCEPTABLE, detail=f"User is not active"
             )
 
-        if not UserPassword.verify_password(login.password, user.password):
+        if not await UserPassword.verify_password_async(login.password, user.password):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Phone number or password is wrong",
             )
 
-        encode = {
-            "sub": user.phone_number,
-            "role": user.role,
-            "is_active": user.is_active,
-        }
-        access_token = jwt.create_token(encode, TokenType.access_token)
-        refresh_token = jwt.create_token(encode, TokenType.refresh_token)
-
-        return TokenOut(
-            access_token=access_token, refresh_token=refresh_token, user_id=user.id
-        )
+        return await self.create_tokens(user)
 
     async def refresh_token(self, refresh_token: str) -> TokenOut:
         payload = jwt.verify_token(refresh_token, TokenType.refresh_token)
 
         jti = payload.get("jti")
-        if not jti or await self._token_repository.is_revoked_token(jti):
-            raise jwt.INVALID_TOKEN
-
         phone_number = payload.get("sub")
-        if not phone_number:
+        if not jti or not phone_number:
             raise jwt.INVALID_TOKEN
 
-        user = await self._repository.get_by_phone_number(phone_number)
+        user = await self._token_repository.rotate(jti, phone_number, payload["exp"])
         if user is None:
             raise jwt.INVALID_TOKEN
+        jwt.forget(refresh_token)
 
-        await self._token_repository.create(
-            CreateRevokeToken(jti=jti, user_id=user.id)
-        )
-
-        encode = {
-            "sub": user.phone_number,
-            "role": user.role,
-            "is_active": user.is_active,
-        }
+        if setting.STATELESS_AUTH and payload.get("epoch") != await self._repository.get_session_epoch(user.id):
+            raise jwt.INVALID_TOKEN
 
-        access_token = jwt.create_token(encode, TokenType.access_token)
-        refresh_token = jwt.create_token(encode, TokenType.refresh_token)
-        return TokenOut(
-            access_token=access_token, refresh_token=refresh_token, user_id=user.id
-        )
+        return await self.create_tokens(user)
     
     async def verify_token(self, access_token: str) -> TokenVerifyOut:
         jwt.verify_token(access_token, TokenType.access_token)
@@ -182,54 +200,52 @@ class AuthService:
         if not jti or await self._token_repository.is_revoked_token(jti):
             raise jwt.INVALID_TOKEN
 
-        await self._token_repository.create(
-            CreateRevokeToken(jti=jti, user_id=user.id)
-        )
+        if not await self._token_repository.revoke(jti, user.id, payload["exp"]):
+            raise jwt.INVALID_TOKEN
+        jwt.forget(refresh_token)
 
     
     async def send_reset_password_token(
         self, reset_password: ResetPaasword
     ) -> None:
         phone_number = reset_password.phone_number
+        await self.admit_otp_request("reset", phone_number)
 
         user = await self._repository.get_by_phone_number(phone_number)
         if not user:
+            metrics.incr("otp_admission.reset.database")
+            await self._otp_repository.reject(
+                "reset", phone_number, status.HTTP_404_NOT_FOUND, setting.OTP_REJECT_EXPIRE
+            )
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail=f"User not found."
             )
 
-        key = f"reset_{phone_number}"
+        # handling test user
+        test_user = setting.DEBUG and user.phone_number == "09445566778"
+        token = 555555 if test_user else self.OTP_token()
 
-        if await self._redis_repository.get(key):
+        if not await self._otp_repository.issue("reset", phone_number, token, setting.OTP_EXPIRE):
             raise HTTPException(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                 detail=f"Too many Request.",
             )
-                # handling test user
-        if setting.DEBUG and user.phone_number == "09445566778":
-            token = 555555
-            await self._redis_repository.set(key, token, setting.OTP_EXPIRE)
 
-        else:
-            token = self.OTP_token()
-            await self._redis_repository.set(key, token, setting.OTP_EXPIRE)
+        if not test_user:
             send_sms.delay(user.phone_number, f"`Mechanic` one time password: {token}")
     
     async def verify_reset_password_token(
         self, reset_password: VerifyResetPassword
     )-> None:
-        key = f"reset_{reset_password.phone_number}"
-
-        cache_token = await self._redis_repository.get(key)
-        if not cache_token or int(cache_token) != reset_password.token:
+        if not await self._otp_repository.verify(
+            "reset", reset_password.phone_number, reset_password.token, setting.OTP_MAX_ATTEMPTS
+        ):
             raise HTTPException(
                 status_code=status.HTTP_406_NOT_ACCEPTABLE,
                 detail=f"Token is invalid or expierd.",
             )
-        
-        await self._redis_repository.delete(key)
 
         user = await self._repository.get_by_phone_number(reset_password.phone_number)
-        password = UserPassword.generate_password_hash(reset_password.password)
+        password = await UserPassword.generate_password_hash_async(reset_password.password)
 
         await self._repository.reset_password(user, password)
\ No newline at end of file
@@ -1,11 +1,12 @@
 from typing import List
 
 from fastapi import Depends, HTTPException, status
+from sqlalchemy import Row
 
 from src.repositories.car import CarRepository
 from src.models.user import User as UserModel
 from src.models.car import Car as CarModel
-from src.schemas.car import CreateCar, UpdateCar
+from src.schemas.car import CarOut, CreateCar, UpdateCar
 
 
 class CarService:
@@ -30,8 +31,8 @@ class CarService:
 
         return db_obj
 
-    async def list_user_cars(self, user: UserModel) -> List[CarModel]:
-        return await self._repository.list_user_cars(user.id)
+    async def list_user_cars(self, user: UserModel) -> List[Row]:
+        return await self._repository.list_user_cars(user.id, CarOut)
 
     async def get_by_car_id_and_user_id(self, car_id: int, user: UserModel) -> CarModel:
         db_obj = await self._repository.get_by_id_and_user_id_with_mechanic_requests_relation(
@@ -0,0 +1,31 @@
+from typing import AsyncGenerator
+
+from fastapi import Depends
+
+from src.repositories.car import CarRepository
+from src.repositories.mechanic_car_reqquest import MechanicCarRequestRepository
+from src.repositories.mechanic_comment import MechanicCommentRepository
+from src.schemas.car import CarOut
+from src.schemas.export import ExportFormat, ExportTable
+from src.schemas.mechanic_car_request import MechanicCarRequestOut
+from src.schemas.mechanic_comment import MechanicCommentOut
+from src.utils.export import export_lines
+
+
+class ExportService:
+    def __init__(
+        self,
+        car_repository: CarRepository = Depends(),
+        mechanic_car_request_repository: MechanicCarRequestRepository = Depends(),
+        mechanic_comment_repository: MechanicCommentRepository = Depends(),
+    ):
+        self._exports = {
+            ExportTable.car: (car_repository, CarOut),
+            ExportTable.mechanic_car_request: (mechanic_car_request_repository, MechanicCarRequestOut),
+            ExportTable.mechanic_comment: (mechanic_comment_repository, MechanicCommentOut),
+        }
+
+    def export(self, table: ExportTable, export_format: ExportFormat) -> AsyncGenerator[bytes, None]:
+        """ whole table streamed from a server side cursor, see `SqlRepository.stream`. """
+        repository, schema = self._exports[table]
+        return export_lines(schema, repository.stream(schema), export_format)
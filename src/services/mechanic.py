@@ -9,6 +9,7 @@ from src.schemas.mechanic import CreateMechanic, UpdateMechanic, MechanicOut
 from fastapi import Depends, HTTPException, status
 
 from src.schemas.permission import UpdateMechanicPermission
+from src.utils.pagination import Page
 
 
 class MechanicService:
@@ -72,8 +73,8 @@ class MechanicService:
 
         return db_obj
     
-    async def list_all(self, limit: int, offset: int) -> List[MechanicOut]:
-        return await self._repository.list_all(limit, offset)
+    async def list_all(self, limit: int, offset: int, cursor: str | None = None) -> Page:
+        return await self._repository.list_page(limit, cursor, offset, MechanicOut)
 
     
     async def delete(self, user: UserModel) -> None:
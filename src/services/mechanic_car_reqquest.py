@@ -16,6 +16,7 @@ from src.schemas.mechanic_car_request import (
     MechanicCarRequestOut,
     GetMechanicCarRequestOut,
 )
+from src.utils.pagination import Page
 from src.utils.validation import validate_mechanic_car_status_transition
 
 
@@ -130,12 +131,16 @@ class MechanicCarRequstService:
         return db_obj
     
 
-    async def list_mechanic_reqeusts(self, user: UserModel, limit: int, offset: int) -> List[MechanicCarRequestModel]:
+    async def list_mechanic_reqeusts(self, user: UserModel, limit: int, offset: int, cursor: str | None = None) -> Page:
         if user.role == UserRole.user:
-            return await self._repository.list_all_by_user_id(user.id)
+            return await self._repository.list_all_by_user_id(
+                user.id, limit, offset, cursor, MechanicCarRequestOut
+            )
 
         else:
-            return await self._repository.list_all_by_user_mechanic_id(user.id)
+            return await self._repository.list_all_by_user_mechanic_id(
+                user.id, limit, offset, cursor, MechanicCarRequestOut
+            )
 
     async def delete(self, mechanic_request_id: int, user: UserModel) -> None:
         db_obj = await self._repository.get_by_id(mechanic_request_id)
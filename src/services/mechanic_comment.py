@@ -6,6 +6,7 @@ from src.models.user import User as UserModel
 from src.repositories.mechanic_car_reqquest import MechanicCarRequestRepository
 from src.repositories.mechanic_comment import MechanicCommentRepository  
 from src.schemas.mechanic_comment import CreateMechanicComment
+from src.utils.pagination import Page
 
 
 class MechanicCommnetService:
@@ -33,8 +34,8 @@ class MechanicCommnetService:
         
         return db_obj
     
-    async def list_mechanic_comments(self, mechanic_id: int, limit: int, offset: int):
-        return await self._repository.get_mechanic_comments_by_mechanic_id(mechanic_id, limit, offset)
+    async def list_mechanic_comments(self, mechanic_id: int, limit: int, offset: int, cursor: str | None = None) -> Page:
+        return await self._repository.get_mechanic_comments_by_mechanic_id(mechanic_id, limit, offset, cursor)
 
     async def delete(self, user, commentd_id: int) -> None:
         db_obj = await self._repository.get_by_id(commentd_id)
@@ -8,6 +8,7 @@ from fastapi import Depends, HTTPException, status
 from src.repositories.permission import MechanicPermissionRepository
 from src.repositories.user import UserRepository
 from src.schemas.permission import CreateMechanicPermission, MechanicPermissionOut
+from src.utils.pagination import Page
 
 class MechanicPermissionService:
 
@@ -39,8 +40,8 @@ class MechanicPermissionService:
         )
 
 
-    async def list_all(self, limit: int, offset: int):
-        return await self._repository.list_all(limit, offset)
+    async def list_all(self, limit: int, offset: int, cursor: str | None = None) -> Page:
+        return await self._repository.list_page(limit, cursor, offset)
 
 
     async def get_by_key(self, key: str) -> MechanicPermissionOut:
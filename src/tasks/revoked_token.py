@@ -0,0 +1,149 @@
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Tuple
+
+from sqlalchemy import exc, select, text
+from sqlalchemy.orm import Session
+
+from src.config import setting
+from src.core import celery_app
+from src.core.sync import get_postdb_cm, get_redis_sync
+from src.models.auth import RevokedToken as RevokedTokenModel
+from src.repositories.keys import (
+    REVOKED_TOKEN_KEY,
+    REVOKED_TOKEN_READY_KEY,
+    REVOKED_TOKEN_REBUILD_LOCK,
+)
+
+logger = logging.getLogger("mechanic")
+
+BATCH_SIZE = 10000
+PARTITION_PREFIX = "revoked_token_p"
+DEFAULT_PARTITION = "revoked_token_default"
+# a detach waiting for its lock would hold back every query queued behind it
+DETACH_LOCK_TIMEOUT = "5s"
+
+
+@celery_app.task(queue="auth")
+def rebuild_revoked_tokens():
+    """ repopulate redis revoked tokens from postgres, only ones still unexpired. """
+    redis = get_redis_sync()
+    if not redis.set(REVOKED_TOKEN_REBUILD_LOCK, 1, nx=True, ex=300):
+        return
+
+    now = datetime.now(timezone.utc)
+    count = 0
+
+    try:
+        with get_postdb_cm() as db:
+            rows = db.execute(
+                select(RevokedTokenModel.jti, RevokedTokenModel.expires_at)
+                .where(RevokedTokenModel.expires_at > now)
+                .execution_options(yield_per=BATCH_SIZE)
+            )
+
+            pipe = redis.pipeline(transaction=False)
+            for jti, expires_at in rows:
+                ttl = int((expires_at - now).total_seconds())
+                if ttl > 0:
+                    pipe.set(REVOKED_TOKEN_KEY.format(jti=jti), 1, ex=ttl)
+                    count += 1
+
+                if len(pipe) >= BATCH_SIZE:
+                    pipe.execute()
+
+            pipe.set(REVOKED_TOKEN_READY_KEY, 1)
+            pipe.execute()
+    finally:
+        redis.delete(REVOKED_TOKEN_REBUILD_LOCK)
+        redis.close()
+
+    logger.info(f"{count} revoked tokens rebuilt.")
+
+
+def week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+def partition_name(start: date) -> str:
+    return f"{PARTITION_PREFIX}{start:%Y%m%d}"
+
+
+def partition_bounds(start: date) -> Tuple[str, str]:
+    return f"'{start} 00:00:00+00'", f"'{start + timedelta(weeks=1)} 00:00:00+00'"
+
+
+def create_partition(db: Session, start: date, has_default: bool) -> None:
+    """
+    Postgres refuses a partition while the default partition holds rows of its
+    range, they are moved into the new table before it is attached.
+    """
+    name = partition_name(start)
+    lower, upper = partition_bounds(start)
+    db.execute(text(f"CREATE TABLE {name} (LIKE revoked_token INCLUDING DEFAULTS)"))
+    if has_default:
+        db.execute(text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+            f"WHERE expires_at >= {lower} AND expires_at < {upper} RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ))
+    db.execute(text(f"ALTER TABLE revoked_token ATTACH PARTITION {name} FOR VALUES FROM ({lower}) TO ({upper})"))
+
+
+def drop_partition(db: Session, name: str, detach_pending: bool, has_default: bool) -> None:
+    """
+    Detached before the drop, `CONCURRENTLY` when postgres allows it (no default
+    partition): reads and writes of the other partitions go on meanwhile. A
+    detach interrupted halfway is finalized by the next run.
+    """
+    with db.get_bind().connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text(f"SET lock_timeout = '{DETACH_LOCK_TIMEOUT}'"))
+        if detach_pending:
+            connection.execute(text(f"ALTER TABLE revoked_token DETACH PARTITION {name} FINALIZE"))
+        elif has_default:
+            connection.execute(text(f"ALTER TABLE revoked_token DETACH PARTITION {name}"))
+        else:
+            connection.execute(text(f"ALTER TABLE revoked_token DETACH PARTITION {name} CONCURRENTLY"))
+        connection.execute(text(f"DROP TABLE {name}"))
+
+
+@celery_app.task(queue="auth")
+def maintain_revoked_token_partitions():
+    """
+    Weekly partitions of `revoked_token`: creates the ones tokens issued today can
+    expire in, drops the ones whose whole week is expired. Dropping a partition
+    replaces row by row deletes.
+    """
+    today = datetime.now(timezone.utc).date()
+    lifetime = max(setting.ACCESS_EXPIRE, setting.REFRESH_EXPIRE)
+    weeks_ahead = -(-lifetime // 7) + 1
+
+    with get_postdb_cm() as db:
+        partitions = dict(db.execute(text(
+            "SELECT c.relname, i.inhdetachpending FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'revoked_token'::regclass"
+        )).all())
+        has_default = DEFAULT_PARTITION in partitions
+
+        first = week_start(today)
+        for week in range(weeks_ahead + 1):
+            start = first + timedelta(weeks=week)
+            if partition_name(start) not in partitions:
+                create_partition(db, start, has_default)
+                db.commit()
+                logger.info(f"{partition_name(start)} partition created.")
+        # a concurrent detach waits for the transactions open before it
+        db.commit()
+
+        for name, detach_pending in partitions.items():
+            if not name.startswith(PARTITION_PREFIX):
+                continue
+
+            start = datetime.strptime(name.removeprefix(PARTITION_PREFIX), "%Y%m%d").date()
+            if start + timedelta(weeks=1) <= today:
+                try:
+                    drop_partition(db, name, detach_pending, has_default)
+                except exc.OperationalError as e:
+                    logger.warning(f"{name} partition not dropped, retried next run: {e!r}")
+                    continue
+                logger.info(f"{name} partition dropped.")
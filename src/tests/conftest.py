@@ -35,10 +35,19 @@ _env = {
 for k, v in _env.items():
     os.environ.setdefault(k, v)
 
+from contextlib import asynccontextmanager
+
+from fakeredis import FakeAsyncRedis
 from fastapi.testclient import TestClient
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
 from src.app import app
+from src.core.postgres import RoutingSession
 from src.models.user import User as UserModel, UserRole
+from src.repositories.base import RedisRepository
 from src.utils.auth import get_current_user, get_current_user_with_permission
+from src.utils.metrics import metrics
 
 
 class UserStub:
@@ -95,3 +104,89 @@ def client_with_permission(role: UserRole, user_id: int = 1):
 def clear_overrides():
     """Clear all dependency overrides on app."""
     app.dependency_overrides.clear()
+
+
+@asynccontextmanager
+async def sqlite_db(*tables):
+    """
+    AsyncSession on a fresh in-memory sqlite database with `tables` created,
+    a table is a `Table` or raw DDL for tables sqlite can't build from the model.
+    """
+    engine = create_async_engine("sqlite+aiosqlite://")
+    try:
+        async with engine.begin() as conn:
+            for table in tables:
+                if isinstance(table, str):
+                    await conn.execute(text(table))
+                else:
+                    await conn.run_sync(table.create)
+        async with AsyncSession(engine, expire_on_commit=False) as db:
+            yield db
+    finally:
+        await engine.dispose()
+
+
+# ----- async tests: `pytestmark = pytest.mark.anyio` and `async def test_*` -----
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def db_tables():
+    """ tables of `db`, override it in a test module for others. """
+    return (UserModel.__table__,)
+
+
+@pytest.fixture
+async def db(db_tables):
+    async with sqlite_db(*db_tables) as session:
+        yield session
+
+
+@pytest.fixture
+async def redis():
+    """ fresh fakeredis, replies are bytes like the app client. """
+    client = FakeAsyncRedis()
+    yield client
+    await client.aclose()
+
+
+@pytest.fixture
+def redis_repository(redis):
+    return RedisRepository(redis)
+
+
+@pytest.fixture
+def reset_metrics():
+    """ empty metrics registry for the test, left empty after it. """
+    metrics.reset()
+    yield metrics
+    metrics.reset()
+
+
+@pytest.fixture
+def count_queries():
+    """ `count_queries(db)` returns the list of statements `db` sends from now on. """
+    def start(db):
+        statements = []
+        event.listen(db.bind.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        return statements
+
+    return start
+
+
+@pytest.fixture
+def primary_queries():
+    """ `primary_queries(db)` returns the list of statements `db` sends inside `primary_reads` from now on. """
+    def start(db):
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            if db.info.get(RoutingSession.PRIMARY_READS):
+                statements.append(statement)
+
+        event.listen(db.bind.sync_engine, "before_cursor_execute", record)
+        return statements
+
+    return start
@@ -143,6 +143,40 @@ def test_auth_refresh_200():
     assert resp.status_code == 200
 
 
+class _RotateRepositoryStub:
+    """ `RevokedTokenRepository.rotate` of a real database: each jti rotates once. """
+
+    def __init__(self):
+        self.rotated = set()
+
+    async def rotate(self, jti, phone_number, exp):
+        if jti in self.rotated:
+            return None
+        self.rotated.add(jti)
+        return UserStub(user_id=1, role=UserRole.user)
+
+
+def test_auth_refresh_401_reused_token():
+    from types import SimpleNamespace
+    from src.schemas.auth import TokenType
+    from src.utils.auth import jwt
+
+    service = AuthService(
+        request=SimpleNamespace(client=None),
+        repository=_EpochRepositoryStub(0),
+        token_repository=_RotateRepositoryStub(),
+        otp_repository=None,
+    )
+    client = _client_auth(stub=service)
+    refresh_token = jwt.create_token({"sub": "09123456789", "uid": 1, "epoch": 0}, TokenType.refresh_token)
+
+    resp = client.post("/v1/auth/token/refresh", json={"refresh_token": refresh_token})
+    assert resp.status_code == 200
+    # replayed, e.g. by whoever stole it
+    resp = client.post("/v1/auth/token/refresh", json={"refresh_token": refresh_token})
+    assert resp.status_code == 401
+
+
 def test_auth_refresh_422():
     client = _client_auth()
     resp = client.post("/v1/auth/token/refresh", json={})
@@ -206,3 +240,144 @@ def test_auth_reset_password_verify_400_bad_password():
         "token": 123456,
     })
     assert resp.status_code in (400, 422)
+
+
+# ----- password hashing off the event loop -----
+def test_auth_password_hash_async():
+    import asyncio
+    from src.utils.auth import UserPassword
+
+    async def _hash_and_verify():
+        hashed = await UserPassword.generate_password_hash_async("Pass123!@#")
+        return (
+            await UserPassword.verify_password_async("Pass123!@#", hashed),
+            await UserPassword.verify_password_async("wrong", hashed),
+        )
+
+    try:
+        assert asyncio.run(_hash_and_verify()) == (True, False)
+    finally:
+        UserPassword.shutdown()
+
+
+def test_auth_password_hash_async_broken_pool(monkeypatch):
+    import asyncio
+    import os
+    from concurrent.futures import ProcessPoolExecutor
+    from concurrent.futures.process import BrokenProcessPool
+    from src.utils.auth import UserPassword, setting
+
+    monkeypatch.setattr(setting, "PASSWORD_HASH_WORKERS", 1)
+    # a worker died, e.g. OOM killed
+    broken = UserPassword._executor = ProcessPoolExecutor(max_workers=1)
+    with pytest.raises(BrokenProcessPool):
+        broken.submit(os._exit, 1).result()
+
+    try:
+        hashed = asyncio.run(UserPassword.generate_password_hash_async("Pass123!@#"))
+        assert UserPassword.verify_password("Pass123!@#", hashed)
+        assert UserPassword._executor is not broken
+    finally:
+        UserPassword.shutdown()
+
+
+# ----- stateless access token claims -----
+class _EpochRepositoryStub:
+    def __init__(self, epoch):
+        self._epoch = epoch
+
+    async def get_session_epoch(self, user_id):
+        return self._epoch
+
+    async def load_instance(self, data):
+        return data
+
+
+def test_auth_stateless_claims_current_epoch():
+    import asyncio
+    from src.utils.auth import get_user_from_claims
+
+    payload = {"sub": "09123456789", "uid": 1, "role": UserRole.mechanic, "is_active": True, "epoch": 2}
+    user = asyncio.run(get_user_from_claims(payload, _EpochRepositoryStub(2)))
+    assert user["id"] == 1 and user["role"] == UserRole.mechanic
+
+
+def test_auth_stateless_claims_401_old_epoch():
+    import asyncio
+    from fastapi import HTTPException
+    from src.utils.auth import get_user_from_claims
+
+    payload = {"sub": "09123456789", "uid": 1, "role": UserRole.user, "is_active": True, "epoch": 1}
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(get_user_from_claims(payload, _EpochRepositoryStub(2)))
+    assert exc.value.status_code == 401
+
+
+def test_auth_stateless_claims_401_deleted_user():
+    import asyncio
+    from fastapi import HTTPException
+    from src.utils.auth import get_user_from_claims
+
+    payload = {"sub": "09123456789", "uid": 1, "role": UserRole.user, "is_active": True, "epoch": 0}
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(get_user_from_claims(payload, _EpochRepositoryStub(None)))
+    assert exc.value.status_code == 401
+
+
+# ----- jwks (GET /.well-known/jwks.json) -----
+def test_auth_jwks_200_without_key_ring():
+    client = _client_auth()
+    resp = client.get("/v1/auth/.well-known/jwks.json")
+    assert resp.status_code == 200
+    assert resp.json() == {"keys": []}
+
+
+def test_auth_jwks_key_ring_rotation(tmp_path):
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+    from src.schemas.auth import TokenType
+    from src.utils.auth import jwt
+    from src.utils.jwt_keys import JwtKeyRing
+
+    def _write(kid, key):
+        (tmp_path / f"{kid}.pem").write_bytes(key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ))
+
+    _write("2026-01", ec.generate_private_key(ec.SECP256R1()))
+    _write("2026-02", ed25519.Ed25519PrivateKey.generate())
+
+    legacy_token = jwt.create_token({"sub": "09123456789"}, TokenType.access_token)
+    try:
+        jwt.key_ring = JwtKeyRing(str(tmp_path), "2026-01")
+        old_token = jwt.create_token({"sub": "09123456789"}, TokenType.access_token)
+
+        jwt.key_ring = JwtKeyRing(str(tmp_path), "2026-02")
+        new_token = jwt.create_token({"sub": "09123456789"}, TokenType.access_token)
+
+        for token in (legacy_token, old_token, new_token):
+            assert jwt.verify_token(token, TokenType.access_token)["sub"] == "09123456789"
+
+        client = _client_auth()
+        keys = client.get("/v1/auth/.well-known/jwks.json").json()["keys"]
+        assert {(k["kid"], k["alg"]) for k in keys} == {("2026-01", "ES256"), ("2026-02", "EdDSA")}
+    finally:
+        jwt.key_ring = None
+
+
+# ----- verified payload cache -----
+def test_auth_verify_token_cache_forget():
+    from src.schemas.auth import TokenType
+    from src.utils.auth import jwt
+
+    token = jwt.create_token({"sub": "09123456789"}, TokenType.refresh_token)
+    jwt.verify_token(token, TokenType.refresh_token)
+    assert jwt.cache.get(jwt.cache_key(token)) is not None
+
+    with pytest.raises(Exception):
+        jwt.verify_token(token, TokenType.access_token)
+
+    jwt.forget("Bearer " + token)
+    assert jwt.cache.get(jwt.cache_key(token)) is None
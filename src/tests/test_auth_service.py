@@ -0,0 +1,121 @@
+"""
+Unit tests for the otp admission of `AuthService`, with `OtpRepository` on fakeredis.
+Tests: signup / reset requests shed by `admit_otp_request` run no user query
+and no password hash, numbers rejected by the database are counted, flagged
+and shed from then on.
+"""
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from src.config import setting
+from src.repositories.otp import OtpRepository
+from src.schemas.auth import ResetPaasword, SignupSendOTP
+from src.services.auth import AuthService
+from src.utils.auth import UserPassword
+
+
+pytestmark = pytest.mark.anyio
+
+PHONE = "09123456789"
+
+
+class _NoRepository:
+    """ any use of the user repository fails the test. """
+
+    def __getattr__(self, name):
+        pytest.fail(f"user repository used: {name}")
+
+
+class _UserRepository:
+    def __init__(self, user):
+        self.user = user
+        self.lookups = 0
+
+    async def get_by_phone_number(self, phone_number):
+        self.lookups += 1
+        return self.user
+
+
+@pytest.fixture(autouse=True)
+def no_password_hash(monkeypatch):
+    async def generate_password_hash_async(password):
+        pytest.fail("password hashed")
+
+    monkeypatch.setattr(UserPassword, "generate_password_hash_async", generate_password_hash_async)
+
+
+@pytest.fixture
+def otp_repository(redis):
+    return OtpRepository(redis)
+
+
+def _service(otp_repository, repository=None, ip="10.0.0.1") -> AuthService:
+    return AuthService(
+        request=SimpleNamespace(client=SimpleNamespace(host=ip)),
+        repository=repository or _NoRepository(),
+        token_repository=None,
+        otp_repository=otp_repository,
+    )
+
+
+def _signup(phone_number=PHONE) -> SignupSendOTP:
+    return SignupSendOTP(phone_number=phone_number, password="Pass123!@#", first_name="Test", last_name="User")
+
+
+async def _status(request) -> int:
+    with pytest.raises(HTTPException) as exc:
+        await request
+    return exc.value.status_code
+
+
+async def test_live_code_shed(otp_repository, reset_metrics):
+    await otp_repository.issue("signup", PHONE, 123456, 60)
+    await otp_repository.issue("reset", PHONE, 123456, 60)
+
+    assert await _status(_service(otp_repository).signup_send_otp(_signup())) == 429
+    assert await _status(_service(otp_repository).send_reset_password_token(ResetPaasword(phone_number=PHONE))) == 429
+    assert reset_metrics.get("otp_admission.signup.otp_live") == 1
+    assert reset_metrics.get("otp_admission.reset.otp_live") == 1
+
+
+async def test_window_limits_shed(otp_repository, monkeypatch, reset_metrics):
+    monkeypatch.setattr(setting, "OTP_IP_LIMIT", 1)
+    await otp_repository.admit("signup", "09120000000", "10.0.0.1", setting.OTP_WINDOW, 1, 1)
+    assert await _status(_service(otp_repository).signup_send_otp(_signup())) == 429
+
+    monkeypatch.setattr(setting, "OTP_PHONE_LIMIT", 1)
+    await otp_repository.admit("reset", PHONE, "10.0.0.9", setting.OTP_WINDOW, 1, 1)
+    service = _service(otp_repository, ip="10.0.0.2")
+    assert await _status(service.send_reset_password_token(ResetPaasword(phone_number=PHONE))) == 429
+
+    assert reset_metrics.get("otp_admission.signup.ip") == 1
+    assert reset_metrics.get("otp_admission.reset.phone") == 1
+
+
+async def test_signup_existing_user_rejected_then_shed(otp_repository, reset_metrics):
+    repository = _UserRepository(SimpleNamespace(phone_number=PHONE, is_active=True, is_delete=False))
+    assert await _status(_service(otp_repository, repository).signup_send_otp(_signup())) == 409
+    assert repository.lookups == 1
+    assert reset_metrics.get("otp_admission.signup.admitted") == 1
+    assert reset_metrics.get("otp_admission.signup.database") == 1
+    assert int(await otp_repository.redis.get(f"otp_rejected_signup_{PHONE}")) == 409
+
+    # from another ip, no query this time
+    assert await _status(_service(otp_repository, ip="10.0.0.2").signup_send_otp(_signup())) == 409
+    assert reset_metrics.get("otp_admission.signup.rejected") == 1
+    assert reset_metrics.get("otp_admission.signup.database") == 1
+
+
+async def test_reset_missing_user_rejected_then_shed(otp_repository, reset_metrics):
+    repository = _UserRepository(None)
+    request = ResetPaasword(phone_number=PHONE)
+    assert await _status(_service(otp_repository, repository).send_reset_password_token(request)) == 404
+    assert reset_metrics.get("otp_admission.reset.database") == 1
+    assert int(await otp_repository.redis.get(f"otp_rejected_reset_{PHONE}")) == 404
+
+    assert await _status(_service(otp_repository, ip="10.0.0.2").send_reset_password_token(request)) == 404
+    assert reset_metrics.get("otp_admission.reset.rejected") == 1
+    # a rejection of one purpose doesn't shed the other
+    assert await otp_repository.redis.get(f"otp_rejected_signup_{PHONE}") is None
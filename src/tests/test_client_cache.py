@@ -0,0 +1,199 @@
+"""
+Unit tests for the redis client side cache: `ClientCache` and `AppRedis.get`, on fakeredis.
+Tests: invalidate, flush on disconnect, reads racing an invalidation,
+untracked keys, `AppRedis.get` served from memory and re-read after
+invalidation, writes of this process dropping their keys (commands, scripts,
+pipelines), `OtpRepository.admit` rejected flag.
+"""
+import pytest
+from fakeredis import FakeAsyncRedis, FakeServer
+
+from src.core.redis import AppRedis, ClientCache
+from src.repositories.otp import OtpRepository
+from src.repositories.user import CACHE_SESSION_EPOCH_SCRIPT
+
+
+pytestmark = pytest.mark.anyio
+
+
+class _AppRedis(AppRedis, FakeAsyncRedis):
+    """ `AppRedis` on fakeredis, counts the `GET` sent to redis. """
+
+    gets = 0
+
+    async def execute_command(self, *args, **options):
+        if args[0] == "GET":
+            self.gets += 1
+        return await super().execute_command(*args, **options)
+
+
+def _cache(redis=None) -> ClientCache:
+    cache = ClientCache(redis, ["user_", "session_epoch_", "otp_rejected_"])
+    # as if the listener was subscribed
+    cache.connected = True
+    return cache
+
+
+@pytest.fixture
+def server():
+    return FakeServer()
+
+
+@pytest.fixture
+async def redis(server):
+    client = _AppRedis(server=server)
+    client.client_cache = _cache(client)
+    yield client
+    await client.aclose()
+
+
+def test_store_and_invalidate():
+    cache = _cache()
+    cache.store("user_1", cache.begin("user_1"), b"one")
+    cache.store("user_2", cache.begin("user_2"), None)
+
+    assert cache.lookup("user_1") == (b"one",)
+    # a missing key is cached too
+    assert cache.lookup("user_2") == (None,)
+
+    cache.invalidate([b"user_1"])
+    assert cache.lookup("user_1") is None
+    assert cache.lookup("user_2") == (None,)
+
+
+def test_flush_on_disconnect():
+    cache = _cache()
+    cache.store("user_1", cache.begin("user_1"), b"one")
+    pending = cache.begin("user_2")
+
+    cache.connected = False
+    cache.invalidate(None)
+
+    cache.connected = True
+    assert cache.lookup("user_1") is None
+    cache.store("user_2", pending, b"two")
+    assert cache.lookup("user_2") is None
+
+
+def test_read_racing_invalidation_not_stored():
+    cache = _cache()
+    token = cache.begin("user_1")
+    # changed while the read was in flight, the read may be the old value
+    cache.invalidate([b"user_1"])
+    cache.store("user_1", token, b"old")
+    assert cache.lookup("user_1") is None
+
+    # only the latest read in flight stores
+    first, second = cache.begin("user_1"), cache.begin("user_1")
+    cache.store("user_1", first, b"first")
+    assert cache.lookup("user_1") is None
+    cache.store("user_1", second, b"second")
+    assert cache.lookup("user_1") == (b"second",)
+
+
+def test_untracked_keys_bypass():
+    cache = _cache()
+    assert cache.begin("query_1") is None
+    cache.store("query_1", None, b"one")
+    assert cache.lookup("query_1") is None
+
+    cache.connected = False
+    assert cache.begin("user_1") is None
+    assert cache.lookup("user_1") is None
+
+
+async def test_app_redis_get_served_from_cache(redis, server):
+    await redis.set("user_1", b"one")
+
+    assert await redis.get("user_1") == b"one"
+    assert await redis.get("user_1") == b"one"
+    assert redis.gets == 1
+
+    # written by another process, redis publishes the change on `__redis__:invalidate`
+    other = FakeAsyncRedis(server=server)
+    await other.set("user_1", b"new")
+    await other.aclose()
+    assert await redis.get("user_1") == b"one"
+    redis.client_cache.invalidate([b"user_1"])
+    assert await redis.get("user_1") == b"new"
+    assert redis.gets == 2
+
+    # untracked keys always go to redis
+    await redis.get("query_1")
+    await redis.get("query_1")
+    assert redis.gets == 4
+
+
+async def test_app_redis_get_bypassed_while_disconnected(redis):
+    await redis.set("user_1", b"one")
+    redis.client_cache.connected = False
+
+    await redis.get("user_1")
+    await redis.get("user_1")
+    assert redis.gets == 2
+
+
+async def test_otp_admit_rejected_from_cache(redis):
+    repository, cache = OtpRepository(redis), redis.client_cache
+    key = "otp_rejected_login_09123456789"
+    await repository.reject("login", "09123456789", 404, 300)
+
+    assert await repository.admit("login", "09123456789", "10.0.0.1", 60, 3, 3) == ("rejected", 404)
+    assert cache.lookup(key) == (b"404",)
+    # served from memory, the script isn't run
+    cache.store(key, cache.begin(key), b"429")
+    assert await repository.admit("login", "09123456789", "10.0.0.1", 60, 3, 3) == ("rejected", 429)
+
+    # dropped before the `DEL` is sent, not when redis publishes it
+    await repository.forget_rejection("login", "09123456789")
+    assert await repository.admit("login", "09123456789", "10.0.0.1", 60, 3, 3) == ("admitted", 0)
+    # an admitted number caches the absence of the flag
+    assert cache.lookup(key) == (None,)
+
+
+async def test_writes_drop_tracked_keys(redis):
+    cache = redis.client_cache
+    await redis.set("user_1", b"one")
+    await redis.get("user_1")
+
+    await redis.set("user_1", b"two")
+    assert cache.lookup("user_1") is None
+    assert await redis.get("user_1") == b"two"
+
+    await redis.get("user_2")
+    await redis.delete("query_1", "user_1", "user_2")
+    assert cache.lookup("user_1") is cache.lookup("user_2") is None
+    assert redis.gets == 3
+
+
+async def test_write_racing_a_read_not_stored(redis):
+    cache = redis.client_cache
+    token = cache.begin("user_1")
+    await redis.set("user_1", b"new")
+    cache.store("user_1", token, b"old")
+    assert cache.lookup("user_1") is None
+
+
+async def test_script_drops_tracked_keys(redis):
+    bump = redis.register_script(CACHE_SESSION_EPOCH_SCRIPT)
+    assert await redis.get("session_epoch_v2_1") is None
+
+    await bump(keys=["session_epoch_v2_1"], args=[2, 60])
+    assert redis.client_cache.lookup("session_epoch_v2_1") is None
+    assert await redis.get("session_epoch_v2_1") == b"2"
+
+    # the script isn't loaded on the server yet, `EVALSHA` retried after `SCRIPT LOAD`
+    await redis.script_flush()
+    await bump(keys=["session_epoch_v2_1"], args=[3, 60])
+    assert await redis.get("session_epoch_v2_1") == b"3"
+
+
+async def test_pipeline_drops_tracked_keys(redis):
+    await redis.set("user_1", b"one")
+    await redis.get("user_1")
+
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.set("user_1", b"two")
+        pipe.get("query_1")
+        await pipe.execute()
+    assert await redis.get("user_1") == b"two"
@@ -17,6 +17,7 @@ from src.services.mechanic_car_reqquest import MechanicCarRequstService
 from src.services.mechanic_comment import MechanicCommnetService
 from src.tests.conftest import UserStub, clear_overrides
 from src.models.user import UserRole
+from src.utils.pagination import Page
 
 
 # ---------- Fixtures: stub services that return valid shapes ----------
@@ -56,7 +57,7 @@ def mechanic_stub():
     class Stub:
         async def create(self, m, u): return _row
         async def update(self, m, u, partial): return _row
-        async def list_all(self, limit, offset): return [_row]
+        async def list_all(self, limit, offset, cursor=None): return Page([_row], "next")
         async def delete(self, u): pass
     return Stub()
 
@@ -66,7 +67,7 @@ def permission_stub():
     now = datetime.now(timezone.utc)
     class Stub:
         async def create(self, p): return {"id": 1, "key": "k", "user_id": 1, "created_at": now, "used_at": None, "expires_at": now}
-        async def list_all(self, limit, offset): return []
+        async def list_all(self, limit, offset, cursor=None): return Page([])
         async def get_by_key(self, key): return {"id": 1, "key": key, "user_id": 1, "created_at": now, "used_at": None, "expires_at": now}
     return Stub()
 
@@ -77,7 +78,7 @@ def mechanic_car_request_stub():
         async def create(self, r, u): return {"id": 1, "status": "pending", "issue": "motor", "description": "d", "mechanic_id": 1, "car_id": 1, "created_at": datetime.utcnow(), "updated_at": None}
         async def update_by_user(self, i, r, u): return {"id": i, "status": "pending", "issue": "motor", "description": "d", "mechanic_id": 1, "car_id": 1, "created_at": datetime.utcnow(), "updated_at": None}
         async def update_by_mechanic(self, i, r, u): return {"id": i, "status": "confirmed", "issue": "motor", "description": "d", "mechanic_id": 1, "car_id": 1, "created_at": datetime.utcnow(), "updated_at": None}
-        async def list_mechanic_reqeusts(self, u, limit, offset): return []
+        async def list_mechanic_reqeusts(self, u, limit, offset, cursor=None): return Page([])
     return Stub()
 
 
@@ -85,7 +86,7 @@ def mechanic_car_request_stub():
 def mechanic_comment_stub():
     class Stub:
         async def create(self, c, u): return {"id": 1, "comment": "x", "rate": 5, "user_id": 1, "mechanic_request_id": 1, "parent_id": None, "created_at": datetime.utcnow()}
-        async def list_mechanic_comments(self, mid, limit, offset): return []
+        async def list_mechanic_comments(self, mid, limit, offset, cursor=None): return Page([])
         async def delete(self, u, cid): pass
     return Stub()
 
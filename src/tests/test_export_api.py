@@ -0,0 +1,91 @@
+"""
+Unit tests for v1 export API endpoint.
+Tests: 200 (ndjson, csv, past the request budget), 403, 422.
+"""
+import asyncio
+from datetime import date, datetime, timezone
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+from src.app import app
+from src.config import setting
+from src.schemas.car import CarOut
+from src.schemas.export import ExportFormat
+from src.services.export import ExportService
+from src.utils.auth import get_current_user
+from src.utils.export import export_lines
+from src.tests.conftest import UserStub, clear_overrides
+from src.models.user import UserRole
+
+
+_car = SimpleNamespace(
+    id=1, title="Car", car_type="sedan", color=None, tip="tip", model=date(2020, 1, 1),
+    description=None, license_plate="12345678", user_id=1,
+    created_at=datetime(2024, 1, 1, tzinfo=timezone.utc), updated_at=None,
+)
+
+
+class _ExportServiceStub:
+    def __init__(self, batches, delay=0):
+        self._batches = batches
+        self._delay = delay
+
+    def export(self, table, export_format):
+        async def batches():
+            for batch in self._batches:
+                await asyncio.sleep(self._delay)
+                yield batch
+
+        return export_lines(CarOut, batches(), export_format)
+
+
+def _export_client(user=None, batches=(), delay=0):
+    clear_overrides()
+    user = user or UserStub(user_id=3, role=UserRole.admin)
+    async def _get_user():
+        return user
+    app.dependency_overrides[get_current_user] = _get_user
+    app.dependency_overrides[ExportService] = lambda: _ExportServiceStub(batches, delay)
+    return TestClient(app)
+
+
+def test_export_ndjson_200():
+    client = _export_client(batches=[[_car, _car], [_car]])
+    resp = client.get("/v1/export/car")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/x-ndjson"
+    assert resp.headers["content-disposition"] == 'attachment; filename="car.ndjson"'
+    lines = resp.text.splitlines()
+    assert len(lines) == 3
+    assert '"license_plate":"12345678"' in lines[0]
+
+
+def test_export_csv_200():
+    client = _export_client(batches=[[_car]])
+    resp = client.get("/v1/export/car", params={"format": ExportFormat.csv.value})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/csv")
+    header, row = resp.text.splitlines()
+    assert header.startswith("id,title,car_type,color")
+    assert row.startswith("1,Car,sedan,,tip,2020-01-01,")
+
+
+def test_export_200_ignores_request_budget(monkeypatch):
+    monkeypatch.setattr(setting, "REQUEST_BUDGET", 0.05)
+    client = _export_client(batches=[[_car], [_car]], delay=0.1)
+    resp = client.get("/v1/export/car")
+    assert resp.status_code == 200
+    assert len(resp.text.splitlines()) == 2
+
+
+def test_export_403_user():
+    client = _export_client(UserStub(user_id=1, role=UserRole.user))
+    resp = client.get("/v1/export/car")
+    assert resp.status_code == 403
+
+
+def test_export_422_unknown_table():
+    client = _export_client()
+    resp = client.get("/v1/export/user")
+    assert resp.status_code == 422
@@ -0,0 +1,73 @@
+"""
+Unit tests for the request identity map of `SqlRepository`, on sqlite.
+Tests: repeated lookups skip the query, `recall` ignores expired and
+partially loaded instances unless `partial`.
+"""
+import pytest
+
+from src.models.user import User as UserModel
+from src.repositories.base import SqlRepository
+from src.repositories.user import UserRepository
+
+
+pytestmark = pytest.mark.anyio
+
+
+class _UserRepository(SqlRepository):
+    model = UserModel
+
+    identity_columns = ("phone_number",)
+
+
+@pytest.fixture
+async def repository(db):
+    db.add(UserModel(phone_number="09120000000", password="hash", first_name="Test", last_name="User"))
+    await db.commit()
+    db.expunge_all()
+    return _UserRepository(db)
+
+
+@pytest.fixture
+def queries(repository, count_queries):
+    return count_queries(repository.db)
+
+
+async def test_repeated_get_by_id_skips_query(repository, queries, redis_repository):
+    user = await repository.get_by_id(1)
+    assert len(queries) == 1
+
+    assert await repository.get_by_id(1) is user
+    # shared by every repository of the request, by any identity column
+    users = UserRepository(db=repository.db, redis_repository=redis_repository)
+    assert await users.get_by_phone_number("09120000000") is user
+    assert len(queries) == 1
+    assert repository.db.info["avoided_queries"] == 2
+
+    assert await repository.get_by_id(404) is None
+    assert await repository.get_by_id(404) is None
+    assert len(queries) == 3
+
+
+async def test_recall_ignores_expired(repository, queries):
+    user = await repository.get_by_id(1)
+    repository.db.expire(user)
+
+    assert repository.recall("id", 1) is None
+    assert repository.recall("id", 1, partial=True) is None
+    assert await repository.get_by_id(1) is user
+    assert len(queries) == 2
+
+    await repository.db.commit()
+    assert repository.recall("phone_number", "09120000000") is None
+
+
+async def test_recall_ignores_partially_loaded(repository, queries):
+    user = await repository.get_by_id(1)
+    # e.g. rebuilt from a cache that left the password out
+    repository.db.expire(user, ["password"])
+
+    assert repository.recall("id", 1) is None
+    assert repository.recall("id", 1, partial=True) is user
+    assert (await repository.get_by_id(1)).password == "hash"
+    assert len(queries) == 2
+
@@ -12,6 +12,7 @@ from src.services.mechanic_car_reqquest import MechanicCarRequstService
 from src.utils.auth import get_current_user
 from src.tests.conftest import UserStub, clear_overrides
 from src.models.user import UserRole
+from src.utils.pagination import Page
 
 
 class _MechanicCarRequestServiceStub:
@@ -33,10 +34,10 @@ class _MechanicCarRequestServiceStub:
             raise self._r["update_mechanic"]
         return self._r.get("update_mechanic", {"id": req_id, "status": "confirmed", "issue": "motor", "description": "x", "mechanic_id": 1, "car_id": 1, "created_at": datetime.utcnow(), "updated_at": None})
 
-    async def list_mechanic_reqeusts(self, user, limit, offset):
+    async def list_mechanic_reqeusts(self, user, limit, offset, cursor=None):
         if isinstance(self._r.get("list"), Exception):
             raise self._r["list"]
-        return self._r.get("list", [])
+        return Page(self._r.get("list", []), self._r.get("next_cursor"))
 
 
 def _mcr_client(user=None, stub=None):
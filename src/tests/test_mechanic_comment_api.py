@@ -12,6 +12,7 @@ from src.services.mechanic_comment import MechanicCommnetService
 from src.utils.auth import get_current_user
 from src.tests.conftest import UserStub, clear_overrides
 from src.models.user import UserRole
+from src.utils.pagination import Page
 
 
 class _MechanicCommentServiceStub:
@@ -23,10 +24,10 @@ class _MechanicCommentServiceStub:
             raise self._r["create"]
         return self._r.get("create", {"id": 1, "comment": "Great", "rate": 5, "user_id": user.id, "mechanic_request_id": 1, "parent_id": None, "created_at": datetime.utcnow()})
 
-    async def list_mechanic_comments(self, mechanic_id, limit, offset):
+    async def list_mechanic_comments(self, mechanic_id, limit, offset, cursor=None):
         if isinstance(self._r.get("list"), Exception):
             raise self._r["list"]
-        return self._r.get("list", [])
+        return Page(self._r.get("list", []), self._r.get("next_cursor"))
 
     async def delete(self, user, comment_id):
         if isinstance(self._r.get("delete"), Exception):
@@ -67,6 +68,14 @@ def test_mechanic_comment_list_200():
     assert isinstance(resp.json(), list)
 
 
+def test_mechanic_comment_list_next_cursor_header():
+    stub = _MechanicCommentServiceStub({"list": [], "next_cursor": "abc"})
+    client = _comment_client(stub=stub)
+    resp = client.get("/v1/mechanic/comment/1?limit=20&cursor=xyz")
+    assert resp.status_code == 200
+    assert resp.headers["X-Next-Cursor"] == "abc"
+
+
 def test_mechanic_comment_delete_204():
     stub = _MechanicCommentServiceStub({})
     client = _comment_client(stub=stub)
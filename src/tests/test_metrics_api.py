@@ -0,0 +1,83 @@
+"""
+Unit tests for v1 metrics API endpoint, the in-process cache counters and the
+per request sql stats and deadline.
+Tests: 200, 403, Server-Timing, N+1, 503 past the deadline.
+"""
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from src.app import app
+from src.config import setting
+from src.utils.auth import get_current_user
+from src.utils.cache import LRUCache
+from src.utils.metrics import metrics
+from src.utils.sql_stats import request_queries
+from src.tests.conftest import UserStub, clear_overrides
+from src.models.user import UserRole
+
+
+def _metrics_client(user=None, statements=(), delay=0):
+    clear_overrides()
+    user = user or UserStub(user_id=3, role=UserRole.admin)
+    async def _get_user():
+        for statement in statements:
+            request_queries.get().record(statement, 2.0)
+        await asyncio.sleep(delay)
+        return user
+    app.dependency_overrides[get_current_user] = _get_user
+    return TestClient(app)
+
+
+def test_metrics_200_admin():
+    metrics.reset()
+    cache = LRUCache("test", maxsize=1, ttl=60)
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("b")
+    cache.set("b", 2)
+
+    client = _metrics_client()
+    resp = client.get("/v1/metrics")
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["cache.test.hit"] == 1
+    assert data["cache.test.miss"] == 1
+    assert data["cache.test.eviction"] == 1
+
+
+def test_metrics_403_user():
+    client = _metrics_client(UserStub(user_id=1, role=UserRole.user))
+    resp = client.get("/v1/metrics")
+    assert resp.status_code == 403
+
+
+def test_metrics_sql_stats_server_timing_and_n_plus_one():
+    metrics.reset()
+    statements = ["SELECT user"] + ["SELECT car WHERE id = $1"] * 5
+    client = _metrics_client(statements=statements)
+
+    resp = client.get("/v1/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["server-timing"] == 'db;dur=12.0;desc="6 queries", db-slowest;dur=2.0'
+    assert metrics.get("sql.queries") == 6
+    assert metrics.get("sql.GET /v1/metrics.queries") == 6
+    assert metrics.get("sql.n_plus_one") == 1
+
+
+def test_metrics_503_deadline_exceeded(monkeypatch):
+    metrics.reset()
+    monkeypatch.setattr(setting, "REQUEST_BUDGET", 0.05)
+    client = _metrics_client(delay=1)
+
+    resp = client.get("/v1/metrics")
+    assert resp.status_code == 503
+    assert resp.json() == {"detail": "Request deadline exceeded."}
+    assert metrics.get("deadline.exceeded") == 1
+
+
+def test_metrics_200_within_deadline(monkeypatch):
+    monkeypatch.setattr(setting, "REQUEST_BUDGET", 5)
+    client = _metrics_client(delay=0.01)
+    resp = client.get("/v1/metrics")
+    assert resp.status_code == 200
@@ -0,0 +1,115 @@
+"""
+Unit tests for the lua scripts of `OtpRepository`, on fakeredis.
+Tests: issue while a code is live, verify consumes the code, code dropped
+after max attempts, ip / phone sliding windows of admit, rejected numbers.
+"""
+import pytest
+
+from src.repositories import otp
+from src.repositories.otp import OtpRepository
+
+
+pytestmark = pytest.mark.anyio
+
+PHONE = "09123456789"
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(otp.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def repository(redis):
+    return OtpRepository(redis)
+
+
+def _admit(repository, phone_number=PHONE, ip="10.0.0.1", window=60, ip_limit=3, phone_limit=2):
+    return repository.admit("login", phone_number, ip, window, ip_limit, phone_limit)
+
+
+async def test_issue_while_code_is_live(repository):
+    assert await repository.issue("login", PHONE, 1234, 60) is True
+    assert await repository.issue("login", PHONE, 5678, 60) is False
+    # another purpose has its own code
+    assert await repository.issue("register", PHONE, 5678, 60) is True
+
+    assert await repository.verify("login", PHONE, 1234, 5) is True
+    assert 0 < await repository.redis.ttl(repository.key("register", PHONE)) <= 60
+
+
+async def test_verify_consumes_code(repository):
+    await repository.issue("login", PHONE, 1234, 60)
+
+    assert await repository.verify("login", PHONE, 1234, 5) is True
+    assert await repository.redis.exists(repository.key("login", PHONE)) == 0
+    # no replay
+    assert await repository.verify("login", PHONE, 1234, 5) is False
+    assert await repository.issue("login", PHONE, 5678, 60) is True
+
+
+async def test_code_dropped_after_max_attempts(repository):
+    await repository.issue("login", PHONE, 1234, 60)
+
+    for _ in range(2):
+        assert await repository.verify("login", PHONE, 1111, 3) is False
+    # still there before the last attempt
+    assert await repository.verify("login", PHONE, 1234, 3) is True
+
+    await repository.issue("login", PHONE, 1234, 60)
+    for _ in range(3):
+        assert await repository.verify("login", PHONE, 1111, 3) is False
+    assert await repository.redis.exists(repository.key("login", PHONE)) == 0
+    assert await repository.verify("login", PHONE, 1234, 3) is False
+
+
+async def test_admit_phone_window(repository, clock):
+    assert await _admit(repository, ip="10.0.0.1") == ("admitted", 0)
+    clock.now += 30
+    assert await _admit(repository, ip="10.0.0.2") == ("admitted", 0)
+    assert await _admit(repository, ip="10.0.0.3") == ("phone", 0)
+
+    # the first request left the window
+    clock.now += 31
+    assert await _admit(repository, ip="10.0.0.3") == ("admitted", 0)
+    assert await _admit(repository, ip="10.0.0.4") == ("phone", 0)
+
+
+async def test_admit_ip_window(repository, clock):
+    for i in range(3):
+        assert await _admit(repository, phone_number=f"0912000000{i}") == ("admitted", 0)
+    assert await _admit(repository, phone_number="09120000009") == ("ip", 0)
+    # shed requests don't count
+    assert await repository.redis.zcard("otp_window_login_phone_09120000009") == 0
+
+    clock.now += 61
+    assert await _admit(repository, phone_number="09120000009") == ("admitted", 0)
+
+
+async def test_admit_live_code(repository, clock):
+    await repository.issue("login", PHONE, 1234, 60)
+    assert await _admit(repository) == ("otp_live", 0)
+    assert await repository.redis.zcard("otp_window_login_ip_10.0.0.1") == 0
+
+
+async def test_admit_rejected_short_circuits(repository, clock):
+    await repository.reject("login", PHONE, 404, 300)
+    await repository.issue("login", PHONE, 1234, 60)
+
+    assert await _admit(repository) == ("rejected", 404)
+    # nothing recorded in the windows
+    assert await repository.redis.zcard("otp_window_login_ip_10.0.0.1") == 0
+    assert await repository.redis.zcard(f"otp_window_login_phone_{PHONE}") == 0
+
+    await repository.forget_rejection("login", PHONE)
+    assert await _admit(repository) == ("otp_live", 0)
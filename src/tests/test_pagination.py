@@ -0,0 +1,105 @@
+"""
+Unit tests for keyset pagination: cursors and `SqlRepository.paginate` on sqlite.
+Tests: cursor round trip, malformed cursor 400, page boundaries, offset,
+limit 0, projected pages.
+"""
+import base64
+import json
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy import select
+
+from src.models.user import User as UserModel
+from src.repositories.base import SqlRepository
+from src.utils.pagination import decode_cursor, encode_cursor
+
+
+pytestmark = pytest.mark.anyio
+
+COLUMNS = [UserModel.created_at, UserModel.id]
+
+
+class _UserRepository(SqlRepository):
+    model = UserModel
+
+
+class _UserId(BaseModel):
+    id: int
+
+
+def _raw_cursor(values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 1, 2, 3, 4, 5, 6, tzinfo=timezone.utc)
+    assert decode_cursor(encode_cursor([created_at, 42]), COLUMNS) == [created_at, 42]
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64 !",
+    base64.urlsafe_b64encode(b"not json").decode(),
+    _raw_cursor({"id": 1}),
+    _raw_cursor(["2024-01-02T03:04:05+00:00"]),
+    _raw_cursor(["2024-01-02T03:04:05+00:00", "42"]),
+    _raw_cursor(["yesterday", 42]),
+])
+def test_malformed_cursor_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, COLUMNS)
+    assert error.value.status_code == 400
+
+
+async def _pages(db, limit, rows=5, offset=0, schema=None):
+    """ ids of every page until there is no next cursor. """
+    db.add_all([
+        UserModel(phone_number=f"0912000000{i}", password="hash", first_name="Test", last_name="User")
+        for i in range(rows)
+    ])
+    await db.flush()
+
+    repository = _UserRepository(db)
+    pages, cursor = [], None
+    while True:
+        page = await repository.list_page(limit, cursor, offset, schema)
+        pages.append([item.id for item in page.items])
+        if page.next_cursor is None:
+            return pages
+        cursor = page.next_cursor
+
+
+@pytest.mark.parametrize("limit, rows, pages", [
+    (2, 5, [[1, 2], [3, 4], [5]]),
+    # a full last page has no next cursor
+    (5, 5, [[1, 2, 3, 4, 5]]),
+    (10, 5, [[1, 2, 3, 4, 5]]),
+    (2, 0, [[]]),
+    (0, 5, [[]]),
+])
+async def test_paginate_boundaries(db, limit, rows, pages):
+    assert await _pages(db, limit, rows) == pages
+
+
+async def test_paginate_offset_only_without_cursor(db):
+    assert await _pages(db, limit=2, offset=1) == [[2, 3], [4, 5]]
+
+
+async def test_paginate_projection(db):
+    assert await _pages(db, limit=3, schema=_UserId) == [[1, 2, 3], [4, 5]]
+
+
+async def test_paginate_cursor_applies_to_stmt(db):
+    db.add_all([
+        UserModel(phone_number=f"0912000000{i}", password="hash", first_name=name, last_name="User")
+        for i, name in enumerate(["a", "b", "a", "a"])
+    ])
+    await db.flush()
+
+    repository = _UserRepository(db)
+    stmt = select(UserModel).where(UserModel.first_name == "a")
+    first = await repository.paginate(stmt, 1)
+    second = await repository.paginate(stmt, 5, first.next_cursor)
+    assert ([user.id for user in first.items], [user.id for user in second.items]) == ([1], [3, 4])
@@ -12,6 +12,7 @@ from src.services.permission import MechanicPermissionService
 from src.utils.auth import get_current_user
 from src.tests.conftest import UserStub, clear_overrides
 from src.models.user import UserRole
+from src.utils.pagination import Page
 
 
 class _PermissionServiceStub:
@@ -23,10 +24,10 @@ class _PermissionServiceStub:
             raise self._r["create"]
         return self._r.get("create", {"id": 1, "key": "key1", "user_id": 1, "created_at": datetime.now(timezone.utc), "used_at": None, "expires_at": datetime.now(timezone.utc)})
 
-    async def list_all(self, limit, offset):
+    async def list_all(self, limit, offset, cursor=None):
         if isinstance(self._r.get("list"), Exception):
             raise self._r["list"]
-        return self._r.get("list", [])
+        return Page(self._r.get("list", []), self._r.get("next_cursor"))
 
     async def get_by_key(self, key):
         if isinstance(self._r.get("get"), Exception):
@@ -0,0 +1,120 @@
+"""
+Unit tests for the engine lifecycle of `src.core.postgres` and `src.core.sync`,
+on aiosqlite / sqlite engines.
+Tests: importing the app builds no engine, the lifespan builds the primary and
+replica engines once then disposes and resets them, `get_postdb` outside the
+lifespan builds them lazily, `get_postdb_cm` builds its engine on first use.
+"""
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.app import app, lifespan
+from src.config import setting
+from src.core import postgres, sync
+from src.core.postgres import MeteredPool, close_postdb, get_postdb, init_postdb, replica_lag
+from src.core.sync import get_postdb_cm
+
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def engines(monkeypatch):
+    """ engines built by `init_postdb`, on aiosqlite instead of asyncpg. """
+    built = []
+
+    def create_pooled_engine(url, name):
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=MeteredPool, pool_logging_name=name)
+        built.append(engine)
+        return engine
+
+    monkeypatch.setattr(postgres, "create_pooled_engine", create_pooled_engine)
+    monkeypatch.setattr(setting, "POSTGRE_REPLICA_HOSTS", "replica")
+    # engines an earlier test built are put back afterwards
+    for name, value in (("_async_engine", None), ("_replica_engines", []), ("_AsyncSessionLocal", None)):
+        monkeypatch.setattr(postgres, name, value)
+    for name in ("engines", "lags", "checked_at"):
+        monkeypatch.setattr(replica_lag, name, getattr(replica_lag, name))
+    replica_lag.reset([])
+    yield built
+    # whatever the test left behind
+    for engine in built:
+        await engine.dispose()
+    await close_postdb()
+
+
+def _used(engine) -> bool:
+    """ a connection open in the pool, gone once disposed. """
+    return engine.sync_engine.pool.checkedin() > 0
+
+
+def test_import_builds_no_engine():
+    code = (
+        "import sys, src.app\n"
+        "from src.core import postgres, sync\n"
+        "print(postgres._async_engine, postgres._replica_engines, postgres._AsyncSessionLocal, sync._SessionLocal,"
+        " 'asyncpg' in sys.modules, 'psycopg2' in sys.modules)"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.split() == ["None", "[]", "None", "None", "False", "False"]
+
+
+async def test_lifespan_builds_and_disposes_engines(engines):
+    async with lifespan(app):
+        primary, replicas = postgres._async_engine, postgres._replica_engines
+        assert engines == [primary, *replicas] and len(replicas) == 1
+        assert replica_lag.engines == replicas
+        # once
+        assert init_postdb() is postgres._AsyncSessionLocal
+        assert len(engines) == 2
+
+        for engine in engines:
+            async with engine.connect() as connection:
+                await connection.execute(text("SELECT 1"))
+            assert _used(engine)
+
+    assert postgres._async_engine is None
+    assert postgres._replica_engines == [] and replica_lag.engines == []
+    assert postgres._AsyncSessionLocal is None
+    for engine in engines:
+        assert not _used(engine)
+
+
+async def test_get_postdb_builds_engines_lazily(engines, monkeypatch):
+    monkeypatch.setattr(setting, "POSTGRE_REPLICA_HOSTS", "")
+    assert postgres._AsyncSessionLocal is None
+
+    async for db in get_postdb():
+        assert (await db.execute(text("SELECT 1"))).scalar() == 1
+    assert engines == [postgres._async_engine]
+
+    async for db in get_postdb():
+        pass
+    assert len(engines) == 1
+
+    await close_postdb()
+    assert postgres._async_engine is None and postgres._AsyncSessionLocal is None
+    assert not _used(engines[0])
+
+
+def test_get_postdb_cm_builds_engine_on_first_use(monkeypatch):
+    built = []
+
+    def sqlite_engine(url):
+        built.append(url)
+        return create_engine("sqlite://")
+
+    monkeypatch.setattr(sync, "create_engine", sqlite_engine)
+    monkeypatch.setattr(sync, "_SessionLocal", None)
+
+    with get_postdb_cm() as db:
+        assert db.execute(text("SELECT 1")).scalar() == 1
+    with get_postdb_cm():
+        pass
+
+    assert built == [setting.POSTGRES_URL.replace("asyncpg", "psycopg2")]
+    sync._SessionLocal.kw["bind"].dispose()
@@ -0,0 +1,64 @@
+"""
+Unit tests for the metrics of `MeteredPool`, on an aiosqlite engine.
+Tests: checkouts, in_use / overflow gauges follow checkouts and checkins,
+a disposed engine doesn't report its old pool.
+"""
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.core.postgres import MeteredPool
+from src.utils.metrics import metrics
+
+
+pytestmark = pytest.mark.anyio
+
+NAME = "postgres.pool.test"
+
+
+def _gauges():
+    return metrics.get(f"{NAME}.in_use"), metrics.get(f"{NAME}.overflow")
+
+
+def _pool_state(pool):
+    return pool.checkedout(), max(pool.overflow(), 0)
+
+
+@pytest.fixture
+async def engine(reset_metrics):
+    engine = create_async_engine(
+        "sqlite+aiosqlite://", poolclass=MeteredPool, pool_logging_name="test", pool_size=1, max_overflow=1
+    )
+    yield engine
+    await engine.dispose()
+
+
+async def test_gauges_follow_checkout_and_checkin(engine):
+    pool = engine.sync_engine.pool
+
+    first = await engine.connect()
+    assert _gauges() == _pool_state(pool) == (1, 0)
+    second = await engine.connect()
+    assert _gauges() == _pool_state(pool) == (2, 1)
+
+    # back in the pool, the overflow connection stays open
+    await first.close()
+    assert _gauges() == _pool_state(pool) == (1, 1)
+    # no room left, closed
+    await second.close()
+    assert _gauges() == _pool_state(pool) == (0, 0)
+
+    assert metrics.get(f"{NAME}.checkouts") == 2
+    assert metrics.get(f"{NAME}.checkout_us") > 0
+
+
+async def test_disposed_engine_reports_new_pool(engine):
+    async with engine.connect():
+        await engine.dispose()
+
+        pool = engine.sync_engine.pool
+        # the old pool listeners aren't carried over
+        assert len(pool.dispatch.checkout) == len(pool.dispatch.checkin) == 1
+        async with engine.connect():
+            assert _gauges() == _pool_state(pool) == (1, 0)
+        assert _gauges() == (0, 0)
+        assert metrics.get(f"{NAME}.checkouts") == 2
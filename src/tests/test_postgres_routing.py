@@ -0,0 +1,53 @@
+"""
+Unit tests for read replica routing of `RoutingSession`.
+Tests: plain select to a replica, writing selects (FOR UPDATE, refresh token
+rotation CTE) to the primary and sticky afterwards, `primary_reads` not sticky.
+"""
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import select
+
+from src.core import postgres
+from src.core.postgres import RoutingSession, primary_reads, replica_lag
+from src.models.user import User as UserModel
+from src.repositories.auth import RevokedTokenRepository
+
+
+_primary = SimpleNamespace(sync_engine="primary")
+_replica = SimpleNamespace(sync_engine="replica")
+
+
+@pytest.fixture
+def session(monkeypatch):
+    monkeypatch.setattr(postgres, "_async_engine", _primary)
+    monkeypatch.setattr(replica_lag, "engines", [_replica])
+    monkeypatch.setattr(replica_lag, "lags", [0.0])
+    return RoutingSession()
+
+
+def _rotate_statement():
+    return RevokedTokenRepository(db=None, redis_repository=None).rotation("jti", "09123456789", 2_000_000_000)
+
+
+def test_plain_select_goes_to_replica(session):
+    assert session.get_bind(clause=select(UserModel)) == "replica"
+
+
+def test_select_for_update_goes_to_primary(session):
+    assert session.get_bind(clause=select(UserModel).with_for_update()) == "primary"
+
+
+def test_refresh_token_rotation_goes_to_primary_and_sticks(session):
+    assert session.get_bind(clause=_rotate_statement()) == "primary"
+    assert session.get_bind(clause=select(UserModel)) == "primary"
+
+
+def test_primary_reads_dont_stick(session):
+    with primary_reads(session):
+        assert session.get_bind(clause=select(UserModel)) == "primary"
+        with primary_reads(session):
+            assert session.get_bind(clause=select(UserModel)) == "primary"
+        assert session.get_bind(clause=select(UserModel)) == "primary"
+
+    assert session.get_bind(clause=select(UserModel)) == "replica"
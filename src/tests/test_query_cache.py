@@ -0,0 +1,164 @@
+"""
+Unit tests for `CachedSqlRepository` and `cached_query`, on sqlite and fakeredis.
+Tests: tags bumped after commit only, the in worker stampede guard, the redis
+lock across workers, user writes invalidating queries depending on users,
+fills read from the primary.
+"""
+import asyncio
+
+import pytest
+from pydantic import BaseModel
+
+from src.config import setting
+from src.models.user import User as UserModel
+from src.repositories.base import CachedSqlRepository, cached_query
+from src.repositories.user import UserRepository
+
+
+pytestmark = pytest.mark.anyio
+
+
+class _UserNames(CachedSqlRepository):
+    model = UserModel
+
+    queries = 0
+
+    @cached_query(exclude=("password",))
+    async def list_names(self, first_name: str):
+        _UserNames.queries += 1
+        # long enough for concurrent callers to find it in flight
+        await asyncio.sleep(0.01)
+        return await self.list_all(limit=100, offset=0)
+
+
+class _UpdateName(BaseModel):
+    first_name: str
+
+
+async def _tag(repository, tag: str = "cache_tag_user") -> bytes | None:
+    return await repository._redis_repository.redis.get(tag)
+
+
+@pytest.fixture
+async def repository(db, redis_repository):
+    for caches in CachedSqlRepository._local_caches.values():
+        for cache in caches:
+            cache.clear()
+    UserRepository.cache.clear()
+    _UserNames.queries = 0
+
+    db.add_all([
+        UserModel(phone_number=f"0912000000{i}", password="hash", first_name="Test", last_name="User")
+        for i in range(2)
+    ])
+    await db.commit()
+    return _UserNames(db=db, redis_repository=redis_repository)
+
+
+async def test_tags_bumped_after_commit(repository):
+    users = await repository.list_names("Test")
+    assert await repository.list_names("Test") == users
+    assert _UserNames.queries == 1
+
+    await repository.update(users[0], _UpdateName(first_name="New"), partial=True)
+    assert await _tag(repository) is None
+    await repository.list_names("Test")
+    assert _UserNames.queries == 1
+
+    await repository.uow.commit()
+    assert await _tag(repository) == b"1"
+    assert 0 < await repository._redis_repository.redis.ttl("cache_tag_user") <= setting.QUERY_CACHE_TAG_EXPIRE
+    assert [user.first_name for user in await repository.list_names("Test")] == ["New", "Test"]
+    assert _UserNames.queries == 2
+
+
+async def test_rolled_back_write_keeps_cache(repository):
+    users = await repository.list_names("Test")
+    await repository.bulk_delete([user.id for user in users])
+    await repository.uow.rollback()
+
+    assert await _tag(repository) is None
+    assert [user.first_name for user in await repository.list_names("Test")] == ["Test", "Test"]
+    assert _UserNames.queries == 1
+
+
+async def test_concurrent_misses_run_one_query(repository):
+    results = await asyncio.gather(*(repository.list_names("Test") for _ in range(5)))
+
+    assert _UserNames.queries == 1
+    assert all([user.id for user in result] == [1, 2] for result in results)
+    assert repository._inflight == {}
+
+
+async def test_failed_query_is_not_cached(repository):
+    async def query():
+        raise ConnectionError("connection lost")
+
+    with pytest.raises(ConnectionError):
+        await repository.fetch_cached("query.test", "key", 60, query, dict)
+
+    assert repository._inflight == {}
+    assert await repository._query_cache.get("key") is None
+    assert await repository._query_cache.redis.exists("query_key_lock") == 0
+
+
+async def test_redis_lock_waits_for_other_worker(repository):
+    query_cache = repository._query_cache
+    # another worker is running the query
+    await query_cache.redis.set("query_key_lock", 1)
+
+    async def query():
+        raise AssertionError("the lock holder runs the query")
+
+    async def other_worker():
+        await asyncio.sleep(0.1)
+        await query_cache.set("key", {"items": []}, 60)
+
+    (data, result), _ = await asyncio.gather(
+        repository.fetch_cached("query.test", "key", 60, query, dict), other_worker()
+    )
+    assert (data, result) == ({"items": []}, None)
+    # not ours to release
+    assert await query_cache.redis.exists("query_key_lock") == 1
+
+
+async def test_redis_lock_taken_and_released(repository, monkeypatch):
+    monkeypatch.setattr(setting, "QUERY_CACHE_LOCK_TIMEOUT", 0.2)
+    query_cache = repository._query_cache
+    locked = []
+
+    async def query():
+        locked.append(await query_cache.redis.pttl("query_key_lock"))
+        return {"items": [1]}
+
+    assert await repository.fetch_cached("query.test", "key", 60, query, dict) == ({"items": [1]}, {"items": [1]})
+    assert 0 < locked[0] <= 200
+    assert await query_cache.redis.exists("query_key_lock") == 0
+
+    # a lock holder that never wrote the result, the waiter runs the query after the timeout
+    await query_cache.delete("key")
+    await query_cache.redis.set("query_key_lock", 1)
+    assert await repository.fetch_cached("query.test", "key", 60, query, dict) == ({"items": [1]}, {"items": [1]})
+
+
+async def test_user_writes_invalidate_dependent_queries(repository):
+    users = UserRepository(db=repository.db, redis_repository=repository._redis_repository)
+    await repository.list_names("Test")
+
+    await users.update(await users.get_by_id(1), _UpdateName(first_name="New"), partial=True)
+    await users.uow.commit()
+
+    assert await _tag(repository) == b"1"
+    assert await _tag(repository, "cache_tag_user_1") == b"1"
+    assert [user.first_name for user in await repository.list_names("Test")] == ["New", "Test"]
+    assert _UserNames.queries == 2
+
+
+async def test_fill_reads_from_primary(repository, primary_queries):
+    queries = primary_queries(repository.db)
+    await repository.list_names("Test")
+    assert len(queries) == 1
+    # served from the cache
+    await repository.list_names("Test")
+    await repository.list_all(limit=100, offset=0)
+    assert len(queries) == 1
@@ -0,0 +1,98 @@
+"""
+Unit tests for `RedisRepository` on fakeredis.
+Tests: codec round trips, `get_many` / `set_many`, pipeline results, entries
+of another codec read as misses and deleted.
+"""
+import pytest
+
+from src.utils.codec import CODECS, get_codec
+
+
+pytestmark = pytest.mark.anyio
+
+VALUE = {"id": 1, "name": "نام", "scores": [1.5, None, True], "nested": {"empty": []}}
+
+
+@pytest.fixture
+def repository(redis_repository):
+    redis_repository.codec = get_codec("json")
+    return redis_repository
+
+
+@pytest.mark.parametrize("name", list(CODECS))
+async def test_codec_round_trip(repository, name):
+    if name != "json":
+        pytest.importorskip(name)
+    repository.codec = get_codec(name)
+
+    await repository.set("key", VALUE, expire=60)
+    assert await repository.get("key") == VALUE
+    assert await repository.get("missing") is None
+    assert 0 < await repository.redis.ttl("key") <= 60
+
+
+async def test_get_many_set_many(repository):
+    assert await repository.get_many([]) == []
+    await repository.set_many({})
+
+    await repository.set_many({"a": 1, "b": [2]})
+    assert await repository.get_many(["a", "missing", "b"]) == [1, None, [2]]
+    assert await repository.redis.ttl("a") == -1
+
+    await repository.set_many({"c": {"c": 3}}, expire=60)
+    assert await repository.get_many(["c"]) == [{"c": 3}]
+    assert 0 < await repository.redis.ttl("c") <= 60
+
+
+async def test_namespace(repository):
+    users = repository.namespace("user_")
+    await users.set("1", VALUE)
+    assert await repository.get("user_1") == VALUE
+    assert await users.namespace("x_").get("1") is None
+
+    await users.delete("1")
+    assert await repository.redis.exists("user_1") == 0
+
+
+async def test_pipeline_results(repository):
+    await repository.set("cached", VALUE)
+
+    async with repository.pipeline() as pipe:
+        pipe.get("cached")
+        pipe.incr("counter")
+        pipe.expire("counter", 60)
+        pipe.set("new", [1])
+        pipe.get("missing")
+        pipe.delete("cached")
+
+    assert pipe.results == [VALUE, 1, True, True, None, 1]
+    assert await repository.get_many(["cached", "new"]) == [None, [1]]
+    assert await repository.get_counter("counter") == 1
+
+
+async def test_pipeline_execute_inside(repository):
+    async with repository.pipeline() as pipe:
+        pipe.set("key", 1)
+        assert await pipe.execute() == [True]
+        pipe.get("key")
+        assert await pipe.execute() == [1]
+
+    assert pipe.results == [1]
+
+
+async def test_value_of_another_codec_is_a_miss(repository):
+    # written by a worker on another codec
+    await repository.redis.set("other", b"\x81\xa2id\x01")
+    await repository.redis.set("many", b"\x81\xa2id\x01")
+    await repository.redis.set("queued", b"\x81\xa2id\x01")
+    await repository.set("ok", VALUE)
+
+    assert await repository.get("other") is None
+    assert await repository.get_many(["ok", "many"]) == [VALUE, None]
+    async with repository.pipeline() as pipe:
+        pipe.incr("counter")
+        pipe.get("queued")
+    assert pipe.results == [1, None]
+
+    assert await repository.redis.exists("other", "many", "queued") == 0
+    assert await repository.get("ok") == VALUE
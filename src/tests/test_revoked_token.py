@@ -0,0 +1,80 @@
+"""
+Unit tests for refresh token revocation in `RevokedTokenRepository`, on sqlite.
+Tests: revoke once, revoke twice, token revoked before the partitioning
+migration (estimated `expires_at`), rotation guard, tokens revoked by another
+worker.
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql
+
+from src.models.auth import RevokedToken as RevokedTokenModel
+from src.repositories.auth import RevokedTokenRepository
+from src.repositories.keys import REVOKED_TOKEN_KEY, REVOKED_TOKEN_READY_KEY
+
+
+EXP = int(datetime(2030, 1, 8, tzinfo=timezone.utc).timestamp())
+
+# partitioned table in postgres, `id` is a plain column here
+REVOKED_TOKEN_DDL = """
+CREATE TABLE revoked_token (
+    id INTEGER,
+    user_id INTEGER NOT NULL,
+    jti VARCHAR(128) NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    expires_at DATETIME NOT NULL,
+    PRIMARY KEY (id, expires_at),
+    CONSTRAINT uq_revoked_token_jti_expires_at UNIQUE (jti, expires_at)
+)
+"""
+
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def db_tables():
+    return (REVOKED_TOKEN_DDL,)
+
+
+@pytest.fixture
+def repository(db):
+    return RevokedTokenRepository(db=db, redis_repository=None)
+
+
+async def test_revoke_once(repository):
+    assert await repository.revoke("jti", 1, EXP) is True
+    assert await repository.revoke("jti", 1, EXP) is False
+    assert await repository.revoke("other", 1, EXP) is True
+
+
+async def test_revoke_token_revoked_before_migration(repository):
+    # copied by the migration: `created_at + REFRESH_EXPIRE`, not the token `exp`
+    created_at = datetime(2030, 1, 2, 12, tzinfo=timezone.utc)
+    await repository.db.execute(
+        insert(RevokedTokenModel).values(
+            id=1, user_id=1, jti="legacy", created_at=created_at, expires_at=created_at + timedelta(days=7)
+        )
+    )
+    assert await repository.revoke("legacy", 1, EXP) is False
+
+
+def test_rotate_checks_jti_under_any_expiry():
+    statement = RevokedTokenRepository(db=None, redis_repository=None).rotation("jti", "09123456789", EXP)
+
+    sql = " ".join(str(statement.compile(dialect=postgresql.dialect())).split())
+    assert "WHERE NOT (EXISTS (SELECT * FROM revoked_token WHERE revoked_token.jti = %(jti_1)s))" in sql
+    assert "ON CONFLICT (jti, expires_at) DO NOTHING" in sql
+
+
+async def test_token_revoked_by_another_worker(db, redis_repository):
+    repository = RevokedTokenRepository(db=db, redis_repository=redis_repository)
+    redis = redis_repository.redis
+    await redis.set(REVOKED_TOKEN_READY_KEY, 1)
+    assert await repository.is_revoked_token("jti") is False
+
+    # `cache_revocation` of another worker, this one never saw the jti
+    await redis.set(REVOKED_TOKEN_KEY.format(jti="jti"), 1)
+    assert await repository.is_revoked_token("jti") is True
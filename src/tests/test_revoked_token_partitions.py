@@ -0,0 +1,149 @@
+"""
+Unit tests for `maintain_revoked_token_partitions`, statements recorded by a
+session stub (the partitioning is postgres only).
+Tests: rows of the default partition moved before a partition is attached,
+expired partitions detached before the drop, concurrently without a default
+partition, pending detaches finalized, the task module stays light.
+"""
+import subprocess
+import sys
+from datetime import datetime, timedelta, timezone
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import exc
+
+from src.tasks import revoked_token
+from src.tasks.revoked_token import DEFAULT_PARTITION, maintain_revoked_token_partitions, partition_name, week_start
+
+
+class _Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def all(self):
+        return self.rows
+
+
+class _Connection:
+    def __init__(self, db):
+        self.db = db
+
+    def execution_options(self, **options):
+        self.db.statements.append(f"-- {options}")
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, statement):
+        statement = str(statement)
+        if statement.startswith("DROP") and self.db.locked:
+            raise exc.OperationalError(statement, {}, Exception("lock timeout"))
+        self.db.statements.append(statement)
+
+
+class _Db:
+    def __init__(self, partitions, locked=False):
+        self.partitions = partitions
+        self.locked = locked
+        self.statements = []
+
+    def execute(self, statement):
+        statement = str(statement)
+        if "pg_inherits" in statement:
+            return _Result(list(self.partitions.items()))
+        self.statements.append(statement)
+
+    def commit(self):
+        self.statements.append("COMMIT")
+
+    def get_bind(self):
+        return self
+
+    def connect(self):
+        return _Connection(self)
+
+
+def _run(monkeypatch, db):
+    @contextmanager
+    def get_postdb_cm():
+        yield db
+
+    monkeypatch.setattr(revoked_token, "get_postdb_cm", get_postdb_cm)
+    maintain_revoked_token_partitions()
+    return db.statements
+
+
+@pytest.fixture
+def weeks():
+    """ partition names, this week and the ones after, then the expired week. """
+    first = week_start(datetime.now(timezone.utc).date())
+    return [partition_name(first + timedelta(weeks=week)) for week in range(20)], partition_name(first - timedelta(weeks=2))
+
+
+def test_default_rows_moved_before_attach(monkeypatch, weeks):
+    ahead, _ = weeks
+    missing = ahead[1]
+    statements = _run(monkeypatch, _Db({name: False for name in ahead if name != missing} | {DEFAULT_PARTITION: False}))
+
+    create = statements.index(f"CREATE TABLE {missing} (LIKE revoked_token INCLUDING DEFAULTS)")
+    assert len(statements) == create + 5
+    assert statements[create + 1].startswith(f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} ")
+    assert statements[create + 1].endswith(f"INSERT INTO {missing} SELECT * FROM moved")
+    assert statements[create + 2].startswith(f"ALTER TABLE revoked_token ATTACH PARTITION {missing} FOR VALUES")
+    assert statements[create + 3] == "COMMIT"
+
+
+def test_no_default_partition_nothing_to_move(monkeypatch, weeks):
+    ahead, _ = weeks
+    start = week_start(datetime.now(timezone.utc).date()) + timedelta(weeks=1)
+    end = start + timedelta(weeks=1)
+    statements = _run(monkeypatch, _Db({name: False for name in ahead if name != ahead[1]}))
+    assert statements == [
+        f"CREATE TABLE {ahead[1]} (LIKE revoked_token INCLUDING DEFAULTS)",
+        f"ALTER TABLE revoked_token ATTACH PARTITION {ahead[1]} FOR VALUES FROM ('{start} 00:00:00+00') TO ('{end} 00:00:00+00')",
+        "COMMIT",
+        "COMMIT",
+    ]
+
+
+def test_expired_partition_detached_concurrently(monkeypatch, weeks):
+    ahead, expired = weeks
+    statements = _run(monkeypatch, _Db({name: False for name in ahead} | {expired: False}))
+
+    assert statements == [
+        "COMMIT",
+        "-- {'isolation_level': 'AUTOCOMMIT'}",
+        "SET lock_timeout = '5s'",
+        f"ALTER TABLE revoked_token DETACH PARTITION {expired} CONCURRENTLY",
+        f"DROP TABLE {expired}",
+    ]
+
+
+def test_expired_partition_detached_with_default(monkeypatch, weeks):
+    ahead, expired = weeks
+    statements = _run(monkeypatch, _Db({name: False for name in ahead} | {expired: False, DEFAULT_PARTITION: False}))
+    # postgres has no concurrent detach while a default partition exists
+    assert statements[-2:] == [f"ALTER TABLE revoked_token DETACH PARTITION {expired}", f"DROP TABLE {expired}"]
+
+
+def test_pending_detach_finalized(monkeypatch, weeks):
+    ahead, expired = weeks
+    statements = _run(monkeypatch, _Db({name: False for name in ahead} | {expired: True}))
+    assert statements[-2:] == [f"ALTER TABLE revoked_token DETACH PARTITION {expired} FINALIZE", f"DROP TABLE {expired}"]
+
+
+def test_lock_timeout_retried_next_run(monkeypatch, weeks):
+    ahead, expired = weeks
+    statements = _run(monkeypatch, _Db({name: False for name in ahead} | {expired: False}, locked=True))
+    assert f"DROP TABLE {expired}" not in statements
+
+
+def test_task_module_is_light():
+    modules = ("fastapi", "sqlalchemy.ext.asyncio", "src.repositories.auth", "src.core.postgres", "src.core.redis")
+    code = f"import sys, src.tasks.revoked_token; print([m for m in {modules!r} if m in sys.modules])"
+    assert subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout.strip() == "[]"
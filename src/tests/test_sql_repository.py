@@ -0,0 +1,181 @@
+"""
+Unit tests for `SqlRepository` writes and projections, on sqlite and fakeredis.
+Tests: `create` / `update` return the server generated columns from the
+write's `RETURNING` (`eager_defaults`), no follow up SELECT. `project` rows
+through `json_list` / `paginated_json` (geom validator on raw rows, schema
+fields that aren't columns), cached rows round trip by `dump_row` / `load_row`.
+"""
+import json
+from datetime import datetime
+from typing import List
+
+import pytest
+from geoalchemy2 import WKBElement
+from pydantic import BaseModel, TypeAdapter
+from shapely import wkb
+from shapely.geometry import Point
+from sqlalchemy import inspect, text
+
+from src.models.user import User as UserModel
+from src.repositories.base import CachedSqlRepository, SqlRepository
+from src.repositories.mechanic import MechanicRepository
+from src.schemas.mechanic import MechanicOut, MechanicOutList
+from src.utils.pagination import NEXT_CURSOR_HEADER, json_list, paginated_json
+
+
+pytestmark = pytest.mark.anyio
+
+# `geom` is a blob of EWKB here, no spatialite
+MECHANIC_DDL = """
+CREATE TABLE mechanic (
+    id INTEGER PRIMARY KEY,
+    name VARCHAR(150) NOT NULL,
+    description TEXT,
+    geom BLOB,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    user_id INTEGER NOT NULL
+)
+"""
+
+POINTS = [(51.39, 35.69), (51.4, 35.7), (59.6, 36.3)]
+
+
+class _UserRepository(SqlRepository):
+    model = UserModel
+
+
+class _CreateUser(BaseModel):
+    phone_number: str
+    password: str = "hash"
+    first_name: str = "Test"
+    last_name: str = "User"
+
+
+class _UpdateName(BaseModel):
+    first_name: str
+
+
+class _MechanicDistance(MechanicOut):
+    distance: float | None = None
+
+
+class _MechanicWithUser(MechanicOut):
+    user: dict
+
+
+@pytest.fixture
+def db_tables():
+    return (UserModel.__table__, MECHANIC_DDL)
+
+
+@pytest.fixture
+def repository(db):
+    return _UserRepository(db)
+
+
+@pytest.fixture
+async def mechanics(db, redis_repository):
+    for caches in CachedSqlRepository._local_caches.values():
+        for cache in caches:
+            cache.clear()
+
+    # what spatialite would run around a geometry column
+    connection = await (await db.connection()).get_raw_connection()
+    await connection.driver_connection.create_function("AsEWKB", 1, lambda value: value, deterministic=True)
+    for i, point in enumerate(POINTS, 1):
+        await db.execute(
+            text("INSERT INTO mechanic (id, name, description, geom, user_id) VALUES (:id, :name, 'd', :geom, :id)"),
+            {"id": i, "name": f"mechanic {i}", "geom": wkb.dumps(Point(*point), srid=4326)},
+        )
+    await db.commit()
+    return MechanicRepository(db=db, redis_repository=redis_repository)
+
+
+def _loaded(db_obj, *columns) -> bool:
+    state = inspect(db_obj)
+    return not state.expired and not set(columns) & state.unloaded
+
+
+async def test_create_returns_server_defaults(repository, count_queries):
+    queries = count_queries(repository.db)
+
+    user = await repository.create(_CreateUser(phone_number="09120000000"))
+    await repository.uow.commit()
+
+    assert _loaded(user, "id", "created_at", "updated_at")
+    assert user.id == 1
+    assert isinstance(user.created_at, datetime) and isinstance(user.updated_at, datetime)
+    assert len(queries) == 1
+    assert queries[0].startswith("INSERT") and "RETURNING" in queries[0]
+
+
+async def test_update_returns_server_onupdate(repository, count_queries):
+    user = await repository.create(_CreateUser(phone_number="09120000000"))
+    await repository.uow.commit()
+    queries = count_queries(repository.db)
+
+    user = await repository.update(user, _UpdateName(first_name="Renamed"), True)
+    await repository.uow.commit()
+
+    assert _loaded(user, "id", "created_at", "updated_at")
+    assert user.first_name == "Renamed" and isinstance(user.updated_at, datetime)
+    assert len(queries) == 1
+    assert queries[0].startswith("UPDATE") and "RETURNING" in queries[0]
+
+
+def _expected(points=POINTS, start=1):
+    return [
+        {"id": i, "name": f"mechanic {i}", "description": "d", "geom": list(point)}
+        for i, point in enumerate(points, start)
+    ]
+
+
+async def test_project_selects_schema_columns(mechanics):
+    assert [column.name for column in mechanics.project(MechanicOut).selected_columns] == [
+        "id", "name", "description", "geom"
+    ]
+    # not a column, left to its default
+    assert [column.name for column in mechanics.project(_MechanicDistance).selected_columns] == [
+        "id", "name", "description", "geom"
+    ]
+    with pytest.raises(ValueError):
+        mechanics.project(_MechanicWithUser)
+
+
+async def test_projected_rows_json(mechanics):
+    rows = (await mechanics.db.execute(mechanics.project(MechanicOut))).all()
+    assert json.loads(json_list(MechanicOutList, rows).body) == _expected()
+
+    rows = (await mechanics.db.execute(mechanics.project(_MechanicDistance))).all()
+    content = json.loads(json_list(TypeAdapter(List[_MechanicDistance]), rows).body)
+    assert content == [{**item, "distance": None} for item in _expected()]
+
+
+async def test_projected_page_json(mechanics):
+    page = await mechanics.list_page(2, schema=MechanicOut)
+    response = paginated_json(MechanicOutList, page)
+    assert json.loads(response.body) == _expected(POINTS[:2])
+
+    page = await mechanics.list_page(2, cursor=response.headers[NEXT_CURSOR_HEADER], schema=MechanicOut)
+    response = paginated_json(MechanicOutList, page)
+    assert json.loads(response.body) == _expected(POINTS[2:], start=3)
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+
+async def test_cached_rows_round_trip(mechanics, count_queries):
+    row = (await mechanics.db.execute(mechanics.project(MechanicOut))).first()
+    loaded = mechanics.load_row(json.loads(json.dumps(mechanics.dump_row(row))))
+    assert isinstance(loaded["geom"], WKBElement)
+    assert MechanicOut.model_validate(loaded) == MechanicOut.model_validate(row, from_attributes=True)
+
+    queries = count_queries(mechanics.db)
+    fresh = paginated_json(MechanicOutList, await mechanics.list_page(2, schema=MechanicOut))
+    # from redis, L1 dropped
+    for caches in CachedSqlRepository._local_caches.values():
+        for cache in caches:
+            cache.clear()
+    cached = paginated_json(MechanicOutList, await mechanics.list_page(2, schema=MechanicOut))
+
+    assert len(queries) == 1
+    assert cached.body == fresh.body
+    assert cached.headers[NEXT_CURSOR_HEADER] == fresh.headers[NEXT_CURSOR_HEADER]
@@ -0,0 +1,141 @@
+"""
+Unit tests for the request transaction: `UnitOfWork`, `unit_of_work` and `autocommit`, on sqlite.
+Tests: commit on success, rollback on exception, `after_commit` callbacks run
+only after a successful commit, a failing callback, `autocommit` opt out.
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import func, select
+
+from src.models.user import User as UserModel
+from src.repositories.base import UnitOfWork, autocommit, unit_of_work
+from src.utils.metrics import metrics
+
+
+pytestmark = pytest.mark.anyio
+
+def _user(i: int = 0) -> UserModel:
+    return UserModel(phone_number=f"0912000000{i}", password="hash", first_name="Test", last_name="User")
+
+
+async def _count(db) -> int:
+    return await db.scalar(select(func.count()).select_from(UserModel))
+
+
+class _Recorder:
+    """ `after_commit` callback recording whether the transaction was still open. """
+
+    def __init__(self, db):
+        self.db = db
+        self.calls = []
+
+    async def __call__(self):
+        self.calls.append(self.db.in_transaction())
+
+
+async def test_commit_on_success(db):
+    request = unit_of_work(db)
+    assert await request.__anext__() is db
+
+    uow = UnitOfWork(db)
+    callback = _Recorder(db)
+    db.add(_user())
+    await uow.save()
+    await uow.after_commit(callback)
+    # flushed, not committed
+    assert db.in_transaction()
+    assert callback.calls == []
+
+    with pytest.raises(StopAsyncIteration):
+        await request.__anext__()
+
+    assert callback.calls == [False]
+    assert "after_commit" not in db.info
+    assert await _count(db) == 1
+
+
+async def test_rollback_on_exception(db):
+    request = unit_of_work(db)
+    await request.__anext__()
+
+    uow = UnitOfWork(db)
+    callback = _Recorder(db)
+    db.add(_user())
+    await uow.save()
+    await uow.after_commit(callback)
+
+    with pytest.raises(ValueError):
+        await request.athrow(ValueError("endpoint failed"))
+
+    assert callback.calls == []
+    assert "after_commit" not in db.info
+    assert await _count(db) == 0
+
+
+async def test_after_commit_skipped_when_commit_fails(db, monkeypatch):
+    async def commit():
+        raise ConnectionError("connection lost")
+
+    monkeypatch.setattr(db, "commit", commit)
+    uow = UnitOfWork(db)
+    callback = _Recorder(db)
+    await uow.after_commit(callback)
+
+    with pytest.raises(ConnectionError):
+        await uow.commit()
+    assert callback.calls == []
+
+
+async def test_after_commit_callbacks_run_in_order(db):
+    uow, calls = UnitOfWork(db), []
+    for i in range(3):
+        await uow.after_commit(lambda i=i: asyncio.sleep(0, calls.append(i)))
+
+    await uow.commit()
+    assert calls == [0, 1, 2]
+    # callbacks of a committed transaction don't run again
+    await uow.commit()
+    assert calls == [0, 1, 2]
+
+
+async def test_failing_after_commit_callback(db, reset_metrics):
+    uow, calls = UnitOfWork(db), []
+
+    async def redis_down():
+        raise ConnectionError("redis down")
+
+    await uow.after_commit(lambda: asyncio.sleep(0, calls.append(0)))
+    await uow.after_commit(redis_down)
+    await uow.after_commit(lambda: asyncio.sleep(0, calls.append(2)))
+
+    db.add(_user())
+    await uow.commit()
+    # the others still ran, the write stays committed
+    assert calls == [0, 2]
+    assert metrics.get("unit_of_work.after_commit_errors") == 1
+
+    uow.autocommit = True
+    await uow.after_commit(redis_down)
+    assert metrics.get("unit_of_work.after_commit_errors") == 2
+    assert await _count(db) == 1
+
+
+async def test_autocommit_opt_out(db):
+    request = unit_of_work(db)
+    await request.__anext__()
+    await autocommit(db)
+
+    uow = UnitOfWork(db)
+    assert uow.autocommit
+    callback = _Recorder(db)
+    db.add(_user())
+    await uow.save()
+    # committed by `save`, the callback runs right away
+    assert not db.in_transaction()
+    await uow.after_commit(callback)
+    assert callback.calls == [False]
+
+    with pytest.raises(ValueError):
+        await request.athrow(ValueError("endpoint failed"))
+    assert await _count(db) == 1
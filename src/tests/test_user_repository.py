@@ -0,0 +1,241 @@
+"""
+Unit tests for `UserRepository` caches and bulk writes, on sqlite and fakeredis.
+Tests: bulk create order, bulk update / delete invalidate the user caches
+after commit and bump session epochs for session columns, session epochs
+survive a redis flush and are never lowered, cached lookups by L1 / redis,
+a fill racing a write isn't stored, every user write invalidates, fills read
+from the primary.
+"""
+from types import SimpleNamespace
+
+import pytest
+from pydantic import BaseModel
+
+from src.models.user import User as UserModel, UserRole
+from src.repositories.user import UserRepository
+
+
+pytestmark = pytest.mark.anyio
+
+
+class _CreateUser(BaseModel):
+    phone_number: str
+    password: str = "hash"
+    first_name: str = "Test"
+    last_name: str = "User"
+
+
+class _UpdateRole(BaseModel):
+    role: UserRole
+
+
+class _UpdateName(BaseModel):
+    first_name: str
+
+
+@pytest.fixture
+def repository(db, redis_repository):
+    UserRepository.cache.clear()
+    return UserRepository(db=db, redis_repository=redis_repository)
+
+
+async def _cached_users(repository, count=2):
+    users = await repository.bulk_create([_CreateUser(phone_number=f"0912000000{i}") for i in range(count)])
+    await repository.uow.commit()
+
+    for user in users:
+        repository.cache.set(user.phone_number, {"id": user.id})
+        await repository._user_cache.set(user.phone_number, {"id": user.id})
+    return users
+
+
+async def _is_cached(repository, user) -> bool:
+    return (
+        repository.cache.get(user.phone_number) is not None
+        or await repository._user_cache.get(user.phone_number) is not None
+    )
+
+
+async def test_bulk_create_returns_rows_in_input_order(repository):
+    phone_numbers = [f"0912000000{i}" for i in (3, 1, 2)]
+    users = await repository.bulk_create([_CreateUser(phone_number=phone) for phone in phone_numbers])
+    assert [user.phone_number for user in users] == phone_numbers
+
+
+async def test_bulk_update_session_column_invalidates_after_commit(repository):
+    first, second = await _cached_users(repository)
+
+    await repository.bulk_update({first.id: _UpdateRole(role=UserRole.admin)}, partial=True)
+    assert await _is_cached(repository, first)
+
+    await repository.uow.commit()
+    assert not await _is_cached(repository, first)
+    assert await repository.get_session_epoch(first.id) == 1
+    # the identity map instance follows the update
+    assert first.role == UserRole.admin
+
+    assert await _is_cached(repository, second)
+    assert await repository.get_session_epoch(second.id) == 0
+
+
+async def test_bulk_update_other_column_keeps_sessions(repository):
+    first, _ = await _cached_users(repository)
+
+    await repository.bulk_update({first.id: _UpdateName(first_name="New")}, partial=True)
+    await repository.uow.commit()
+
+    assert not await _is_cached(repository, first)
+    assert await repository.get_session_epoch(first.id) == 0
+
+
+async def test_bulk_delete_invalidates_after_commit(repository):
+    first, second = await _cached_users(repository)
+
+    await repository.get_session_epoch(first.id)
+    await repository.bulk_delete([first.id])
+    await repository.uow.commit()
+
+    assert not await _is_cached(repository, first)
+    # no user, every token of it is rejected
+    assert await repository.get_session_epoch(first.id) is None
+    assert await _is_cached(repository, second)
+
+
+async def test_bulk_update_rolled_back_keeps_cache(repository):
+    first, _ = await _cached_users(repository)
+    # rollback expires the instance
+    first = SimpleNamespace(id=first.id, phone_number=first.phone_number)
+
+    await repository.bulk_update({first.id: _UpdateRole(role=UserRole.admin)}, partial=True)
+    await repository.uow.rollback()
+
+    assert await _is_cached(repository, first)
+    assert await repository.get_session_epoch(first.id) == 0
+
+
+async def test_session_epoch_survives_redis_flush(repository):
+    redis = repository._redis_repository.redis
+    first, second = await _cached_users(repository)
+
+    await repository.change_user_role(first, UserRole.admin)
+    await repository.uow.commit()
+    assert await repository.get_session_epoch(first.id) == 1
+
+    await redis.flushall()
+    assert await repository.get_session_epoch(first.id) == 1
+    assert await repository.get_session_epoch(second.id) == 0
+    assert int(await redis.get(f"session_epoch_v2_{first.id}")) == 1
+
+
+async def test_session_epoch_missing_user(repository):
+    assert await repository.get_session_epoch(404) is None
+
+
+async def test_session_epoch_cache_never_lowered(repository):
+    first, _ = await _cached_users(repository)
+
+    await repository.bump_session_epochs([first.id])
+    await repository.uow.commit()
+    # a reader that loaded the epoch before the commit
+    await repository.cache_session_epochs([(first.id, 0)])
+
+    assert await repository.get_session_epoch(first.id) == 1
+
+
+def _new_request(repository) -> None:
+    """ the next lookups run as in another request: no identity map. """
+    repository.db.expunge_all()
+    repository.db.info.pop("identity", None)
+
+
+async def _created_user(repository):
+    users = await repository.bulk_create([_CreateUser(phone_number="09120000000")])
+    await repository.uow.commit()
+    _new_request(repository)
+    return users[0]
+
+
+async def test_cached_lookup_tiers(repository, count_queries):
+    await _created_user(repository)
+    queries = count_queries(repository.db)
+
+    user = await repository.get_by_phone_number_cached("09120000000")
+    assert user.role == UserRole.user
+    assert len(queries) == 1
+    assert await repository._user_cache.get("09120000000") == repository.cache.get("09120000000")
+    assert "password" not in repository.cache.get("09120000000")
+
+    # L1
+    _new_request(repository)
+    assert (await repository.get_by_phone_number_cached("09120000000")).id == user.id
+    # redis
+    _new_request(repository)
+    repository.cache.clear()
+    assert (await repository.get_by_phone_number_cached("09120000000")).role == UserRole.user
+    assert repository.cache.get("09120000000") is not None
+    assert len(queries) == 1
+
+    assert await repository.get_by_phone_number_cached("09129999999") is None
+    assert await repository._user_cache.get("09129999999") is None
+
+
+async def test_cached_lookup_racing_a_write_is_not_stored(repository, monkeypatch, reset_metrics):
+    user = await _created_user(repository)
+    read = repository.get_by_phone_number
+
+    async def read_then_write(phone_number):
+        db_obj = await read(phone_number)
+        # a write of the user commits while the fill holds the old row
+        await repository.invalidate_many([user])
+        return db_obj
+
+    monkeypatch.setattr(repository, "get_by_phone_number", read_then_write)
+    await repository.get_by_phone_number_cached("09120000000")
+
+    assert repository.cache.get("09120000000") is None
+    assert await repository._user_cache.get("09120000000") is None
+    assert reset_metrics.get("cache.user.stale_fill") == 1
+
+    # the next fill stores
+    monkeypatch.setattr(repository, "get_by_phone_number", read)
+    _new_request(repository)
+    await repository.get_by_phone_number_cached("09120000000")
+    assert await repository._user_cache.get("09120000000") is not None
+
+
+@pytest.mark.parametrize("write, column, value", [
+    (lambda repository, user: repository.user_status(user, False), "is_active", False),
+    (lambda repository, user: repository.user_status(user, True), "is_active", True),
+    (lambda repository, user: repository.change_user_role(user, UserRole.admin), "role", UserRole.admin),
+    (lambda repository, user: repository.soft_delete(user), "is_delete", False),
+    (lambda repository, user: repository.out_of_soft_delete(user), "is_delete", True),
+    (lambda repository, user: repository.reset_password(user, "new hash"), "password", "new hash"),
+])
+async def test_writes_invalidate_cached_user(repository, write, column, value):
+    await _created_user(repository)
+    cached = await repository.get_by_phone_number_cached("09120000000")
+    await write(repository, cached)
+    assert repository.cache.get("09120000000") is not None or await repository._user_cache.get("09120000000")
+
+    await repository.uow.commit()
+    assert repository.cache.get("09120000000") is None
+    assert await repository._user_cache.get("09120000000") is None
+
+    _new_request(repository)
+    if column == "password":
+        assert (await repository.get_by_phone_number("09120000000")).password == value
+    else:
+        assert getattr(await repository.get_by_phone_number_cached("09120000000"), column) == value
+
+
+async def test_cache_fills_read_from_primary(repository, primary_queries):
+    user = await _created_user(repository)
+    queries = primary_queries(repository.db)
+
+    await repository.get_by_phone_number_cached("09120000000")
+    await repository.get_session_epoch(user.id)
+    assert len(queries) == 2
+
+    _new_request(repository)
+    await repository.get_by_phone_number("09120000000")
+    assert len(queries) == 2
@@ -1,3 +1,8 @@
+import asyncio
+import hashlib
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from passlib.context import CryptContext
 from uuid import uuid4
 from typing import Any, Dict, List
@@ -12,30 +17,107 @@ from src.repositories.user import UserRepository
 from src.schemas.auth import TokenType
 from src.models.user import User as UserModel, UserRole
 from src.config import setting
+from src.utils.cache import LRUCache
+from src.utils.jwt_keys import JwtKeyRing
+from src.utils.metrics import metrics
 from src.utils.singleton import SingletonMeta
 
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 class UserPassword:
+    """
+    - bcrypt is cpu bound, inside async code use the `*_async` methods.
+    - They run on a process pool of `PASSWORD_HASH_WORKERS` processes and at most
+      `PASSWORD_HASH_MAX_CONCURRENCY` jobs are submitted, the rest wait in line.
+    - `PASSWORD_HASH_WORKERS = 0` hashes in the default thread pool instead.
+    - A pool whose worker died (e.g. OOM killed) is replaced and the job retried once.
+    """
+
+    _executor: ProcessPoolExecutor | None = None
+    _semaphore: asyncio.Semaphore | None = None
+    _waiting: int = 0
     
     @staticmethod
-    def verify_password(plain_password: str, hashed_password: str) -> str:
+    def verify_password(plain_password: str, hashed_password: str) -> bool:
         return pwd_context.verify(plain_password, hashed_password)
 
     @staticmethod
     def generate_password_hash(password: str) -> str:
         return pwd_context.hash(password)
+
+    @classmethod
+    async def verify_password_async(cls, plain_password: str, hashed_password: str) -> bool:
+        return await cls._run(cls.verify_password, plain_password, hashed_password)
+
+    @classmethod
+    async def generate_password_hash_async(cls, password: str) -> str:
+        return await cls._run(cls.generate_password_hash, password)
+
+    @classmethod
+    async def _run(cls, func, *args):
+        if cls._semaphore is None:
+            cls._semaphore = asyncio.Semaphore(setting.PASSWORD_HASH_MAX_CONCURRENCY)
+        if cls._executor is None and setting.PASSWORD_HASH_WORKERS > 0:
+            cls._executor = ProcessPoolExecutor(max_workers=setting.PASSWORD_HASH_WORKERS)
+
+        start = time.perf_counter()
+        cls._waiting += 1
+        metrics.gauge("password_hash.waiting", cls._waiting)
+        try:
+            await cls._semaphore.acquire()
+        finally:
+            cls._waiting -= 1
+            metrics.gauge("password_hash.waiting", cls._waiting)
+
+        try:
+            metrics.incr("password_hash.wait_ms", int((time.perf_counter() - start) * 1000))
+            metrics.incr("password_hash.jobs")
+
+            loop = asyncio.get_running_loop()
+            executor = cls._executor
+            try:
+                return await loop.run_in_executor(executor, func, *args)
+            except BrokenProcessPool:
+                metrics.incr("password_hash.pool_restarts")
+                # concurrent jobs of the broken pool replace it only once
+                if cls._executor is executor:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    cls._executor = ProcessPoolExecutor(max_workers=setting.PASSWORD_HASH_WORKERS)
+                return await loop.run_in_executor(cls._executor, func, *args)
+        finally:
+            cls._semaphore.release()
+
+    @classmethod
+    def shutdown(cls) -> None:
+        if cls._executor is not None:
+            cls._executor.shutdown(wait=False, cancel_futures=True)
+            cls._executor = None
+        cls._semaphore = None
     
 
 
 class Jwt(metaclass=SingletonMeta):
+    """
+    - Signs with the `JWT_ACTIVE_KID` key of `JWT_KEYS_DIR` and a `kid` header
+      when a key ring is configured, otherwise with `SECRET_KEY`.
+    - Tokens without `kid` are still verified with `SECRET_KEY`, so switching
+      to the key ring doesn't log everybody out.
+    - Verified payloads are kept by token hash until the token `exp`, call
+      `forget` when a token gets revoked.
+    """
     
     INVALID_TOKEN = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Session has been expired."
     )
 
+    def __init__(self):
+        self.cache = LRUCache("jwt", maxsize=setting.JWT_CACHE_SIZE, ttl=0)
+        self.key_ring: JwtKeyRing | None = None
+        if setting.JWT_KEYS_DIR:
+            self.key_ring = JwtKeyRing(setting.JWT_KEYS_DIR, setting.JWT_ACTIVE_KID)
+
     def normalize_token(self, token: str) -> str:
         return token.replace("Bearer ", "")
     
@@ -50,26 +132,81 @@ class Jwt(metaclass=SingletonMeta):
         expire = datetime.now(timezone.utc) + expires_delta
         
         to_encode.update({"exp": expire, "token_type": token_type, "jti": str(uuid4())})
+
+        if self.key_ring is not None:
+            key = self.key_ring.active
+            return pyjwt.encode(
+                to_encode, key.private_key, algorithm=key.algorithm, headers={"kid": key.kid}
+            )
         
         encoded_jwt = pyjwt.encode(to_encode, setting.SECRET_KEY, algorithm=setting.JWT_ALGORITHM)
 
         return encoded_jwt
         
+    def cache_key(self, token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
     def verify_token(self, token: str, token_type: TokenType) -> Dict[str, Any]:
         """ token need to be healty and will return payload """
         token = self.normalize_token(token)
+        cache_key = self.cache_key(token)
+
+        payload = self.cache.get(cache_key)
+        if payload is not None:
+            if payload["token_type"] != token_type:
+                raise self.INVALID_TOKEN
+            return dict(payload)
+
         try:
             if not token:
                 raise
             
-            payload: dict = pyjwt.decode(token, key=setting.SECRET_KEY, algorithms=[setting.JWT_ALGORITHM])
+            kid = pyjwt.get_unverified_header(token).get("kid")
+            if kid is None:
+                payload: dict = pyjwt.decode(token, key=setting.SECRET_KEY, algorithms=[setting.JWT_ALGORITHM])
+            else:
+                key = self.key_ring.get(kid)
+                payload: dict = pyjwt.decode(token, key=key.public_key, algorithms=[key.algorithm])
+
             if payload["token_type"] != token_type:
                 raise 
-            
-            return payload   
         except Exception:
             raise self.INVALID_TOKEN
-        
+
+        self.cache.set(cache_key, payload, ttl=payload.get("exp", 0) - time.time())
+        return dict(payload)
+
+    def forget(self, token: str) -> None:
+        """ drop a revoked token from the verified payloads. """
+        self.cache.delete(self.cache_key(self.normalize_token(token)))
+
+    def jwks(self) -> Dict[str, Any]:
+        if self.key_ring is None:
+            return {"keys": []}
+        return self.key_ring.jwks()
+
+
+async def get_user_from_claims(payload: Dict[str, Any], repository: UserRepository) -> UserModel:
+    """
+    Stateless mode: the user is built from token claims, the only lookup is the
+    session epoch in redis (postgres on a miss). Bumping the epoch invalidates
+    older tokens, a deleted user has no epoch.
+    """
+    user_id = payload.get("uid")
+    if user_id is None or not payload.get("is_active"):
+        raise jwt.INVALID_TOKEN
+
+    if payload.get("epoch") != await repository.get_session_epoch(user_id):
+        raise jwt.INVALID_TOKEN
+
+    return await repository.load_instance({
+        "id": user_id,
+        "phone_number": payload["sub"],
+        "role": payload["role"],
+        "is_active": True,
+        "is_delete": False,
+    })
+
 
 async def get_current_user(
     access_token: str = Header(..., alias="Authorization"),
@@ -79,8 +216,11 @@ async def get_current_user(
     phone_number = payload.get("sub")
     if not phone_number:
         raise jwt.INVALID_TOKEN
-    
-    user = await repository.get_by_phone_number(phone_number)
+
+    if setting.STATELESS_AUTH:
+        return await get_user_from_claims(payload, repository)
+
+    user = await repository.get_by_phone_number_cached(phone_number)
     if not user:
         raise jwt.INVALID_TOKEN
 
@@ -0,0 +1,56 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+from src.utils.metrics import metrics
+
+
+class LRUCache:
+    """
+    - Bounded in-process LRU cache with a per entry time to live.
+    - Every worker has its own copy, so keep ttl short for mutable data.
+    - Hits, misses and evictions are counted as `cache.<name>.*` metrics.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable) -> Any | None:
+        item = self._data.get(key)
+        if item is None:
+            metrics.incr(f"cache.{self.name}.miss")
+            return None
+
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            metrics.incr(f"cache.{self.name}.miss")
+            return None
+
+        self._data.move_to_end(key)
+        metrics.incr(f"cache.{self.name}.hit")
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        if self.maxsize <= 0:
+            return
+
+        ttl = self.ttl if ttl is None else ttl
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            metrics.incr(f"cache.{self.name}.eviction")
+
+    def delete(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
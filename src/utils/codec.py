@@ -0,0 +1,69 @@
+import json
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Type
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class Codec(ABC):
+    """ bytes <-> values of json types, what cache entries are made of. """
+
+    @abstractmethod
+    def encode(self, value: Any) -> bytes:
+        pass
+
+    @abstractmethod
+    def decode(self, data: bytes) -> Any:
+        pass
+
+
+class JsonCodec(Codec):
+    def encode(self, value):
+        return json.dumps(value, separators=(",", ":")).encode()
+
+    def decode(self, data):
+        return json.loads(data)
+
+
+class OrjsonCodec(Codec):
+    def encode(self, value):
+        return orjson.dumps(value)
+
+    def decode(self, data):
+        return orjson.loads(data)
+
+
+class MsgpackCodec(Codec):
+    def encode(self, value):
+        return msgpack.packb(value, use_bin_type=True)
+
+    def decode(self, data):
+        return msgpack.unpackb(data, raw=False)
+
+
+CODECS: Dict[str, Type[Codec]] = {
+    "json": JsonCodec,
+    "orjson": OrjsonCodec,
+    "msgpack": MsgpackCodec,
+}
+
+_MODULES = {"orjson": orjson, "msgpack": msgpack}
+
+
+def get_codec(name: str) -> Codec:
+    """ `orjson` and `msgpack` are optional, install them to use their codec. """
+    if name not in CODECS:
+        raise ValueError(f"Unknown codec `{name}`, choose one of {', '.join(CODECS)}.")
+
+    if name in _MODULES and _MODULES[name] is None:
+        raise RuntimeError(f"`{name}` codec needs the `{name}` package: pip install {name}")
+
+    return CODECS[name]()
@@ -0,0 +1,122 @@
+import asyncio
+import math
+from contextvars import ContextVar
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.config import setting
+from src.utils.metrics import metrics
+
+
+class Deadline:
+    """ end of the request budget, in event loop time. None is no deadline. """
+
+    def __init__(self, budget: float | None):
+        self.started_at = asyncio.get_running_loop().time()
+        self.at: float | None = None
+        self.timeout: asyncio.Timeout | None = None
+        self.set_budget(budget)
+
+    def set_budget(self, budget: float | None) -> None:
+        self.at = self.started_at + budget if budget else None
+        if self.timeout is not None:
+            self.timeout.reschedule(self.at)
+
+    def remaining(self) -> float | None:
+        if self.at is None:
+            return None
+        return self.at - asyncio.get_running_loop().time()
+
+    def exhausted(self) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+
+request_deadline: ContextVar[Deadline | None] = ContextVar("request_deadline", default=None)
+
+
+def remaining_budget() -> float | None:
+    """ seconds left for the current request, None outside requests or without a deadline. """
+    deadline = request_deadline.get()
+    return None if deadline is None else deadline.remaining()
+
+
+def within_budget() -> asyncio.Timeout:
+    """ `asyncio.timeout` at the remaining budget, a spent budget raises `TimeoutError` right away. """
+    remaining = remaining_budget()
+    if remaining is not None and remaining <= 0:
+        raise TimeoutError("request deadline exceeded")
+    return asyncio.timeout(remaining)
+
+
+def statement_timeout_ms() -> int | None:
+    """ remaining budget as a postgres `statement_timeout`, at least 1 ms (0 would disable it). """
+    remaining = remaining_budget()
+    return None if remaining is None else max(math.ceil(remaining * 1000), 1)
+
+
+def budget(seconds: float | None):
+    """
+    Route budget counted from the request start, replaces `REQUEST_BUDGET`.
+    None disables the deadline, e.g. for streamed exports.
+
+    Example::
+
+        @router.get("", dependencies=[Depends(budget(2))])
+    """
+
+    async def _budget():
+        deadline = request_deadline.get()
+        if deadline is not None:
+            deadline.set_budget(seconds)
+
+    return _budget
+
+
+class DeadlineMiddleware:
+    """
+    - Every request runs under `REQUEST_BUDGET` seconds (0 disables), routes
+      change it with the `budget` dependency.
+    - The remaining budget bounds postgres statements (`SET LOCAL
+      statement_timeout`) and redis commands, the request is cancelled when
+      it runs out.
+    - A request failing after its deadline gets 503 and counts `deadline.exceeded`,
+      unless its response already started.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        deadline = Deadline(setting.REQUEST_BUDGET)
+        token = request_deadline.set(deadline)
+        started = False
+
+        async def send_tracking(message: Message) -> None:
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            async with asyncio.timeout_at(deadline.at) as timeout:
+                deadline.timeout = timeout
+                await self.app(scope, receive, send_tracking)
+        except Exception:
+            if started or not deadline.exhausted():
+                raise
+
+            metrics.incr("deadline.exceeded")
+            response = JSONResponse(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                content={"detail": "Request deadline exceeded."},
+            )
+            await response(scope, receive, send)
+        finally:
+            request_deadline.reset(token)
@@ -0,0 +1,44 @@
+import csv
+import io
+from typing import AsyncGenerator, AsyncIterable, List, Sequence, Type
+
+from pydantic import BaseModel, TypeAdapter
+
+from src.schemas.export import ExportFormat
+
+
+MEDIA_TYPES = {
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.csv: "text/csv",
+}
+
+
+async def export_lines(
+    schema: Type[BaseModel], batches: AsyncIterable[Sequence], export_format: ExportFormat
+) -> AsyncGenerator[bytes, None]:
+    """
+    - One chunk per batch of rows, validated by `schema` like the list endpoints.
+    - NDJSON is a json object per line, CSV has a header of the `schema` fields and
+      json mode values (iso dates, enum values, empty for null).
+    """
+    adapter = TypeAdapter(List[schema])
+    fields = list(schema.model_fields)
+
+    if export_format == ExportFormat.csv:
+        yield csv_chunk([fields])
+
+    async for rows in batches:
+        items = adapter.validate_python(rows, from_attributes=True)
+
+        if export_format == ExportFormat.ndjson:
+            yield "".join(item.model_dump_json() + "\n" for item in items).encode()
+        else:
+            yield csv_chunk(
+                [item.model_dump(mode="json")[field] for field in fields] for item in items
+            )
+
+
+def csv_chunk(rows) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode()
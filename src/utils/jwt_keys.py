@@ -0,0 +1,75 @@
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+from cryptography.hazmat.primitives.serialization import load_pem_private_key, load_pem_public_key
+from jwt.algorithms import ECAlgorithm, OKPAlgorithm
+
+
+@dataclass(frozen=True)
+class JwtKey:
+    kid: str
+    algorithm: str
+    public_key: Any
+    private_key: Any | None = None
+
+
+class JwtKeyRing:
+    """
+    - Loads every `<kid>.pem` from `keys_dir` once and keeps the parsed keys.
+    - Private keys (EC P-256 -> ES256, Ed25519 -> EdDSA) can sign, public ones only verify.
+    - Only `active_kid` signs; retired keys stay in the directory until their
+      tokens expire so they keep verifying.
+    """
+
+    def __init__(self, keys_dir: str, active_kid: str | None):
+        self._keys: Dict[str, JwtKey] = {}
+
+        for file_name in sorted(os.listdir(keys_dir)):
+            if not file_name.endswith(".pem"):
+                continue
+
+            kid = file_name.removesuffix(".pem")
+            with open(os.path.join(keys_dir, file_name), "rb") as f:
+                self._keys[kid] = self._load_key(kid, f.read())
+
+        if active_kid is None or active_kid not in self._keys:
+            raise ValueError(f"active jwt key `{active_kid}` not found in {keys_dir}")
+        if self._keys[active_kid].private_key is None:
+            raise ValueError(f"active jwt key `{active_kid}` is not a private key")
+
+        self.active = self._keys[active_kid]
+
+    @staticmethod
+    def _load_key(kid: str, pem: bytes) -> JwtKey:
+        private_key = None
+        if b"PRIVATE KEY" in pem:
+            private_key = load_pem_private_key(pem, password=None)
+            public_key = private_key.public_key()
+        else:
+            public_key = load_pem_public_key(pem)
+
+        if isinstance(public_key, ec.EllipticCurvePublicKey) and public_key.curve.name == "secp256r1":
+            algorithm = "ES256"
+        elif isinstance(public_key, ed25519.Ed25519PublicKey):
+            algorithm = "EdDSA"
+        else:
+            raise ValueError(f"jwt key `{kid}` must be an EC P-256 or Ed25519 key")
+
+        return JwtKey(kid=kid, algorithm=algorithm, public_key=public_key, private_key=private_key)
+
+    def get(self, kid: str) -> JwtKey | None:
+        return self._keys.get(kid)
+
+    def jwks(self) -> Dict[str, List[Dict[str, Any]]]:
+        keys = []
+        for key in self._keys.values():
+            if key.algorithm == "ES256":
+                jwk = ECAlgorithm.to_jwk(key.public_key, as_dict=True)
+            else:
+                jwk = OKPAlgorithm.to_jwk(key.public_key, as_dict=True)
+
+            keys.append({**jwk, "kid": key.kid, "alg": key.algorithm, "use": "sig"})
+
+        return {"keys": keys}
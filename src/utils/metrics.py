@@ -0,0 +1,36 @@
+from collections import defaultdict
+from typing import Dict
+
+from src.utils.singleton import SingletonMeta
+
+
+class Metrics(metaclass=SingletonMeta):
+    """
+    - In-process counters and gauges, one registry per worker.
+    - Counters only grow, gauges hold the last value that was set.
+    """
+
+    def __init__(self):
+        self._counters: Dict[str, int] = defaultdict(int)
+        self._gauges: Dict[str, float] = {}
+
+    def incr(self, name: str, value: int = 1) -> None:
+        self._counters[name] += value
+
+    def gauge(self, name: str, value: float) -> None:
+        self._gauges[name] = value
+
+    def get(self, name: str) -> float:
+        if name in self._gauges:
+            return self._gauges[name]
+        return self._counters.get(name, 0)
+
+    def snapshot(self) -> Dict[str, float]:
+        return {**self._counters, **self._gauges}
+
+    def reset(self) -> None:
+        self._counters.clear()
+        self._gauges.clear()
+
+
+metrics = Metrics()
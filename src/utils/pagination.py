@@ -0,0 +1,76 @@
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, List, NamedTuple, Sequence
+
+from fastapi import HTTPException, Response, status
+from pydantic import TypeAdapter
+from sqlalchemy import Column
+
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+INVALID_CURSOR = HTTPException(
+    status_code=status.HTTP_400_BAD_REQUEST,
+    detail="Invalid cursor."
+)
+
+
+class Page(NamedTuple):
+    items: List[Any]
+    next_cursor: str | None = None
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """ opaque token of the keyset values of the last row of a page. """
+    values = [value.isoformat() if isinstance(value, (datetime, date)) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str, columns: Sequence[Column]) -> List[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError
+
+        decoded = []
+        for column, value in zip(columns, values):
+            python_type = column.type.python_type
+            if python_type in (datetime, date):
+                value = python_type.fromisoformat(value)
+            elif not isinstance(value, python_type):
+                raise ValueError
+            decoded.append(value)
+    except Exception:
+        raise INVALID_CURSOR
+
+    return decoded
+
+
+def paginated(response: Response, page: Page) -> List[Any]:
+    """ page items as the body, next cursor in the `X-Next-Cursor` header. """
+    if page.next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
+
+    return page.items
+
+
+def json_list(adapter: TypeAdapter, items: Sequence[Any]) -> Response:
+    """
+    - `items` (`project` rows, dicts or instances) validated by attribute and
+      dumped to json in one pass by `adapter`, a prebuilt `TypeAdapter` of the
+      route `response_model`.
+    - FastAPI's dump and revalidate of the return value is skipped, keep
+      `response_model` on the route for the docs.
+    """
+    content = adapter.dump_json(adapter.validate_python(items, from_attributes=True))
+    return Response(content, media_type="application/json")
+
+
+def paginated_json(adapter: TypeAdapter, page: Page) -> Response:
+    """ `paginated` through `json_list`. """
+    response = json_list(adapter, page.items)
+    if page.next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
+
+    return response
@@ -0,0 +1,119 @@
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.config import setting
+from src.utils.metrics import metrics
+
+
+logger = logging.getLogger("mechanic")
+
+
+class RequestQueries:
+    """ statements of one request: count, total time, slowest and repeated shapes. """
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest = ""
+        self.shapes: Counter[str] = Counter()
+
+    def record(self, statement: str, elapsed_ms: float) -> None:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms > self.slowest_ms:
+            self.slowest_ms = elapsed_ms
+            self.slowest = statement
+
+        self.shapes[statement] += 1
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        return [(shape, count) for shape, count in self.shapes.items() if count >= threshold]
+
+    def server_timing(self) -> str:
+        return (
+            f'db;dur={self.total_ms:.1f};desc="{self.count} queries", '
+            f"db-slowest;dur={self.slowest_ms:.1f}"
+        )
+
+
+request_queries: ContextVar[RequestQueries | None] = ContextVar("request_queries", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if request_queries.get() is not None:
+        context._query_started_at = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    queries = request_queries.get()
+    started_at = getattr(context, "_query_started_at", None)
+    if queries is not None and started_at is not None:
+        queries.record(statement, (time.perf_counter() - started_at) * 1000)
+
+
+def instrument(engine: AsyncEngine) -> None:
+    """ record statements run on `engine` while a `SqlStatsMiddleware` request is active. """
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class SqlStatsMiddleware:
+    """
+    - Query count, total db time and the slowest statement of every request.
+    - Metrics `sql.queries`, `sql.time_us` and per route `sql.<METHOD> <path>.*`,
+      with `DEBUG` also a `Server-Timing` header and a debug log of the slowest
+      statement.
+    - A statement shape repeated `SQL_N_PLUS_ONE_THRESHOLD` times or more in one
+      request logs an N+1 warning and counts `sql.n_plus_one`.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        queries = RequestQueries()
+        token = request_queries.set(queries)
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start" and setting.DEBUG and queries.count:
+                MutableHeaders(scope=message).append("Server-Timing", queries.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_queries.reset(token)
+            if queries.count:
+                self.report(scope, queries)
+
+    def report(self, scope: Scope, queries: RequestQueries) -> None:
+        route = scope.get("route")
+        name = f"{scope['method']} {route.path if route is not None else scope['path']}"
+
+        metrics.incr("sql.queries", queries.count)
+        metrics.incr("sql.time_us", int(queries.total_ms * 1000))
+        metrics.incr(f"sql.{name}.requests")
+        metrics.incr(f"sql.{name}.queries", queries.count)
+        metrics.gauge(f"sql.{name}.slowest_ms", round(queries.slowest_ms, 1))
+
+        for shape, count in queries.repeated(setting.SQL_N_PLUS_ONE_THRESHOLD):
+            metrics.incr("sql.n_plus_one")
+            logger.warning(f"N+1 in {name}: {count} x {' '.join(shape.split())[:300]}")
+
+        if setting.DEBUG:
+            logger.debug(
+                f"{name}: {queries.count} queries in {queries.total_ms:.1f} ms, "
+                f"slowest {queries.slowest_ms:.1f} ms: {' '.join(queries.slowest.split())[:300]}"
+            )